@@ -15,22 +15,69 @@
 
 '''
 
-debug, __version__ = __debug__, (1, 0)
+__version__ = (1, 0)
 
 # stdlib
-import __builtin__; export = None
-
-# canteen :)
-from .rpc import *
-from .core import *
-from .util import *
-from .test import *
-from .base import *
-from .logic import *
-from .model import *
-from .runtime import *
-from .dispatch import *
-from .exceptions import *
-
-
-__all__ = [export for export in globals() if (export not in __builtin__.__dict__ and (not export.startswith('__')))]  # export all the things!
+import sys
+import types
+import importlib
+
+
+## Globals
+_submodules = (  # in export order - later exports shadow earlier ones
+  'rpc',
+  'core',
+  'util',
+  'test',
+  'base',
+  'logic',
+  'model',
+  'runtime',
+  'dispatch',
+  'exceptions'
+)
+
+
+def _exports(module):
+
+  ''' Names ``module`` exports via ``from module import *``. '''
+
+  return getattr(module, '__all__', None) or [k for k in module.__dict__ if not k.startswith('_')]
+
+
+class _Package(types.ModuleType):
+
+  ''' Module type for ``canteen`` itself. Subpackages (and everything they
+      export) load on first attribute access, so processes only pay for the
+      parts of the framework they use. '''
+
+  def __getattr__(self, name):
+
+    '''  '''
+
+    if name == '__all__':  # ``from canteen import *`` - load all the things!
+      self.__all__ = sorted(set(k for m in _submodules for k in _exports(self._load(m))) | set(_submodules))
+      return self.__all__
+
+    if name.startswith('__'): raise AttributeError(name)
+    if name in _submodules: return self._load(name)
+
+    # search exports in reverse, since later subpackages would have shadowed earlier ones
+    for submodule in reversed(_submodules):
+      module = self._load(submodule)
+      if name in _exports(module):
+        setattr(self, name, getattr(module, name))
+        return self.__dict__[name]
+    raise AttributeError('\'%s\' has no attribute \'%s\'.' % (self.__name__, name))
+
+  def _load(self, submodule):
+
+    '''  '''
+
+    return importlib.import_module('.'.join((self.__name__, submodule)))
+
+
+# swap in the lazy package, keeping this module alive (its globals back `_Package`)
+_package = _Package(__name__, __doc__)
+_package.__dict__.update(dict(((k, v) for k, v in globals().iteritems() if k != '_package'), _module=sys.modules[__name__]))
+sys.modules[__name__] = _package
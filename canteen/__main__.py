@@ -7,7 +7,8 @@
 
   accepts calls to ``canteen`` as a module. can be run with
   ``python -m canteen`` or ``python -m canteen/``, the latter
-  assuming you have it installed right next to you.
+  assuming you have it installed right next to you. with
+  arguments, dispatches to a bundled tool (see :py:mod:`canteen.tools`).
 
   :author: Sam Gammon <sam@keen.io>
   :copyright: (c) Keen IO, 2013
@@ -17,8 +18,16 @@
 
 '''
 
+# stdlib
+import sys
+
 # utils
 from util import walk
 from dispatch import run
 
+
+if len(sys.argv) > 1:
+  from tools import main
+  sys.exit(main())
+
 walk(), run()
@@ -19,6 +19,8 @@ from ..core import injection
 # canteen util
 from ..util import debug
 from ..util import config
+from ..util import struct
+from ..util import timing
 from ..util import decorators
 
 
@@ -43,7 +45,8 @@ class Handler(object):
   __response__ = None  # lazy-loaded response object
   __callback__ = None  # callback to send data (sync or async)
   __content_type__ = None  # response content type
-  __base_context__ = None  # base template render context
+  __base_context__ = None  # base template render context, rebuilt per request
+  __static_context__ = None  # request-independent render context, per class
 
   __owner__, __metaclass__ = "Handler", injection.Compound
 
@@ -65,12 +68,16 @@ class Handler(object):
       'text/html'
     )
 
-    # request & response
-    self.__request__, self.__response__ = request, response
+    # request & response, and routes bound for this request (the runtime's are per-thread)
+    self.__request__, self.__response__, self.__routes__ = (
+      request,
+      response,
+      getattr(runtime, 'routes', None)
+    )
 
   # expose internals, but write-protect
   runtime = property(lambda self: self.__runtime__)
-  routes = property(lambda self: self.__runtime__.routes)
+  routes = property(lambda self: self.__routes__ or self.__runtime__.routes)
   status = property(lambda self: self.__status__)
   content_type = property(lambda self: self.__content_type__)
   headers = property(lambda self: self.__headers__)
@@ -108,15 +115,69 @@ class Handler(object):
       session, engine = self.request.session
       return session
 
+  @property
+  def static_context(self):
+
+    ''' Request-independent template context (API shortcuts), built once per
+        handler class and shared - it must never be written to. '''
+
+    cls = self.__class__
+
+    if cls.__dict__.get('__static_context__') is None:
+
+      # for javascript context
+      from canteen.rpc import ServiceHandler
+
+      cls.__static_context__ = {
+
+        # Cache API
+        'cache': {
+          'get': self.cache.get,
+          'get_multi': self.cache.get_multi,
+          'set': self.cache.set,
+          'set_multi': self.cache.set_multi,
+          'delete': self.cache.delete,
+          'delete_multi': self.cache.delete_multi,
+          'clear': self.cache.clear,
+          'flush': self.cache.flush
+        },
+
+        # Assets API
+        'asset': {
+          'image': self.assets.image_url,
+          'style': self.assets.style_url,
+          'script': self.assets.script_url
+        },
+
+        # Service API
+        'services': {
+          'list': ServiceHandler.services,
+          'describe': ServiceHandler.describe
+        },
+
+        # Output API
+        'output': {
+          'render': self.template.render,
+          'environment': self.template.environment
+        },
+
+        # Routing
+        'route': {
+          'resolve': self.http.resolve_route
+        }
+
+      }
+
+    return cls.__static_context__
+
   @property
   def context(self):
 
     '''  '''
 
-    # for javascript context
-    from canteen.rpc import ServiceHandler
+    static = self.static_context
 
-    return {
+    return struct.ChainMap({
 
       # Default Context
       'handler': self,
@@ -135,37 +196,6 @@ class Handler(object):
         'start_response': self.start_response
       },
 
-      # Cache API
-      'cache': {
-        'get': self.cache.get,
-        'get_multi': self.cache.get_multi,
-        'set': self.cache.set,
-        'set_multi': self.cache.set_multi,
-        'delete': self.cache.delete,
-        'delete_multi': self.cache.delete_multi,
-        'clear': self.cache.clear,
-        'flush': self.cache.flush
-      },
-
-      # Assets API
-      'asset': {
-        'image': self.assets.image_url,
-        'style': self.assets.style_url,
-        'script': self.assets.script_url
-      },
-
-      # Service API
-      'services': {
-        'list': ServiceHandler.services,
-        'describe': ServiceHandler.describe
-      },
-
-      # Output API
-      'output': {
-        'render': self.template.render,
-        'environment': self.template.environment
-      },
-
       'url_for': self.url_for,
 
       # Routing
@@ -173,30 +203,29 @@ class Handler(object):
 
       'route': {
         'build': self.url_for,
-        'resolve': self.http.resolve_route
+        'resolve': static['route']['resolve']
       }
 
-    }
+    }, static)
 
   @property
   def base_context(self):
 
-    '''  '''
+    ''' Full render context for this request. Template base values are built
+        per handler (and so per request), so they follow config changes. '''
 
-    if not self.__base_context__:
-      base = {}
-      map(base.update, (self.template.base_context, self.context))
-      self.__base_context__ = base
+    if self.__base_context__ is None:
+      self.__base_context__ = self.template.base_context
 
-    return self.__base_context__
+    context = self.context
+    return struct.ChainMap(*(context.maps + [self.__base_context__]))
 
   def render(self, template, headers={}, content_type=None, context={}, _direct=False, **kwargs):
 
     '''  '''
 
-    # merge template context
-    _merged_context = self.base_context
-    map(_merged_context.update, (context, kwargs))
+    # layer call-specific context over the (shared) base context
+    _merged_context = struct.ChainMap(*([kwargs, context] + self.base_context.maps))
 
     # collapse and merge HTTP headers (base headers first)
     _merged_headers = dict(self.template.base_headers + self.config.get('http', {}).get('headers', {}).items())
@@ -207,13 +236,16 @@ class Handler(object):
     # finally, locally-passed headers
     if headers: _merged_headers.update(headers)
 
-    # render template with merged context
+    # render template with merged context. when streaming, the body renders as the response is iterated - after
+    # timing has finished and `Server-Timing` is sent - so the `render` span only covers starting the stream
+    timer, start = timing.Timing.current(self.environ), timing.clock()
     content = self.template.render(*(
       self,
       self.runtime.config,
       template,
       _merged_context
     ), _direct=_direct)
+    if timer: timer.record('render', start)
 
     if _direct:
       return (self.status, _merged_headers, content_type or self.content_type, content)
@@ -17,19 +17,34 @@
 '''
 
 # stdlib
+import os
 import abc
+import sys
+import json
+import mmap
+import uuid
 import time
+import fcntl
+import struct
+import hashlib
 import weakref
+import tempfile
 import threading
+import contextlib
+import collections
 
 # core & util
 from . import CoreAPI
+from canteen.util import debug
+from canteen.util import config
 from canteen.util import decorators
 
 
 ## Globals
 _caches = {}
+_logger = debug.Logger('CacheAPI')
 _default = (threading.local(), None)
+_missing = object()  # sentinel for misses, where ``None`` may be a cached value
 
 
 class Cache(object):
@@ -40,17 +55,18 @@ class Cache(object):
 
     '''  '''
 
+    name = None  # name this cache was spawned under (``None`` for the default)
     target = None  # cache adapter/library
     strategy = None  # strategy to use for eviction
 
     __metaclass__ = abc.ABCMeta
 
     ## == Internals == ##
-    def __init__(self, target, strategy=None):
+    def __init__(self, target, strategy=None, name=None):
 
       '''  '''
 
-      self.target, self.strategy = target, strategy
+      self.target, self.strategy, self.name = target, strategy, name
 
     #### ==== Read Methods ==== ####
     @abc.abstractmethod
@@ -184,7 +200,7 @@ class CacheAPI(CoreAPI):
 
       '''  '''
 
-      return [self.get(key) for key in keys]
+      return [self.get(key, default) for key in keys]
 
     def items(self):
 
@@ -232,6 +248,748 @@ class CacheAPI(CoreAPI):
       self.target = {}
       return length
 
+  class Boundedcache(Cache.Engine):
+
+    ''' In-process engine holding at most ``max_entries`` values (and,
+        optionally, around ``max_bytes`` of them), evicting the least
+        recently (``lru``) or least frequently (``lfu``) used entry when
+        full. Entries may carry their own TTL: expired entries are dropped
+        as they are read, and swept every ``interval`` seconds. Unlike
+        :py:class:`Threadcache`, one instance is shared by all threads. '''
+
+    def __init__(self, target=None, strategy=None, name=None, max_entries=1024, max_bytes=None, policy='lru', ttl=None, interval=60):
+
+      ''' Initialize a new bounded cache.
+
+          :param max_entries: Maximum number of entries held.
+          :param max_bytes: Approximate maximum size of held values, if any.
+          :param policy: Eviction policy - ``lru`` or ``lfu``.
+          :param ttl: Default TTL for entries, in seconds. Defaults to none.
+          :param interval: Seconds between sweeps for expired entries. '''
+
+      if policy not in ('lru', 'lfu'):
+        raise ValueError('Unrecognized cache eviction policy: "%s".' % policy)
+
+      # ``target`` (a thread-local dict, from ``spawn``) is ignored - entries are shared
+      super(CacheAPI.Boundedcache, self).__init__(collections.OrderedDict(), strategy or CacheAPI.PersistentCache(), name)
+      self.max_entries, self.max_bytes, self.policy, self.ttl, self.interval = (
+        max_entries, max_bytes, policy, ttl, interval)
+
+      self.lock, self.size, self.sweep = threading.RLock(), 0, time.time() + interval
+      self.frequency, self.buckets = {}, collections.defaultdict(collections.OrderedDict)  # LFU bookkeeping
+
+    @staticmethod
+    def sizeof(value):
+
+      ''' Approximate the memory held by ``value``, one level deep. '''
+
+      size = sys.getsizeof(value)
+      if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.iteritems())
+      elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sys.getsizeof(item) for item in value)
+      return size
+
+    def touch(self, key):
+
+      ''' Record a use of ``key``, for eviction. '''
+
+      if self.policy == 'lru':
+        self.target[key] = self.target.pop(key)  # move to the most-recent end
+        return
+
+      count = self.frequency[key]
+      del self.buckets[count][key]
+      if not self.buckets[count]: del self.buckets[count]
+      self.frequency[key] = count + 1
+      self.buckets[count + 1][key] = True
+
+    def evict(self):
+
+      ''' Choose and drop one entry, according to the eviction policy. '''
+
+      if self.policy == 'lru':
+        key = next(iter(self.target))  # least-recent end
+      else:
+        key = next(iter(self.buckets[min(self.buckets)]))  # least-used, then oldest
+      self.discard(key)
+
+    def discard(self, key):
+
+      ''' Drop ``key`` and its bookkeeping, if present. '''
+
+      entry = self.target.pop(key, None)
+      if entry is None: return False
+      self.size -= entry[3]
+
+      if self.policy == 'lfu':
+        count = self.frequency.pop(key)
+        del self.buckets[count][key]
+        if not self.buckets[count]: del self.buckets[count]
+      return True
+
+    def expired(self, key, entry, now):
+
+      '''  '''
+
+      return (entry[2] is not None and entry[2] <= now) or self.strategy.should_expire(key, entry[1])
+
+    def tick(self, now=None):
+
+      ''' Sweep expired entries, if a sweep is due.
+
+          :returns: Number of entries dropped. '''
+
+      now = now or time.time()
+      if now < self.sweep: return 0
+
+      with self.lock:
+        self.sweep = now + self.interval
+        expired = [key for key, entry in self.target.iteritems() if self.expired(key, entry, now)]
+        for key in expired: self.discard(key)
+        self.strategy.tick(now)
+      return len(expired)
+
+    def get(self, key, default=None):
+
+      '''  '''
+
+      now = time.time()
+      self.tick(now)
+
+      with self.lock:
+        entry = self.target.get(key)
+        if entry is None: return default
+        if self.expired(key, entry, now):
+          self.discard(key)
+          return default
+        self.touch(key)
+        return entry[0]
+
+    def get_multi(self, keys, default=None):
+
+      '''  '''
+
+      return [self.get(key, default) for key in keys]
+
+    def items(self):
+
+      '''  '''
+
+      with self.lock:
+        keys = list(self.target)
+      for key in keys:
+        yield key, self.get(key)
+
+    def set(self, key, value, ttl=None):
+
+      ''' Store ``value`` under ``key``, evicting entries to make room.
+
+          :param ttl: Seconds this entry lives for. Defaults to the cache's
+          default TTL, if any. '''
+
+      now, size = time.time(), self.sizeof(value)
+      ttl = ttl if ttl is not None else self.ttl
+      self.tick(now)
+
+      with self.lock:
+        self.discard(key)
+        if self.max_bytes is not None and size > self.max_bytes: return value  # would never fit
+
+        while self.target and (len(self.target) >= self.max_entries or (
+              self.max_bytes is not None and self.size + size > self.max_bytes)):
+          self.evict()
+
+        self.target[key], self.size = [value, now, now + ttl if ttl else None, size], self.size + size
+        if self.policy == 'lfu':
+          self.frequency[key] = 1
+          self.buckets[1][key] = True
+      return value
+
+    def set_multi(self, map, ttl=None):
+
+      '''  '''
+
+      for key, value in map.iteritems():
+        self.set(key, value, ttl)
+      return map
+
+    def delete(self, key):
+
+      '''  '''
+
+      with self.lock:
+        self.discard(key)
+
+    def delete_multi(self, keys):
+
+      '''  '''
+
+      for key in keys:
+        self.delete(key)
+
+    def clear(self):
+
+      '''  '''
+
+      with self.lock:
+        length = len(self.target)
+        self.target.clear(), self.frequency.clear(), self.buckets.clear()
+        self.size = 0
+      return length
+
+  class Mappedcache(Cache.Engine):
+
+    ''' Stores entries in a fixed-size, memory-mapped file, so every process
+        on the box shares one cache. The file holds a table of ``slots``
+        fixed-size slots, indexed by key hash with a short linear probe. When
+        a key's probe window is full, the entry written longest ago is
+        overwritten. Values are serialized with the same codec as the redis
+        adapter (``msgpack``, falling back to ``json``), so they must be plain
+        data. Writes take an exclusive ``flock``, reads a shared one. '''
+
+    magic = 'CNTNCC01'
+    header = struct.Struct('<8sII')  # magic, slot count, slot size
+    slot = struct.Struct('<QddHIB')  # key hash, stored, expires, key length, value length, state
+
+    EMPTY, USED = 0, 1  # slot states
+
+    def __init__(self, target=None, strategy=None, name=None, path=None, slots=4096, slot_size=1024, probes=8, ttl=None):
+
+      ''' Open (or create) a shared cache file.
+
+          :param path: Backing file. Defaults to one per cache name, in the
+          system temp directory.
+
+          :param slots: Number of entries the file can hold.
+          :param slot_size: Bytes per slot - larger entries are not stored.
+          :param probes: Slots searched for each key.
+          :param ttl: Default TTL for entries, in seconds. Defaults to none. '''
+
+      from canteen.model.adapter import redis  # same serializer choice as the redis adapter
+
+      # ``target`` (a thread-local dict, from ``spawn``) is ignored - entries live in the file
+      super(CacheAPI.Mappedcache, self).__init__(None, strategy or CacheAPI.PersistentCache(), name)
+      self.serializer, self.slots, self.slot_size, self.probes, self.ttl = (
+        redis.RedisAdapter.serializer, slots, slot_size, min(probes, slots), ttl)
+
+      self.path = path or os.path.join(tempfile.gettempdir(), '_canteen-cache-%s-%d.mmap' % (name or 'default', os.getuid()))
+      self.lock = threading.RLock()
+
+      self.handle, self.pid = os.open(self.path, os.O_RDWR | os.O_CREAT, 0600), os.getpid()
+      with self.locked(fcntl.LOCK_EX):
+
+        # other processes may have the file mapped, and shrinking it would fault their next access - keep its layout
+        layout = self.layout()
+        if layout and layout != (slots, slot_size):
+          _logger.warning('Cache file "%s" holds %s slots of %s bytes, not %s of %s - keeping its layout.' % (
+            (self.path,) + layout + (slots, slot_size)))
+          slots, slot_size = layout
+          self.slots, self.slot_size, self.probes = slots, slot_size, min(probes, slots)
+
+        size = self.header.size + slots * slot_size
+        if os.fstat(self.handle).st_size < size: os.ftruncate(self.handle, size)  # only ever grows
+        self.target = mmap.mmap(self.handle, size)
+        if self.header.unpack_from(self.target, 0) != (self.magic, slots, slot_size):
+          self.target[:] = '\x00' * size  # new, or not a cache file - start over
+          self.header.pack_into(self.target, 0, self.magic, slots, slot_size)
+
+    def layout(self):
+
+      ''' Read the layout of the backing file (call with a lock held).
+
+          :returns: ``tuple`` of ``(slots, slot_size)``, or ``None`` if the
+          file is new or isn't a complete cache file. '''
+
+      os.lseek(self.handle, 0, os.SEEK_SET)
+      head = os.read(self.handle, self.header.size)
+      if len(head) < self.header.size: return None
+
+      magic, slots, slot_size = self.header.unpack(head)
+      if magic != self.magic or not slots or os.fstat(self.handle).st_size < self.header.size + slots * slot_size:
+        return None
+      return slots, slot_size
+
+    @contextlib.contextmanager
+    def locked(self, mode):
+
+      ''' Hold an ``flock`` on the backing file (and a lock between this
+          process' threads, which share the descriptor) for a block. '''
+
+      if self.pid != os.getpid():  # forked - locks on an inherited descriptor are shared with the parent
+        inherited, self.pid, self.lock, self.handle = self.handle, os.getpid(), threading.RLock(), os.open(self.path, os.O_RDWR)
+        os.close(inherited)
+
+      with self.lock:
+        fcntl.flock(self.handle, mode)
+        try:
+          yield
+        finally:
+          fcntl.flock(self.handle, fcntl.LOCK_UN)
+
+    @staticmethod
+    def encode(key):
+
+      '''  '''
+
+      return key.encode('utf-8') if isinstance(key, unicode) else str(key)
+
+    def window(self, key):
+
+      ''' Offsets of the slots ``key`` may occupy, in probe order. '''
+
+      start = struct.unpack('<Q', hashlib.sha1(key).digest()[:8])[0]
+      return [self.header.size + ((start + i) % self.slots) * self.slot_size for i in xrange(self.probes)], start
+
+    def find(self, key):
+
+      ''' Locate ``key`` (call with a lock held).
+
+          :returns: ``(offset, slot)`` tuple, or ``(None, None)``. '''
+
+      offsets, digest = self.window(key)
+      for offset in offsets:
+        slot = self.slot.unpack_from(self.target, offset)
+        if slot[5] == self.USED and slot[0] == digest:
+          start = offset + self.slot.size
+          if self.target[start:start + slot[3]] == key:
+            return offset, slot
+      return None, None
+
+    def expired(self, key, slot, now):
+
+      '''  '''
+
+      return (slot[2] and slot[2] <= now) or self.strategy.should_expire(key, slot[1])
+
+    def read(self, offset, slot):
+
+      '''  '''
+
+      start = offset + self.slot.size + slot[3]
+      return self.serializer.loads(self.target[start:start + slot[4]])
+
+    def get(self, key, default=None):
+
+      '''  '''
+
+      key, now = self.encode(key), time.time()
+      with self.locked(fcntl.LOCK_SH):
+        offset, slot = self.find(key)
+        if offset is None: return default
+        if not self.expired(key, slot, now): return self.read(offset, slot)
+
+      self.delete(key)
+      return default
+
+    def get_multi(self, keys, default=None):
+
+      '''  '''
+
+      return [self.get(key, default) for key in keys]
+
+    def items(self):
+
+      '''  '''
+
+      now, found = time.time(), []
+      with self.locked(fcntl.LOCK_SH):
+        for index in xrange(self.slots):
+          offset = self.header.size + index * self.slot_size
+          slot = self.slot.unpack_from(self.target, offset)
+          if slot[5] == self.USED:
+            key = self.target[offset + self.slot.size:offset + self.slot.size + slot[3]]
+            if not self.expired(key, slot, now): found.append((key, self.read(offset, slot)))
+      return iter(found)
+
+    def set(self, key, value, ttl=None):
+
+      ''' Store ``value`` under ``key``. Entries that don't fit in a slot
+          are not stored.
+
+          :param ttl: Seconds this entry lives for. Defaults to the cache's
+          default TTL, if any. '''
+
+      key, data, now = self.encode(key), self.serializer.dumps(value), time.time()
+      ttl = ttl if ttl is not None else self.ttl
+      if self.slot.size + len(key) + len(data) > self.slot_size:
+        self.delete(key)  # too big - but don't leave a stale value behind
+        return value
+
+      with self.locked(fcntl.LOCK_EX):
+        offset, slot = self.find(key)
+        offsets, digest = self.window(key)
+        if offset is None:
+          candidates = [(self.slot.unpack_from(self.target, candidate), candidate) for candidate in offsets]
+
+          # first free (or expired) slot, otherwise the one written longest ago
+          free = [candidate for slot, candidate in candidates if slot[5] != self.USED or (slot[2] and slot[2] <= now)]
+          offset = free[0] if free else min(candidates, key=lambda candidate: candidate[0][1])[1]
+
+        self.slot.pack_into(self.target, offset, digest, now, now + ttl if ttl else 0, len(key), len(data), self.USED)
+        start = offset + self.slot.size
+        self.target[start:start + len(key) + len(data)] = key + data
+      return value
+
+    def set_multi(self, map, ttl=None):
+
+      '''  '''
+
+      for key, value in map.iteritems():
+        self.set(key, value, ttl)
+      return map
+
+    def delete(self, key):
+
+      '''  '''
+
+      key = self.encode(key)
+      with self.locked(fcntl.LOCK_EX):
+        offset, slot = self.find(key)
+        if offset is not None:
+          self.target[offset + self.slot.size - 1] = chr(self.EMPTY)  # state is the last header byte
+
+    def delete_multi(self, keys):
+
+      '''  '''
+
+      for key in keys:
+        self.delete(key)
+
+    def clear(self):
+
+      '''  '''
+
+      cleared = 0
+      with self.locked(fcntl.LOCK_EX):
+        for index in xrange(self.slots):
+          offset = self.header.size + index * self.slot_size + self.slot.size - 1  # state byte
+          if self.target[offset] == chr(self.USED):
+            self.target[offset], cleared = chr(self.EMPTY), cleared + 1
+      return cleared
+
+  class Rediscache(Cache.Engine):
+
+    ''' Stores entries in redis, so they survive restarts and are shared by
+        every node. Connections come from the redis adapter's server
+        profiles (see :py:meth:`RedisAdapter.channel`), and values use its
+        serializer, with anything over ``compress`` bytes run through its
+        compressor. Multi-key operations each take one round trip. '''
+
+    RAW, COMPRESSED = '\x00', '\x01'  # value flags, prepended to stored values
+
+    def __init__(self, target=None, strategy=None, name=None, profile=None, client=None, prefix='canteen:cache:', ttl=None, compress=1024):
+
+      ''' Connect a redis cache.
+
+          :param profile: Model kind (or ``None``, for the default server)
+          to pick a connection profile by, as for :py:meth:`RedisAdapter.channel`.
+
+          :param client: Redis client to use, in place of one from ``profile``.
+          :param prefix: Prefix for keys, before the cache's name.
+          :param ttl: Default TTL for entries, in seconds. Defaults to none.
+          :param compress: Values larger than this many bytes (once
+          serialized) are compressed. ``None`` disables compression. '''
+
+      from canteen.model.adapter import redis
+
+      if client is None:
+        if not redis.RedisAdapter.is_supported():
+          raise RuntimeError('The redis cache engine requires the `redis` package.')
+        if not redis._default_profile: redis.RedisAdapter()  # load server profiles from config
+        client = redis.RedisAdapter.channel(profile)
+
+      # ``target`` (a thread-local dict, from ``spawn``) is ignored - entries live in redis
+      super(CacheAPI.Rediscache, self).__init__(client, strategy or CacheAPI.PersistentCache(), name)
+      self.serializer, self.compressor, self.ttl, self.compress = (
+        redis.RedisAdapter.serializer, redis.RedisAdapter.compressor, ttl, compress)
+      self.prefix = '%s%s:' % (prefix, name or '__default__')
+
+    def key(self, key):
+
+      '''  '''
+
+      return self.prefix + (key.encode('utf-8') if isinstance(key, unicode) else str(key))
+
+    def encode(self, value):
+
+      '''  '''
+
+      data = self.serializer.dumps(value)
+      if self.compress is not None and len(data) > self.compress:
+        return self.COMPRESSED + self.compressor.compress(data)
+      return self.RAW + data
+
+    def decode(self, data, default=None):
+
+      '''  '''
+
+      if data is None: return default
+      if data[0] == self.COMPRESSED: return self.serializer.loads(self.compressor.decompress(data[1:]))
+      return self.serializer.loads(data[1:])
+
+    def get(self, key, default=None):
+
+      '''  '''
+
+      return self.decode(self.target.get(self.key(key)), default)
+
+    def get_multi(self, keys, default=None):
+
+      ''' Fetch ``keys`` with one ``MGET``. '''
+
+      keys = list(keys)
+      if not keys: return []
+      return [self.decode(data, default) for data in self.target.mget([self.key(key) for key in keys])]
+
+    def keys(self):
+
+      ''' Keys held by this cache (scanned, so this walks the keyspace). '''
+
+      prefix = self.prefix
+      return [key[len(prefix):] for key in self.target.scan_iter(match=prefix + '*')]
+
+    def items(self):
+
+      '''  '''
+
+      keys = self.keys()
+      return iter(zip(keys, self.get_multi(keys)))
+
+    def set(self, key, value, ttl=None):
+
+      ''' Store ``value`` under ``key``.
+
+          :param ttl: Seconds this entry lives for. Defaults to the cache's
+          default TTL, if any. '''
+
+      ttl = ttl if ttl is not None else self.ttl
+      self.target.set(self.key(key), self.encode(value), ex=int(ttl) if ttl else None)
+      return value
+
+    def set_multi(self, map, ttl=None):
+
+      ''' Store every entry in ``map`` with one pipelined batch of ``SET``s. '''
+
+      ttl = ttl if ttl is not None else self.ttl
+      pipeline = self.target.pipeline(transaction=False)
+      for key, value in map.iteritems():
+        pipeline.set(self.key(key), self.encode(value), ex=int(ttl) if ttl else None)
+      pipeline.execute()
+      return map
+
+    def delete(self, key):
+
+      '''  '''
+
+      self.target.delete(self.key(key))
+
+    def delete_multi(self, keys):
+
+      ''' Delete ``keys`` with one ``DEL``. '''
+
+      keys = [self.key(key) for key in keys]
+      if keys: self.target.delete(*keys)
+
+    def clear(self):
+
+      '''  '''
+
+      keys = [self.prefix + key for key in self.keys()]
+      for index in xrange(0, len(keys), 512):
+        self.target.delete(*keys[index:index + 512])
+      return len(keys)
+
+  class Nearcache(Cache.Engine):
+
+    ''' Fronts another (usually remote) engine with a small, in-process
+        :py:class:`Boundedcache`, so hot keys are served from local memory.
+        Local entries live for at most ``ttl`` seconds. With
+        ``invalidation``, writes are also announced over redis pub/sub, and
+        other nodes drop their local copies as soon as they hear about it. '''
+
+    def __init__(self, target=None, strategy=None, name=None, remote='redis', remote_options=None, ttl=5, max_entries=256, invalidation=None):
+
+      ''' Compose a near cache.
+
+          :param remote: Engine to front - an engine instance, an engine
+          class (or other factory), or the name of a configured engine.
+
+          :param remote_options: Keyword arguments for building ``remote``.
+          :param ttl: Seconds entries may be served locally.
+          :param max_entries: Maximum number of entries held locally.
+
+          :param invalidation: Redis client (anything with ``publish`` and
+          ``pubsub``) to exchange invalidations over, or ``True`` to use the
+          remote engine's client. Defaults to none, leaving stale local
+          entries to expire. '''
+
+      if isinstance(remote, basestring):
+        if remote not in _engines:
+          raise RuntimeError('Unrecognized cache engine: "%s".' % remote)
+        remote = _engines[remote]
+      if not isinstance(remote, Cache.Engine):
+        remote = remote(target=target, strategy=strategy or CacheAPI.PersistentCache(), name=name, **(remote_options or {}))
+
+      super(CacheAPI.Nearcache, self).__init__(remote, remote.strategy, name)
+      self.local, self.ttl = CacheAPI.Boundedcache(max_entries=max_entries, ttl=ttl, name=name), ttl
+
+      self.bus, self.subscription, self.node = (
+        remote.target if invalidation is True else invalidation), None, uuid.uuid4().hex
+      self.channel = 'canteen:cache:invalidate:%s' % (name or '__default__')
+
+      if self.bus:
+        self.subscription = self.bus.pubsub()
+        self.subscription.subscribe(self.channel)
+        listener = threading.Thread(target=self.listen, name='canteen-cache-invalidation')
+        listener.daemon = True
+        listener.start()
+
+    @property
+    def remote(self):
+
+      '''  '''
+
+      return self.target
+
+    @staticmethod
+    def encode(key):
+
+      '''  '''
+
+      return key.encode('utf-8') if isinstance(key, unicode) else key
+
+    def listen(self):
+
+      ''' Drop local entries other nodes have changed, until unsubscribed. '''
+
+      try:
+        for message in self.subscription.listen():
+          if message.get('type') != 'message': continue
+          node, keys = json.loads(message['data'])
+          if node == self.node: continue  # our own writes
+          if keys is None:
+            self.local.clear()
+          else:
+            self.local.delete_multi([self.encode(key) for key in keys])
+      except Exception:  # pragma: nocover
+        pass  # subscription closed
+
+    def invalidate(self, keys):
+
+      ''' Tell other nodes ``keys`` changed (``None`` for everything). '''
+
+      if self.bus:
+        self.bus.publish(self.channel, json.dumps([self.node, keys]))
+
+    def close(self):
+
+      ''' Stop listening for invalidations. '''
+
+      if self.subscription:
+        self.subscription.unsubscribe()
+        if hasattr(self.subscription, 'close'): self.subscription.close()
+        self.subscription = None
+
+    def lifetime(self, ttl):
+
+      ''' Local TTL for an entry stored with ``ttl`` - never longer than
+          the near cache's own. '''
+
+      return min(ttl, self.ttl) if ttl and self.ttl else (ttl or self.ttl)
+
+    def get(self, key, default=None):
+
+      '''  '''
+
+      key = self.encode(key)
+      value = self.local.get(key, _missing)
+      if value is _missing:
+        value = self.remote.get(key, _missing)
+        if value is _missing: return default
+        self.local.set(key, value)
+      return value
+
+    def get_multi(self, keys, default=None):
+
+      ''' Serve ``keys`` locally where possible, fetching the rest from the
+          remote engine in one call. '''
+
+      keys = [self.encode(key) for key in keys]
+      values = self.local.get_multi(keys, _missing)
+      misses = [key for key, value in zip(keys, values) if value is _missing]
+
+      if misses:
+        found = dict((key, value) for key, value in zip(misses, self.remote.get_multi(misses, _missing)) if value is not _missing)
+        self.local.set_multi(found)
+        values = [found.get(key, _missing) if value is _missing else value for key, value in zip(keys, values)]
+      return [default if value is _missing else value for value in values]
+
+    def items(self):
+
+      '''  '''
+
+      return self.remote.items()
+
+    def set(self, key, value, ttl=None):
+
+      ''' Store ``value`` under ``key``, remotely and locally.
+
+          :param ttl: Seconds this entry lives for, where the remote engine
+          supports per-entry TTLs. '''
+
+      key = self.encode(key)
+      if ttl is not None:
+        self.remote.set(key, value, ttl=ttl)
+      else:
+        self.remote.set(key, value)
+
+      self.local.set(key, value, self.lifetime(ttl))
+      self.invalidate([key])
+      return value
+
+    def set_multi(self, map, ttl=None):
+
+      '''  '''
+
+      map = dict((self.encode(key), value) for key, value in map.iteritems())
+      if ttl is not None:
+        self.remote.set_multi(map, ttl=ttl)
+      else:
+        self.remote.set_multi(map)
+
+      self.local.set_multi(map, self.lifetime(ttl))
+      self.invalidate(map.keys())
+      return map
+
+    def delete(self, key):
+
+      '''  '''
+
+      key = self.encode(key)
+      self.remote.delete(key)
+      self.local.delete(key)
+      self.invalidate([key])
+
+    def delete_multi(self, keys):
+
+      '''  '''
+
+      keys = [self.encode(key) for key in keys]
+      self.remote.delete_multi(keys)
+      self.local.delete_multi(keys)
+      self.invalidate(keys)
+
+    def clear(self):
+
+      '''  '''
+
+      self.local.clear()
+      self.invalidate(None)
+      return self.remote.clear()
+
+  __engine__ = Threadcache  # engine for spawned caches - runtimes may swap in a shared one
+
   #### ==== Internals ==== ####
   @property
   def config(self):
@@ -249,20 +1007,41 @@ class CacheAPI(CoreAPI):
 
   #### ==== Cache Management ==== ####
   @decorators.bind('cache.spawn', wrap=staticmethod)
-  def spawn(name=None, target=None, engine=Threadcache, strategy=PersistentCache):
+  def spawn(name=None, target=None, engine=None, strategy=PersistentCache, **options):
 
-    '''  '''
+    ''' Spawn a cache named ``name`` (or the default cache).
+
+        :param engine: :py:class:`Cache.Engine` to use - a class (or other
+        factory), or a ready-built instance, like a :py:class:`Nearcache`
+        composed by hand. Defaults to the ``engine`` named in ``CacheAPI``
+        config (built with its ``options``), falling back to
+        :py:attr:`CacheAPI.__engine__`. Caches canteen keeps internally
+        (like compiled templates) pass an in-process engine explicitly.
+
+        :param options: Extra keyword arguments for the engine.
+        :returns: Engine instance. '''
 
     global _caches
     global _default
 
+    if engine is None:
+      settings = config.Config().config.get('CacheAPI', {})
+      if settings.get('engine'):
+        if settings['engine'] not in _engines:
+          raise RuntimeError('Unrecognized cache engine: "%s".' % settings['engine'])
+        engine, options = _engines[settings['engine']], dict(settings.get('options', {}), **options)
+      else:
+        engine = CacheAPI.__engine__
+
     _localtarget, cache = _default
     if not name:
       if not cache:
-        _default = _caches['__default__'] = (_localtarget, engine(target=_localtarget.__dict__, strategy=strategy()))
+        _default = _caches['__default__'] = (_localtarget, engine if isinstance(engine, Cache.Engine) else (
+          engine(target=_localtarget.__dict__, strategy=strategy(), **options)))
       return _default[1]  # return engine
 
-    _caches[name] = engine(target=target or threading.local().__dict__, strategy=strategy())
+    _caches[name] = engine if isinstance(engine, Cache.Engine) else (
+      engine(target=target or threading.local().__dict__, strategy=strategy(), name=name, **options))
     return _caches[name]
 
   @decorators.bind('cache.clear', wrap=staticmethod)
@@ -302,9 +1081,7 @@ class CacheAPI(CoreAPI):
 
     '''  '''
 
-
-    _cache = cls.spawn()
-    return [_cache.get(key) for key in keys]
+    return cls.spawn().get_multi(keys)
 
   @decorators.bind('cache.set', wrap=classmethod)
   def set(cls, key, value):
@@ -318,9 +1095,7 @@ class CacheAPI(CoreAPI):
 
     '''  '''
 
-    _cache = cls.spawn()
-    for key, value in map.iteritems():
-      _cache.set(key, value)
+    return cls.spawn().set_multi(map)
 
   @decorators.bind('cache.delete', wrap=classmethod)
   def delete(cls, key):
@@ -334,9 +1109,16 @@ class CacheAPI(CoreAPI):
 
     '''  '''
 
-    _cache = cls.spawn()
-    for key in keys:
-      _cache.delete(key)
+    return cls.spawn().delete_multi(keys)
+
+
+_engines = {
+  'thread': CacheAPI.Threadcache,
+  'bounded': CacheAPI.Boundedcache,
+  'mapped': CacheAPI.Mappedcache,
+  'redis': CacheAPI.Rediscache,
+  'near': CacheAPI.Nearcache
+}
 
 
 __all__ = (
@@ -160,6 +160,11 @@ class Session(object):
     if 'REMOTE_ADDR' in environ: self.__session__.client = environ.get('REMOTE_ADDR')
     if 'HTTP_USER_AGENT' in environ: self.__session__.agent = environ.get('HTTP_USER_AGENT')
 
+    # plain sessions can be stored off the request path, if the runtime offers a way to
+    if adapter is None and type(self.__session__) is Session.UserSession:
+      from canteen.core import runtime
+      return runtime.Runtime.offload(store, self.__id__, self.__session__.to_dict())
+
     return self.__session__.put(adapter=adapter)
 
   @classmethod
@@ -191,6 +196,16 @@ class Session(object):
     return models.Key(model, id or Session.generate_token(Session.config.get('salt', '')))
 
 
+def store(id, fields):
+
+  ''' Store a plain session from its ID and fields, as exported by
+      ``to_dict``. Module-level so it can be offloaded by name.
+
+      :returns: Key of the stored session. '''
+
+  return Session(id, **fields).__session__.put()
+
+
 class SessionEngine(object):
 
   '''  '''
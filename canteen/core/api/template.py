@@ -20,8 +20,18 @@
 import os
 import sys
 import json
+import mmap
 import time
+import fcntl
+import base64
+import struct
+import hashlib
+import weakref
 import operator
+import tempfile
+import threading
+import contextlib
+import py_compile
 import importlib
 import itertools
 
@@ -34,9 +44,28 @@ from canteen.util import decorators
 
 ## Globals
 _conditionals = []
+_environments = {}  # process-wide cache of jinja2 environments, by effective config
+_environment_keys = weakref.WeakKeyDictionary()  # effective config key, per config object
 average = lambda x: reduce(operator.add, x)/len(x)
 
 
+def freeze(value):
+
+  '''  '''
+
+  if isinstance(value, dict):
+    return tuple(sorted(((k, freeze(v)) for k, v in value.iteritems())))
+  if isinstance(value, (set, frozenset)):
+    return tuple(sorted((freeze(v) for v in value)))
+  if isinstance(value, (list, tuple)):
+    return tuple((freeze(v) for v in value))
+  try:
+    hash(value)
+  except TypeError:
+    return (type(value).__name__, id(value))  # unhashable and opaque - go by identity
+  return value
+
+
 with runtime.Library('jinja2', strict=True) as (library, jinja2):
 
 
@@ -93,7 +122,9 @@ with runtime.Library('jinja2', strict=True) as (library, jinja2):
           module = importlib.import_module(module)
         except ImportError:
           pass
-      self.cache, self.module = CacheAPI.spawn('tpl_%s' % module if isinstance(module, basestring) else module.__name__), module
+      # templates can't be serialized, so keep them in-process whatever engine other caches use
+      name = 'tpl_%s' % module if isinstance(module, basestring) else module.__name__
+      self.cache, self.module = CacheAPI.spawn(name, engine=CacheAPI.Threadcache), module
 
     def load(self, environment, filename, globals=None):
 
@@ -165,12 +196,371 @@ with runtime.Library('jinja2', strict=True) as (library, jinja2):
     pass
 
 
+  class TemplateCompiler(object):
+
+    ''' Compiles templates ahead-of-time into an importable package, suitable
+        for loading via :py:class:`ModuleLoader`. Rebuilds are incremental:
+        templates are skipped if their mtime or content hash is unchanged. '''
+
+    manifest_name = '.manifest.json'  # build manifest, kept in the target package
+    header = '# -*- coding: utf-8 -*-\n# compiled from template "%s" - do not edit\n'
+
+    def __init__(self, environment, target):
+
+      '''  '''
+
+      self.environment, self.target = environment, os.path.abspath(target)
+
+    @staticmethod
+    def module_path(template):
+
+      ''' Converts a template name to a module file path, mirroring :py:meth:`ModuleLoader.get_module`. '''
+
+      return os.path.join(*os.path.splitext(template.strip('/'))[0].replace('-', '_').split('/')) + '.py'
+
+    @property
+    def fingerprint(self):
+
+      ''' Hash of environment settings that change compiled output - if it changes, everything is rebuilt. '''
+
+      return hashlib.sha1(repr((
+        jinja2.__version__,
+        sorted(map(str, self.environment.extensions)),
+        self.environment.autoescape,
+        self.environment.optimized,
+        getattr(self.environment, 'hamlish_mode', None),
+        getattr(self.environment, 'hamlish_debug', None)))).hexdigest()
+
+    def wrap(self, template, source):
+
+      ''' Wraps jinja2's raw module source in the ``run(environment)`` entrypoint
+          expected by :py:class:`ModuleLoader`. '''
+
+      lines = source.splitlines()
+      split = next((i for i, line in enumerate(lines) if line.startswith('def ')), len(lines))
+
+      return '\n'.join([self.header % template] + lines[:split] + ['', 'def run(environment):'] + [
+        ('    ' + line) if line.strip() else '' for line in lines[split:]] + [
+        '    return root, blocks, debug_info', ''])
+
+    def write(self, module, source):
+
+      ''' Atomically writes a compiled module (and its bytecode), creating
+          intermediate packages as needed. '''
+
+      path = os.path.join(self.target, module)
+      package = os.path.dirname(path)
+
+      if not os.path.isdir(package): os.makedirs(package)
+      while package.startswith(self.target):
+        if not os.path.exists(os.path.join(package, '__init__.py')):
+          open(os.path.join(package, '__init__.py'), 'w').close()
+        if package == self.target: break
+        package = os.path.dirname(package)
+
+      with open(path + '.tmp', 'w') as handle:
+        handle.write(source.encode('utf-8') if isinstance(source, unicode) else source)
+      os.rename(path + '.tmp', path)
+      py_compile.compile(path, doraise=True)
+
+    def remove(self, module):
+
+      '''  '''
+
+      for path in (os.path.join(self.target, module), os.path.join(self.target, module) + 'c'):
+        if os.path.exists(path): os.remove(path)
+
+    def load_manifest(self):
+
+      ''' Load the last build's manifest.
+
+          :returns: ``tuple`` of the environment fingerprint it was built
+          with, and a ``dict`` of its templates. '''
+
+      try:
+        with open(os.path.join(self.target, self.manifest_name), 'r') as handle:
+          manifest = json.load(handle)
+      except (IOError, ValueError):
+        return None, {}
+      return manifest.get('environment'), manifest.get('templates', {})
+
+    def save_manifest(self, templates):
+
+      '''  '''
+
+      if not os.path.isdir(self.target): os.makedirs(self.target)
+      with open(os.path.join(self.target, self.manifest_name), 'w') as handle:
+        json.dump({'environment': self.fingerprint, 'templates': templates}, handle, indent=2, sort_keys=True)
+
+    def compile(self, force=False, extensions=None):
+
+      ''' Compile all templates visible to the environment's loader.
+
+          :param force: Ignore the build manifest and recompile everything.
+          :param extensions: Only compile templates with these file extensions.
+          :returns: ``dict`` of ``compiled``, ``skipped`` and ``removed``
+          template names, and ``failed`` ``(template, error)`` pairs. '''
+
+      # a changed environment rebuilds everything, but the last build still says what to clean up
+      fingerprint, previous = self.load_manifest()
+      rebuild = force or fingerprint != self.fingerprint
+      manifest, modules = {}, {}
+      result = {'compiled': [], 'skipped': [], 'removed': [], 'failed': []}
+
+      for template in self.environment.list_templates(extensions=extensions):
+        if any((segment.startswith('.') for segment in template.split('/'))): continue
+
+        module = self.module_path(template)
+        if module in modules:
+          result['failed'].append((template, 'module "%s" conflicts with template "%s"' % (module, modules[module])))
+          continue
+        modules[module] = template
+
+        try:
+          source, filename, uptodate = self.environment.loader.get_source(self.environment, template)
+        except jinja2.TemplateNotFound as exc:
+          result['failed'].append((template, exc))
+          continue
+
+        entry, mtime = None if rebuild else previous.get(template), os.path.getmtime(filename) if filename else None
+        fresh = entry and entry['module'] == module and os.path.exists(os.path.join(self.target, module))
+
+        # fast path: untouched since last build
+        if fresh and entry['mtime'] == mtime:
+          manifest[template] = entry
+          result['skipped'].append(template)
+          continue
+
+        # touched, but same content - just update the recorded mtime
+        digest = hashlib.sha1(source.encode('utf-8')).hexdigest()
+        if fresh and entry['hash'] == digest:
+          manifest[template] = dict(entry, mtime=mtime)
+          result['skipped'].append(template)
+          continue
+
+        try:
+          self.write(module, self.wrap(template, self.environment.compile(source, template, filename, raw=True, defer_init=True)))
+        except (jinja2.TemplateSyntaxError, py_compile.PyCompileError) as exc:
+          result['failed'].append((template, exc))
+          continue
+
+        manifest[template] = {'mtime': mtime, 'hash': digest, 'module': module}
+        result['compiled'].append(template)
+
+      # clean up modules for templates that have gone away
+      for template, entry in previous.iteritems():
+        if template not in manifest and entry['module'] not in modules:
+          self.remove(entry['module'])
+          result['removed'].append(template)
+
+      self.save_manifest(manifest)
+      return result
+
+
+  class BytecodeCache(jinja2.BytecodeCache):
+
+    ''' Base for canteen's jinja2 bytecode caches. Stale entries are rejected
+        by jinja2 itself (each bucket carries a source checksum), so backends
+        only need to move bytes around. '''
+
+    @staticmethod
+    def configure(config):
+
+      ''' Build a bytecode cache from a ``TemplateAPI`` ``bytecode`` config block.
+
+          :param config: ``dict`` of bytecode cache config. ``engine`` may be
+          ``cache``, ``directory`` or ``mmap``, a :py:class:`BytecodeCache`
+          subclass or an instance of one.
+
+          :returns: Configured cache, or ``None`` if not enabled. '''
+
+      if not config or not config.get('enable', False): return None
+
+      engine = config.get('engine', 'cache')
+      if isinstance(engine, jinja2.BytecodeCache): return engine
+      if isinstance(engine, basestring):
+        if engine not in _bytecode_caches:
+          raise RuntimeError('Unrecognized template bytecode cache: "%s".' % engine)
+        engine = _bytecode_caches[engine]
+      return engine(**config.get('options', {}))
+
+
+  class CacheBytecodeCache(BytecodeCache):
+
+    ''' Stores template bytecode in a :py:class:`CacheAPI` engine. '''
+
+    def __init__(self, name='tpl_bytecode', prefix='bytecode::', engine=None):
+
+      '''  '''
+
+      # in-process unless an engine is given - the configured ``CacheAPI`` engine is for app caches
+      self.prefix = prefix
+      self.cache = CacheAPI.spawn(name, engine=engine or CacheAPI.Threadcache)
+
+    def load_bytecode(self, bucket):
+
+      '''  '''
+
+      code = self.cache.get(self.prefix + bucket.key)
+      if code is not None: bucket.bytecode_from_string(base64.b64decode(code))
+
+    def dump_bytecode(self, bucket):
+
+      '''  '''
+
+      # bytecode is binary - encode it, so engines serializing to text (like ``json``) can hold it
+      self.cache.set(self.prefix + bucket.key, base64.b64encode(bucket.bytecode_to_string()))
+
+    def clear(self):
+
+      '''  '''
+
+      self.cache.clear()
+
+
+  class DirectoryBytecodeCache(BytecodeCache, jinja2.FileSystemBytecodeCache):
+
+    ''' Stores template bytecode as files in a directory. Writes are atomic, so
+        workers sharing a directory never see a partially-written entry. '''
+
+    def __init__(self, directory=None, pattern='__canteen_%s.cache'):
+
+      '''  '''
+
+      jinja2.FileSystemBytecodeCache.__init__(self, directory, pattern)
+      if not os.path.isdir(self.directory): os.makedirs(self.directory)
+
+    def dump_bytecode(self, bucket):
+
+      '''  '''
+
+      fd, temp = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+      try:
+        with os.fdopen(fd, 'wb') as handle:
+          bucket.write_bytecode(handle)
+        os.rename(temp, self._get_cache_filename(bucket))
+      except (IOError, OSError):
+        if os.path.exists(temp): os.remove(temp)
+
+
+  class MappedBytecodeCache(BytecodeCache):
+
+    ''' Stores template bytecode in one fixed-size, memory-mapped file shared by
+        every process on the box. The file is an append-only log guarded by
+        ``flock``: when it fills up it is truncated and a generation counter is
+        bumped, so other processes know to drop their index. '''
+
+    magic = 'CNTNBC01'
+    header = struct.Struct('<8sII')  # magic, generation, used
+    record = struct.Struct('<II')  # key length, data length
+
+    def __init__(self, path=None, size=32 * 1024 * 1024):
+
+      '''  '''
+
+      self.path = path or os.path.join(tempfile.gettempdir(), '_canteen-bytecode-%d.mmap' % os.getuid())
+      self.index, self.generation, self.scanned = {}, None, self.header.size
+      self.lock, self.pid = threading.RLock(), os.getpid()
+
+      self.handle = os.open(self.path, os.O_RDWR | os.O_CREAT, 0600)
+      with self.locked(fcntl.LOCK_EX):
+        if os.fstat(self.handle).st_size < size: os.ftruncate(self.handle, size)
+        self.map = mmap.mmap(self.handle, max(size, os.fstat(self.handle).st_size))
+        if self.map[0:len(self.magic)] != self.magic:
+          self.header.pack_into(self.map, 0, self.magic, 0, self.header.size)
+
+    @contextlib.contextmanager
+    def locked(self, mode):
+
+      ''' Hold an ``flock`` on the backing file (and a lock between this
+          process' threads, which share the descriptor) for a block. '''
+
+      if self.pid != os.getpid():  # forked - locks on an inherited descriptor are shared with the parent
+        inherited, self.pid, self.lock, self.handle = self.handle, os.getpid(), threading.RLock(), os.open(self.path, os.O_RDWR)
+        os.close(inherited)
+
+      with self.lock:
+        fcntl.flock(self.handle, mode)
+        try:
+          yield
+        finally:
+          fcntl.flock(self.handle, fcntl.LOCK_UN)
+
+    def refresh(self):
+
+      ''' Index records appended since our last look (call with a lock held).
+
+          :returns: Number of bytes in use. '''
+
+      magic, generation, used = self.header.unpack_from(self.map, 0)
+      if generation != self.generation:
+        self.index, self.generation, self.scanned = {}, generation, self.header.size
+
+      while self.scanned < used:
+        key_length, data_length = self.record.unpack_from(self.map, self.scanned)
+        start = self.scanned + self.record.size
+        self.index[self.map[start:start + key_length]] = (start + key_length, data_length)
+        self.scanned = start + key_length + data_length
+      return used
+
+    def load_bytecode(self, bucket):
+
+      '''  '''
+
+      with self.locked(fcntl.LOCK_SH):
+        self.refresh()
+        if bucket.key not in self.index: return
+        offset, length = self.index[bucket.key]
+        code = self.map[offset:offset + length]
+      bucket.bytecode_from_string(code)
+
+    def dump_bytecode(self, bucket):
+
+      '''  '''
+
+      data = bucket.bytecode_to_string()
+      size = self.record.size + len(bucket.key) + len(data)
+      if self.header.size + size > len(self.map): return  # would never fit
+
+      with self.locked(fcntl.LOCK_EX):
+        used = self.refresh()
+        if used + size > len(self.map):
+          self.header.pack_into(self.map, 0, self.magic, self.generation + 1, self.header.size)
+          used = self.refresh()
+
+        self.record.pack_into(self.map, used, len(bucket.key), len(data))
+        self.map[used + self.record.size:used + size] = bucket.key + data
+        self.header.pack_into(self.map, 0, self.magic, self.generation, used + size)
+        self.refresh()
+
+    def clear(self):
+
+      '''  '''
+
+      with self.locked(fcntl.LOCK_EX):
+        self.refresh()
+        self.header.pack_into(self.map, 0, self.magic, self.generation + 1, self.header.size)
+        self.refresh()
+
+
+  _bytecode_caches = {
+    'cache': CacheBytecodeCache,
+    'directory': DirectoryBytecodeCache,
+    'mmap': MappedBytecodeCache
+  }
+
+
   # add loaders to exported items
   _conditionals += [
     'TemplateLoader',
     'FileLoader',
     'ModuleLoader',
-    'ExtensionLoader'
+    'ExtensionLoader',
+    'TemplateCompiler',
+    'BytecodeCache',
+    'CacheBytecodeCache',
+    'DirectoryBytecodeCache',
+    'MappedBytecodeCache'
   ]
 
 
@@ -179,6 +569,8 @@ class TemplateAPI(CoreAPI):
 
   '''  '''
 
+  default_buffer = 5  # template events to buffer per chunk, when streaming
+
   with runtime.Library('jinja2') as (library, jinja2):
 
     '''  '''
@@ -257,22 +649,55 @@ class TemplateAPI(CoreAPI):
 
         return environment
 
-    def environment(self, handler, config):
+    def options(self, config):
 
-      '''  '''
+      ''' Resolve ``TemplateAPI`` options and the template path from `config`.
 
-      import jinja2
+          :returns: ``tuple`` of ``(output, path)``. '''
 
       # grab template path, if any
       output = config.get('TemplateAPI', {'debug': True})
       path = config.app.get('paths', {}).get('templates')
-      jinja2_cfg = output.get('jinja2', self.default_config)
 
       if not path:
         # default path to cwd, and cwd + templates/, and cwd + templates/source
         cwd = os.getcwd()
         path = (os.path.join(cwd), os.path.join(cwd, 'templates'), os.path.join(cwd, 'templates', 'source'))
 
+      return output, path
+
+    def environment(self, handler, config):
+
+      '''  '''
+
+      # keys are derived once per config object, rather than walking config on every render
+      key = _environment_keys.get(config)
+      if key is None:
+        output, path = self.options(config)
+        key = _environment_keys[config] = (freeze(output), freeze(path), bool(config.debug))
+
+      # environments are cached process-wide, so jinja's compiled template cache survives between renders
+      if key not in _environments:
+        _environments[key] = self.build_environment(handler, config, *self.options(config))
+      return _environments[key]
+
+    @decorators.bind('template.invalidate', wrap=staticmethod)
+    def invalidate():
+
+      '''  '''
+
+      count = len(_environments)
+      _environments.clear(), _environment_keys.clear()
+      return count
+
+    def build_environment(self, handler, config, output, path):
+
+      '''  '''
+
+      # copy so we never write loaders or extensions back into app config
+      jinja2_cfg = dict(output.get('jinja2', self.default_config))
+      if jinja2_cfg.get('extensions'): jinja2_cfg['extensions'] = list(jinja2_cfg['extensions'])
+
       # shim-in our loader system, unless it is overriden in config
       if 'loader' not in jinja2_cfg:
 
@@ -285,6 +710,10 @@ class TemplateAPI(CoreAPI):
         if 'loader' not in jinja2_cfg:
           raise RuntimeError('No configured template source path.')
 
+      # share compiled template bytecode between workers, if configured
+      if 'bytecode_cache' not in jinja2_cfg and output.get('bytecode'):
+        jinja2_cfg['bytecode_cache'] = BytecodeCache.configure(output['bytecode'])
+
       # make our new environment
       j2env = self.syntax(handler, self.engine.Environment, jinja2_cfg, config)
 
@@ -382,14 +811,22 @@ class TemplateAPI(CoreAPI):
 
     '''  '''
 
-    # render template & return content iterato)
-    content = self.environment(handler, config).get_template(template).render(**context)
+    # resolve template from (cached) environment
+    template = self.environment(handler, config).get_template(template)
 
     # if _direct is requested, sanitize and roll-up buffer immediately
-    if _direct: return self.sanitize(content, _iter=False)
+    if _direct: return self.sanitize(template.render(**context), _iter=False)
+
+    # in streaming mode, hand jinja's generator straight to the WSGI iterable
+    stream_config = config.get('TemplateAPI', {'debug': True}).get('stream', {})
+    if stream_config.get('enable', False):
+      stream = template.stream(**context)
+      if stream_config.get('buffer', self.default_buffer) > 1:
+        stream.enable_buffering(stream_config.get('buffer', self.default_buffer))
+      return stream
 
     # otherwise, buffer/chain iterators to produce a streaming response
-    return self.sanitize(content, _iter=True)
+    return self.sanitize(template.render(**context), _iter=True)
 
 
 __all__ = tuple([
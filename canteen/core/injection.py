@@ -17,10 +17,48 @@
 
 '''
 
+# stdlib
+import inspect
+
 # canteen meta
 from .meta import Proxy
 
 
+## Globals
+_MISSING = object()  # marks attributes that could not be resolved
+
+
+def resolve(klass, key):
+
+  ''' Resolve an injected attribute through the collapsed component bridge.
+
+      :param klass: Class the attribute was requested on.
+      :param key: Name of the requested attribute.
+
+      :returns: ``(value, attribute)`` pair. If ``attribute`` is set, it must be
+      looked up on ``value`` at access time (for instance, properties). Otherwise
+      ``value`` is stable and returned directly. '''
+
+  try:
+    bridge = Proxy.Component.collapse(klass)
+  except KeyError:  # pragma: nocover
+    raise AttributeError('Could not resolve attribute \'%s\''
+                         ' on item \'%s\'.' % (key, klass))
+
+  if key not in bridge: return _MISSING, None
+  if not isinstance(bridge[key], tuple): return bridge[key], None  # return value directly if it's not a tuple
+
+  # bridge key is tuple of (responder, attribute) - methods bind once, anything else stays live
+  responder, attribute = bridge[key]
+  for base in inspect.getmro(responder if isinstance(responder, type) else type(responder)):
+    if attribute in base.__dict__:
+      if isinstance(base.__dict__[attribute], (staticmethod, classmethod)) or inspect.isfunction(base.__dict__[attribute]):
+        if isinstance(responder, type) or attribute not in getattr(responder, '__dict__', {}):
+          return getattr(responder, attribute), None
+      break
+  return responder, attribute
+
+
 class Delegate(object):
 
   ''' '''
@@ -49,22 +87,25 @@ class Delegate(object):
 
         '''  '''
 
-        # @TODO(sgammon): make things not jank here (for instance, don't `collapse` every time)
+        # resolved attributes are cached per-delegate, until components change
+        resolved = klass.__resolved__
+        if resolved.get(None) != Proxy.Component.__generation__:
+          resolved.clear()
+          resolved[None] = Proxy.Component.__generation__
+
         try:
-          bridge = Proxy.Component.collapse(klass)
-          if key in bridge:
-            if isinstance(bridge[key], tuple):
-              return getattr(*bridge[key])  # bridge key is tuple of (responder, attribute)
-            return bridge[key]  # return value directly if it's not a tuple
+          value, attribute = resolved[key]
+        except KeyError:
+          value, attribute = resolved[key] = resolve(klass, key)
 
+        if value is _MISSING:
           raise AttributeError('Could not resolve attribute \'%s\'.' % key)
-        except KeyError:  # pragma: nocover
-          raise AttributeError('Could not resolve attribute \'%s\''
-                               ' on item \'%s\'.' % (key, klass))
+        return getattr(value, attribute) if attribute else value
 
       # inject properties onto MRO delegate, then construct
       return type.__new__(cls.__class__, 'Delegate', (object,), {
         '__bridge__': None,
+        '__resolved__': {},
         '__getattr__': classmethod(injection_responder),
         '__metaclass__': cls,
         '__repr__': cls.__repr__,
@@ -117,14 +117,16 @@ class Proxy(object):
     '''  '''
 
     __chain__ = {}
+    __roots__ = {}  # root class for each metabucket
+    __children__ = None  # precomputed child lists, once frozen (see ``freeze``)
 
     def iter_children(cls):
 
       '''  '''
 
-      for obj in cls.__chain__[owner(cls)]:
-        if obj is cls: continue  # skip the parent class
-        yield obj
+      if Proxy.Registry.__children__ is not None and cls in Proxy.Registry.__children__:
+        return iter(Proxy.Registry.__children__[cls])
+      return (obj for obj in cls.__chain__[owner(cls)] if obj is not cls)  # skip the parent class
 
     def children(cls):
 
@@ -139,10 +141,11 @@ class Proxy(object):
       '''  '''
 
       _owner = owner(target)
+      Proxy.Registry.__children__ = None  # registering after a freeze thaws the registry
 
       # check to see if bases are only roots, if it is a root create a new metabucket
       if not any(((False if x in (object, type) else True) for x in target.__bases__)):
-        meta.__chain__[_owner] = []
+        meta.__chain__[_owner], meta.__roots__[_owner] = [], target
         return target
 
       # resolve owner and construct
@@ -159,6 +162,7 @@ class Proxy(object):
 
     __target__ = None
     __binding__ = None
+    __generation__ = 0  # bumped whenever injection bindings may have changed
     __injector_cache__ = {}
     __map__ = {}  # holds map of all platform instances
 
@@ -176,8 +180,18 @@ class Proxy(object):
 
       cls.__injector_cache__ = {}
       cls.__class__.__injector_cache__ = {}
+      Proxy.Component.__injector_cache__ = {}
+      Proxy.Component.__generation__ += 1  # invalidates delegates' resolved attributes
       return
 
+    @staticmethod
+    def register(meta, target):
+
+      '''  '''
+
+      Proxy.Component.reset_cache()
+      return Proxy.Registry.register(meta, target)
+
     @staticmethod
     def collapse(cls, spec=None):
 
@@ -293,8 +307,55 @@ class Proxy(object):
       return target  # pragma: nocover
 
 
+def freeze():
+
+  ''' Eagerly build lazy registry state, once the app is loaded: child lists
+      for every registered class, singleton instances, and the collapsed
+      bridge (and resolved attributes) for every ``Compound`` class. Worker
+      threads then only ever read these structures. Registering anything
+      new afterwards thaws the registry, falling back to lazy resolution.
+
+      :returns: ``int`` count of ``Compound`` classes that were collapsed. '''
+
+  from . import injection
+
+  # child lists, for every registered class and metabucket root
+  children = {}
+  for _owner, chain in Proxy.Registry.__chain__.iteritems():
+    for klass in chain + ([Proxy.Registry.__roots__[_owner]] if _owner in Proxy.Registry.__roots__ else []):
+      if owner(klass) in Proxy.Registry.__chain__:
+        children[klass] = tuple(obj for obj in Proxy.Registry.__chain__[owner(klass)] if obj is not klass)
+
+  # singletons
+  for chain in Proxy.Registry.__chain__.itervalues():
+    for concrete in chain:
+      if issubclass(concrete.__class__, Proxy.Component) and getattr(concrete, '__singleton__', False):
+        Proxy.Component.prepare(concrete)
+
+  # collapsed bridges, for every compound class and its subclasses
+  compounds, pending = set(), list(injection.Compound.__seen__)
+  while pending:
+    klass = pending.pop()
+    if klass in compounds: continue
+    compounds.add(klass)
+    pending.extend(klass.__subclasses__())
+
+  for klass in compounds:
+    bridge = Proxy.Component.collapse(klass)
+    resolved = klass.__resolved__
+    if resolved.get(None) != Proxy.Component.__generation__:
+      resolved.clear()
+      resolved[None] = Proxy.Component.__generation__
+    for key in bridge:
+      if key not in resolved: resolved[key] = injection.resolve(klass, key)
+
+  Proxy.Registry.__children__ = children
+  return len(compounds)
+
+
 __all__ = (
   'MetaFactory',
   'Base',
-  'Proxy'
+  'Proxy',
+  'freeze'
 )
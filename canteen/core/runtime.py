@@ -19,14 +19,21 @@
 import os
 import sys
 import abc
-import time
+import signal
+import atexit
 import inspect
 import importlib
+import threading
 
 # core API
-from .meta import Proxy
+from .meta import Proxy, freeze
 from .injection import Bridge
 
+# canteen util
+from ..util import debug
+from ..util import struct
+from ..util import timing
+
 
 class Runtime(object):
 
@@ -34,14 +41,18 @@ class Runtime(object):
 
   # == Public Properties == #
 
-  routes = None  # compiled route map
   config = None  # application config
   bridge = None  # window into the injection pool
+  collector = None  # request timing collector, if timing is enabled
   application = None  # WSGI application callable or delegate
 
   # == Private Properties == #
+  __context__ = None  # per-thread request context (``threading.local``, or greenlet-local under gevent)
   __hooks__ = {}  # mapped hookpoints and methods to call
+  __offload__ = None  # callable running deferred work off the request path, if the runtime has one
+  __pipeline__ = None  # compiled hookpoints, mapped to tuples of bound callables
   __owner__ = "Runtime"  # metabucket owner name for subclasses
+  __timing__ = False  # whether to emit a `Server-Timing` header
   __wrapped__ = None  # wrapped dispatch method calculated on first request
   __singleton__ = False  # many runtimes can exist, so power
   __metaclass__ = Proxy.Component  # this should be injectable
@@ -55,27 +66,36 @@ class Runtime(object):
     return False
 
   @classmethod
-  def spawn(cls, app):
+  def spawn(cls, app, name=None):
 
     '''  '''
 
-    return (cls.resolve() if cls is Runtime else cls)(app)  # if we're running as ``Runtime``, resolve a runtime first
+    return (cls.resolve(name) if cls is Runtime else cls)(app)  # if we're running as ``Runtime``, resolve a runtime first
 
   @classmethod
-  def resolve(cls):
+  def resolve(cls, name=None):
 
     '''  '''
 
+    importlib.import_module('canteen.runtime')  # make sure the bundled runtimes are registered
+
+    # runtimes can be selected explicitly, by (lowercased) class name
+    if name:
+      for child in cls.iter_children():
+        if child.__name__.lower() == name.lower(): return child
+      raise RuntimeError('No runtime named "%s" is available.' % name)
+
     # @TODO(sgammon): figure out how to prioritize/select a runtime
     _default, _preferred = None, []
     for child in cls.iter_children():
+      if getattr(child, '__explicit__', False): continue  # only used when asked for by name
       if hasattr(child, '__default__') and child.__default__:
         _default = child
         continue
       _preferred.append(child)
 
     if _preferred:
-      return _preferred[0]  # Werkzeug
+      return max(_preferred, key=lambda child: getattr(child, '__priority__', 0))  # Werkzeug, unless something ranks higher
     return _default  # WSGIref
 
   @classmethod
@@ -86,6 +106,7 @@ class Runtime(object):
     assert isinstance(hook, basestring), "hook name must be a string"
     if hook not in cls.__hooks__: cls.__hooks__[hook] = []
     cls.__hooks__[hook].append((context, func))
+    Runtime.__pipeline__ = None  # invalidate compiled hooks, rebuilt on next use
     return cls
 
   @classmethod
@@ -98,51 +119,133 @@ class Runtime(object):
         yield i
     raise StopIteration()
 
+  @staticmethod
+  def bind_hook(context, hook):
+
+    '''  '''
+
+    # classmethods and staticmethods bind directly against their context
+    if isinstance(hook, (classmethod, staticmethod)):
+      return hook.__get__(None, context)
+
+    # must have a singleton if we're running in object context
+    if not hasattr(context, '__singleton__') or not context.__singleton__:
+      raise RuntimeError('Cannot execute hook method "%s" without matching singleton context.' % hook)
+
+    # resolve singleton by context name
+    obj = Proxy.Component.singleton_map.get(context.__name__)
+    if not obj: raise RuntimeError('No matching singleton for hook method "%s".' % hook)
+
+    # bind to singleton context
+    return hook.__get__(obj, context)
+
   @classmethod
-  def execute_hooks(cls, points, *args, **kwargs):
+  def pending_hook(cls, context, hook):
+
+    ''' Wrap a hook that can't be bound yet. It tries to bind on every call
+        (failing like any other hook until it can), and once bound, has the
+        pipeline recompiled around the bound hook. '''
+
+    def pending(*args, **kwargs):
+
+      '''  '''
+
+      bound = cls.bind_hook(context, hook)
+      Runtime.__pipeline__ = None  # recompile on next use, now that it binds
+      return bound(*args, **kwargs)
+
+    return pending
+
+  @classmethod
+  def compile_hooks(cls):
 
     '''  '''
 
-    if isinstance(points, basestring): points = (points,)
-    for point in points:
-      for context, hook in cls.get_hooks(point):
+    pipeline = {}
+    for point, hooks in cls.__hooks__.iteritems():
+      bound = []
+      for context, hook in hooks:
         try:
-          # run as classmethod
-          if isinstance(hook, classmethod):
-            hook.__func__(context, *args, **kwargs)
+          bound.append(cls.bind_hook(context, hook))
+        except RuntimeError:
+          bound.append(cls.pending_hook(context, hook))  # singleton not ready yet - bind on use
+      if bound: pipeline[point] = tuple(bound)
 
-          # run as staticmethod
-          elif isinstance(hook, staticmethod):
-            hook.__func__(*args, **kwargs)
+    Runtime.__pipeline__ = pipeline
+    return pipeline
 
-          else:
+  @classmethod
+  def resolve_hooks(cls, points):
+
+    '''  '''
 
-            # must have a singleton if we're running in object context
-            if not hasattr(context, '__singleton__') or not context.__singleton__:
-              raise RuntimeError('Cannot execute hook method "%s" without matching singleton context.' % hook)
+    pipeline = Runtime.__pipeline__
+    if pipeline is None: pipeline = cls.compile_hooks()
 
-            # resolve singleton by context name
-            obj = Proxy.Component.singleton_map.get(context.__name__)
-            if not obj: raise RuntimeError('No matching singleton for hook method "%s".' % hook)
+    # compound hook points are flattened once and remembered
+    if not isinstance(points, basestring) and points not in pipeline:
+      pipeline[points] = tuple(hook for point in points for hook in pipeline.get(point, ()))
+    return pipeline.get(points, ())
 
-            # run in singleton context
-            hook(obj, *args, **kwargs)
+  @classmethod
+  def execute_hooks(cls, points, *args, **kwargs):
+
+    '''  '''
+
+    return cls.run_hooks(cls.resolve_hooks(points), *args, **kwargs)
+
+  @staticmethod
+  def run_hooks(hooks, *args, **kwargs):
 
-        except Exception as e:
-          if __debug__:
-            raise
+    ''' Call hooks already resolved by :py:meth:`resolve_hooks`. '''
+
+    for hook in hooks:
+      try:
+        hook(*args, **kwargs)
+      except Exception as e:
+        if __debug__:
+          raise
 
     return
 
+  @classmethod
+  def offload(cls, func, *args, **kwargs):
+
+    ''' Run ``func(*args, **kwargs)`` off the request path, if the active
+        runtime offers a way to (see :py:attr:`__offload__`), or inline.
+        Offloaded work may run in another process, so ``func`` should be
+        a module-level function taking picklable arguments.
+
+        :returns: Result of ``func``, if it ran inline. '''
+
+    if Runtime.__offload__ is not None:
+      return Runtime.__offload__(func, *args, **kwargs)
+    return func(*args, **kwargs)
+
   def __init__(self, app):
 
     '''  '''
 
-    self.application, self.bridge = (
+    self.application, self.bridge, self.__context__ = (
       app,
-      Bridge()
+      Bridge(),
+      threading.local()
     )
 
+  @property
+  def routes(self):
+
+    ''' Route map bound to the request being served by this thread. '''
+
+    return getattr(self.__context__, 'routes', None)
+
+  @routes.setter
+  def routes(self, routes):
+
+    '''  '''
+
+    self.__context__.routes = routes
+
   def initialize(self):
 
     '''  '''
@@ -154,9 +257,33 @@ class Runtime(object):
     '''  '''
 
     self.config = config
+
+    # setup request timing, if enabled
+    timing_config = config.app.get('timing', {})
+    self.collector, self.__timing__ = (
+      timing.Collector.configure(timing_config),
+      timing_config.get('header', False)
+    )
+
     self.initialize()  # let subclasses initialize
+    self.compile_hooks()  # bind hooks once, up front
+    freeze()  # app is loaded - precompute registry state for workers
     return self
 
+  @property
+  def prefork(self):
+
+    '''  '''
+
+    return self.config.app.get('prefork', {}) if self.config else {}
+
+  @property
+  def threaded(self):
+
+    '''  '''
+
+    return self.config.app.get('threaded', {}) if self.config else {}
+
   def serve(self, interface, port, bind_only=False):
 
     '''  '''
@@ -166,12 +293,65 @@ class Runtime(object):
     if bind_only:
       return server
 
+    # production: bind once, then fork workers that share the listener
+    if self.prefork.get('enable', False):
+      from ..runtime import prefork
+      return prefork.Supervisor(self, server, **self.prefork.get('options', {})).run()
+
     try:
-      server.serve_forever()
+      self.work(server)
     except (KeyboardInterrupt, Exception) as e:
       print "Exiting."
       sys.exit(0)
 
+  def work(self, server):
+
+    ''' Serve requests from a bound ``server`` until ``SIGTERM`` or
+        ``SIGINT``, letting requests in progress finish. '''
+
+    pool = None
+
+    # threaded: serve from a bounded pool, rather than one request at a time
+    if self.threaded.get('enable', False):
+      from ..runtime import threaded
+      pool = threaded.ThreadPool(server, **self.threaded.get('options', {})).start()
+
+    worker, stop = threading.Thread(target=server.serve_forever), threading.Event()
+    worker.daemon = True
+
+    # signals can only be handled on the main thread - elsewhere, serve until ``server.shutdown()``
+    if isinstance(threading.current_thread(), threading._MainThread):
+      for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+
+    worker.start()
+    while not stop.is_set() and worker.is_alive():
+      stop.wait(1)  # wake up periodically, so signal handlers get to run
+
+    server.shutdown()
+    worker.join()
+    if pool: pool.stop()
+
+  def pending(self, result):
+
+    ''' Test whether a handler ``result`` is still to be resolved, as
+        with coroutines returned by async handler methods. Runtimes that
+        can await results override this, along with :py:meth:`defer`. '''
+
+    return False
+
+  def defer(self, result, respond):
+
+    ''' Finish a request once a pending handler ``result`` resolves.
+
+        :param result: Pending result, for which :py:meth:`pending` holds.
+        :param respond: Callable that turns the resolved result into a WSGI
+        response iterable, running response hooks along the way.
+
+        :returns: Whatever the runtime's server expects from the app. '''
+
+    raise NotImplementedError('Runtime "%s" cannot await handler results.' % self.__class__.__name__)
+
   def bind_environ(self, environ):
 
     '''  '''
@@ -191,22 +371,32 @@ class Runtime(object):
 
     from ..base import handler as base_handler
 
-    start, latency = time.clock(), lambda: "Responded in %sms." % (str(round((time.clock() - start) * 1000, 2)))  # start response clock
+    timer = timing.Timing(self.collector, self.__timing__).bind(environ) if self.collector is not None else None  # start request timing
+    hooks = self.resolve_hooks  # compiled hook pipeline - empty hookpoints cost nothing
 
     # call dispatch hooks
-    self.execute_hooks('dispatch', environ=environ, start_response=start_response)
+    bound = hooks('dispatch')
+    if bound:
+      self.run_hooks(bound, environ=environ, start_response=start_response)
 
     # resolve URL via bound routes
     http, request, response = self.bind_environ(environ)
+    if timer: timer.mark('bind_environ')
 
     # call request hooks
-    self.execute_hooks('request', request=request, http=http)
+    bound = hooks('request')
+    if bound:
+      self.run_hooks(bound, request=request, http=http)
 
     # match route
     endpoint, arguments = self.routes.match()
+    environ['canteen.endpoint'] = endpoint
 
     # call match hooks
-    self.execute_hooks('match', environ=environ, endpoint=endpoint, arguments=arguments, request=request, http=http)
+    bound = hooks('match')
+    if bound:
+      self.run_hooks(bound, environ=environ, endpoint=endpoint, arguments=arguments, request=request, http=http)
+    if timer: timer.mark('match')
 
     # resolve endpoint
     handler = http.resolve_route(endpoint)
@@ -214,19 +404,22 @@ class Runtime(object):
     if not handler:  # `None` for handler means it didn't match
 
       # dispatch error hook for 404
-      self.execute_hooks(('error', 'complete'), **{
-        'code': 404,
-        'error': True,
-        'exception': None,
-        'http': http,
-        'request': request,
-        'runtime': self,
-        'endpoint': endpoint,
-        'environ': environ,
-        'arguments': arguments,
-        'response': None
-      })
+      bound = hooks(('error', 'complete'))
+      if bound:
+        self.run_hooks(bound, **{
+          'code': 404,
+          'error': True,
+          'exception': None,
+          'http': http,
+          'request': request,
+          'runtime': self,
+          'endpoint': endpoint,
+          'environ': environ,
+          'arguments': arguments,
+          'response': None
+        })
 
+      if timer: timer.finish(endpoint)
       http.error(404)
 
     # class-based pages/handlers
@@ -243,52 +436,69 @@ class Runtime(object):
       })
 
       # call handler hooks
-      self.execute_hooks('handler', **{
-        'handler': flow,
-        'environ': environ,
-        'start_response': start_response
-      })
+      bound = hooks('handler')
+      if bound:
+        self.run_hooks(bound, **{
+          'handler': flow,
+          'environ': environ,
+          'start_response': start_response
+        })
+      if timer: timer.mark('resolve')
 
       # dispatch time: INCEPTION.
       result = flow(arguments)
 
-      if isinstance(result, tuple):
+      def _respond(result):
 
-        status, headers, content_type, content = result
+        '''  '''
 
-        _response = response.__class__(content, **{
-          'status': status,
-          'headers': headers,
-          'mimetype': content_type
-        })
+        if timer: timer.mark('execute')
 
-        # call response hooks
-        self.execute_hooks(('response', 'complete'), **{
-          'http': http,
-          'status': status,
-          'request': request,
-          'headers': headers,
-          'content': content,
-          'environ': environ,
-          'response': _response
-        })
+        if isinstance(result, tuple):
 
-        print latency()
-        return _response(environ, start_response)
+          status, headers, content_type, content = result
 
-      # call response hooks
-      self.execute_hooks(('response', 'complete'), **{
-        'http': http,
-        'status': result.status,
-        'request': request,
-        'headers': result.headers,
-        'content': result.response,
-        'environ': environ,
-        'response': response
-      })
+          _response = response.__class__(content, **{
+            'status': status,
+            'headers': headers,
+            'mimetype': content_type
+          })
+
+          # call response hooks
+          bound = hooks(('response', 'complete'))
+          if bound:
+            self.run_hooks(bound, **{
+              'http': http,
+              'status': status,
+              'request': request,
+              'headers': headers,
+              'content': content,
+              'environ': environ,
+              'response': _response
+            })
+
+          if timer: timer.mark('response'), timer.finish(endpoint, _response.headers)
+          return _response(environ, start_response)
 
-      print latency()
-      return result(environ, start_response)  # it's a werkzeug Response
+        # call response hooks
+        bound = hooks(('response', 'complete'))
+        if bound:
+          self.run_hooks(bound, **{
+            'http': http,
+            'status': result.status,
+            'request': request,
+            'headers': result.headers,
+            'content': result.response,
+            'environ': environ,
+            'response': response
+          })
+
+        if timer: timer.mark('response'), timer.finish(endpoint, result.headers)
+        return result(environ, start_response)  # it's a werkzeug Response
+
+      # awaitable results (from async handler methods) are finished by the runtime once resolved
+      if self.pending(result): return self.defer(result, _respond)
+      return _respond(result)
 
     # delegated class-based handlers (for instance, other WSGI apps)
     elif isinstance(handler, type) or callable(handler):
@@ -298,18 +508,21 @@ class Runtime(object):
 
         '''  '''
 
-        print latency()
+        if timer: timer.mark('execute')
 
         # call response hooks
-        self.execute_hooks(('response', 'complete'), **{
-          'http': http,
-          'status': status,
-          'request': request,
-          'headers': headers,
-          'environ': environ,
-          'response': None
-        })
+        bound = hooks(('response', 'complete'))
+        if bound:
+          self.run_hooks(bound, **{
+            'http': http,
+            'status': status,
+            'request': request,
+            'headers': headers,
+            'environ': environ,
+            'response': None
+          })
 
+        if timer: timer.mark('response'), timer.finish(endpoint, headers)
         return start_response(status, headers)
 
       # attach runtime, arguments and actual start_response to shim
@@ -318,40 +531,52 @@ class Runtime(object):
       _foreign_runtime_bridge.start_response = start_response
 
       # initialize foreign handler with replaced start_response
+      if timer: timer.mark('resolve')
       return handler(environ, _foreign_runtime_bridge)
 
     # is it a function, maybe?
     if inspect.isfunction(handler):
 
-      # inject stuff into context
-      for prop, val in (
-        ('runtime', self),
-        ('self', self.bridge),
-        ('arguments', arguments),
-        ('request', request),
-        ('response', response),
-        ('environ', environ),
-        ('start_response', start_response),
-        ('Response', response.__class__)):
+      # bind per-request values to this thread's context
+      context = self.__context__
+      context.arguments, context.request, context.response, context.environ, context.start_response = (
+        arguments, request, response, environ, start_response)
+
+      # inject stuff into the handler's module, once - per-request values go in as proxies to the context
+      if handler.__globals__.get('runtime') is not self:
+        for prop, val in (
+          ('runtime', self),
+          ('self', self.bridge),
+          ('arguments', struct.LocalProxy(context, 'arguments')),
+          ('request', struct.LocalProxy(context, 'request')),
+          ('response', struct.LocalProxy(context, 'response')),
+          ('environ', struct.LocalProxy(context, 'environ')),
+          ('start_response', struct.LocalProxy(context, 'start_response')),
+          ('Response', response.__class__)):
 
-        handler.__globals__[prop] = val  # inject all the things
+          handler.__globals__[prop] = val  # inject all the things
+
+      if timer: timer.mark('resolve')
 
       # call with arguments only
       result = handler(**arguments)
+      if timer: timer.mark('execute')
       if isinstance(result, response.__class__):
 
         # call response hooks
-        self.execute_hooks(('response', 'complete'), **{
-          'http': http,
-          'status': status,
-          'request': request,
-          'headers': result.headers,
-          'content': result.content,
-          'environ': environ,
-          'response': result
-        })
+        bound = hooks(('response', 'complete'))
+        if bound:
+          self.run_hooks(bound, **{
+            'http': http,
+            'status': status,
+            'request': request,
+            'headers': result.headers,
+            'content': result.content,
+            'environ': environ,
+            'response': result
+          })
 
-        print latency()
+        if timer: timer.mark('response'), timer.finish(endpoint, result.headers)
         return response(environ, start_response)  # it's a Response class - call it to start_response
 
       # a tuple bound to a URL - static response
@@ -362,19 +587,20 @@ class Runtime(object):
           headers = [('Content-Type', 'text/html; charset=utf-8')]
 
           # call response hooks
-          self.execute_hooks(('response', 'complete'), **{
-            'http': http,
-            'status': status,
-            'request': request,
-            'headers': headers,
-            'content': response,
-            'environ': environ,
-            'response': response
-          })
-
+          bound = hooks(('response', 'complete'))
+          if bound:
+            self.run_hooks(bound, **{
+              'http': http,
+              'status': status,
+              'request': request,
+              'headers': headers,
+              'content': response,
+              'environ': environ,
+              'response': response
+            })
+
+          if timer: timer.mark('response'), timer.finish(endpoint, headers)
           start_response(status, headers)
-
-          print latency()
           return iter([response])
 
         if len(result) == 3:  # it's (status_code, headers, response)
@@ -386,19 +612,20 @@ class Runtime(object):
               headers['Content-Type'] = 'text/html; charset=utf-8'
 
           # call response hooks
-          self.execute_hooks(('response', 'complete'), **{
-            'http': http,
-            'status': status,
-            'request': request,
-            'headers': headers,
-            'content': response,
-            'environ': environ,
-            'response': response
-          })
-
+          bound = hooks(('response', 'complete'))
+          if bound:
+            self.run_hooks(bound, **{
+              'http': http,
+              'status': status,
+              'request': request,
+              'headers': headers,
+              'content': response,
+              'environ': environ,
+              'response': response
+            })
+
+          if timer: timer.mark('response'), timer.finish(endpoint, headers)
           start_response(status, headers)
-
-          print latency()
           return iter([response])
 
       elif isinstance(result, basestring):
@@ -406,19 +633,20 @@ class Runtime(object):
         status, headers = '200 OK', [('Content-Type', 'text/html; charset=utf-8')]
 
         # call response hooks
-        self.execute_hooks(('response', 'complete'), **{
-          'http': http,
-          'status': status,
-          'request': request,
-          'headers': headers,
-          'content': result,
-          'environ': environ,
-          'response': result
-        })
+        bound = hooks(('response', 'complete'))
+        if bound:
+          self.run_hooks(bound, **{
+            'http': http,
+            'status': status,
+            'request': request,
+            'headers': headers,
+            'content': result,
+            'environ': environ,
+            'response': result
+          })
 
+        if timer: timer.mark('response'), timer.finish(endpoint, headers)
         start_response(status, headers)
-
-        print latency()
         return iter([result])
 
     # could be a bound response
@@ -428,15 +656,19 @@ class Runtime(object):
         status, headers = '200 OK', [('Content-Type', 'text/html; charset=utf-8')]
 
         # call response hooks
-        self.execute_hooks(('response', 'complete'), **{
-          'http': http,
-          'status': status,
-          'request': request,
-          'headers': headers,
-          'content': handler,
-          'environ': environ,
-          'response': handler
-        })
+        bound = hooks(('response', 'complete'))
+        if bound:
+          self.run_hooks(bound, **{
+            'http': http,
+            'status': status,
+            'request': request,
+            'headers': headers,
+            'content': handler,
+            'environ': environ,
+            'response': handler
+          })
+
+        if timer: timer.mark('response'), timer.finish(endpoint)
 
         # it's a static response!
         return iter([handler])
@@ -465,32 +697,45 @@ class Runtime(object):
           except ImportError as e:
             import profile
 
-          ## calculate dump file path
-          profile_path = dev_config['profiler'].get('dump_file', os.path.abspath(os.path.join(os.getcwd(), '.develop', 'app.profile')))
-
-          ## current profile
-          _current_profile = profile.Profile(**dev_config['profiler'].get('profile_kwargs', {}))
+          profiler_config = dev_config['profiler']
 
           ## handle flushing mechanics
-          if dev_config['profiler'].get('on_request', True):
+          if profiler_config.get('on_request', True):
+
+            ## calculate dump file path
+            profile_path = profiler_config.get('dump_file', os.path.abspath(os.path.join(os.getcwd(), '.develop', 'app.profile')))
+
+            ## current profile
+            _current_profile = profile.Profile(**profiler_config.get('profile_kwargs', {}))
 
-            def maybe_flush_profile():
+            def _dispatch(*args, **kwargs):
 
-              '''  '''
+              ''' Wrapper to enable profiler support. '''
 
+              ## dispatch
+              response = _current_profile.runcall(dispatch, *args, **kwargs)
               _current_profile.dump_stats(profile_path)
+              return response
 
           else:
-            raise RuntimeError('Cross-request profiling is currently unsupported.')  # @TODO(sgammon): cross-request profiling
 
-          def _dispatch(*args, **kwargs):
+            ## cross-request profiling: sample 1-in-N requests, aggregate by endpoint
+            _sampler = debug.SamplingProfiler(*(
+              profiler_config.get('dump_path', os.path.abspath(os.path.join(os.getcwd(), '.develop', 'profiles'))),
+            ), **dict({
+              'sample': profiler_config.get('sample', 1),
+              'interval': profiler_config.get('flush_interval', 60),
+              'flush_after': profiler_config.get('flush_after', 100),
+              'engine': profile
+            }, **profiler_config.get('profile_kwargs', {})))
+
+            atexit.register(_sampler.flush)  # don't lose the tail end of samples
+
+            def _dispatch(environ, start_response):
 
-            ''' Wrapper to enable profiler support. '''
+              ''' Wrapper to enable sampling profiler support. '''
 
-            ## dispatch
-            response = _current_profile.runcall(dispatch, *args, **kwargs)
-            maybe_flush_profile()
-            return response
+              return _sampler(dispatch, environ, start_response)
 
       self.__wrapped__ = _dispatch  # cache locally
 
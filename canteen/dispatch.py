@@ -30,7 +30,7 @@ def spawn(app,
   from canteen.util import config as cfg
 
   if not config: config = cfg.Config()
-  return runtime.Runtime.spawn(app).configure(config)
+  return runtime.Runtime.spawn(app, config.app.get('runtime')).configure(config)
 
 
 def run(app=None,
@@ -13,6 +13,11 @@
 
 '''
 
+# stdlib
+import copy
+import threading
+import collections
+
 # core
 from canteen.base import logic
 from canteen.core import runtime
@@ -21,8 +26,7 @@ from canteen.core import runtime
 from canteen.util import config
 from canteen.util import decorators
 
-# cache & session APIs
-from canteen.core.api import cache
+# session API
 from canteen.core.api import session
 
 
@@ -60,14 +64,205 @@ with runtime.Library('werkzeug', strict=True) as (library, werkzeug):
   )
 
 
+  class RouteMap(routing.Map):
+
+    ''' Werkzeug ``Map`` that fronts URL matching with a bounded LRU cache of
+        resolved routes, and narrows regex matching on a miss to rules whose
+        static path prefix could possibly match. '''
+
+    __lock__ = None  # guards the route cache
+    __trie__ = None  # static-prefix trie of rule indexes, built on first miss
+    __cache__ = None  # LRU of (method, host, subdomain, path) => (endpoint, arguments)
+    __cache_size__ = 1024  # maximum number of cached route resolutions
+
+    def __init__(self, rules=None, cache_size=None, **kwargs):
+
+      '''  '''
+
+      self.__lock__, self.__cache__ = threading.Lock(), collections.OrderedDict()
+      if cache_size is not None: self.__cache_size__ = cache_size
+      super(RouteMap, self).__init__(rules, **kwargs)
+
+    def add(self, rulefactory):
+
+      '''  '''
+
+      super(RouteMap, self).add(rulefactory)
+      self.invalidate()
+
+    def invalidate(self):
+
+      '''  '''
+
+      with self.__lock__:
+        self.__trie__ = None
+        self.__cache__.clear()
+
+    def bind(self, *args, **kwargs):
+
+      '''  '''
+
+      adapter = super(RouteMap, self).bind(*args, **kwargs)
+      adapter.__class__ = RouteAdapter  # upgrade to our caching adapter
+      return adapter
+
+    def bind_to_environ(self, *args, **kwargs):
+
+      '''  '''
+
+      # werkzeug calls `Map.bind` directly from here, so upgrade again
+      adapter = super(RouteMap, self).bind_to_environ(*args, **kwargs)
+      adapter.__class__ = RouteAdapter
+      return adapter
+
+    ## == Route Cache == ##
+    def lookup(self, key):
+
+      '''  '''
+
+      with self.__lock__:
+        if key in self.__cache__:
+          result = self.__cache__[key] = self.__cache__.pop(key)  # bump to most-recent
+          return result
+
+    def remember(self, key, result):
+
+      '''  '''
+
+      with self.__lock__:
+        self.__cache__[key] = result
+        if len(self.__cache__) > self.__cache_size__:
+          self.__cache__.popitem(last=False)  # evict least-recent
+
+    ## == Prefix Trie == ##
+    @staticmethod
+    def segments(path):
+
+      '''  '''
+
+      return [segment for segment in path.split('/') if segment]
+
+    def candidates(self, path):
+
+      '''  '''
+
+      self.update()  # make sure rules are sorted before we index them
+
+      trie = self.__trie__
+      if trie is None:
+        trie = {}
+        for index, rule in enumerate(self._rules):
+          static = rule.rule.split('<', 1)
+          prefix = self.segments(static[0] if len(static) == 1 else static[0].rsplit('/', 1)[0])
+
+          node = trie
+          for segment in prefix:
+            node = node.setdefault(segment, {})
+          node.setdefault(None, []).append(index)  # rule indexes live under `None`
+        self.__trie__ = trie
+
+      # collect every rule whose static prefix lies along this path
+      node, indexes = trie, list(trie.get(None, ()))
+      for segment in self.segments(path):
+        node = node.get(segment)
+        if node is None: break
+        indexes.extend(node.get(None, ()))
+
+      return [self._rules[index] for index in sorted(indexes)]
+
+
+  class RouteAdapter(routing.MapAdapter):
+
+    ''' Werkzeug ``MapAdapter`` that resolves routes via :py:class:`RouteMap`'s
+        cache and prefix trie. '''
+
+    def match(self, path_info=None, method=None, return_rule=False, query_args=None):
+
+      '''  '''
+
+      # explicit path/rule/query matches are rare - defer to werkzeug
+      if path_info is not None or return_rule or query_args is not None:
+        return super(RouteAdapter, self).match(path_info, method, return_rule, query_args)
+
+      method = (method or self.default_method).upper()
+      key = (method, self.server_name, self.subdomain, u'/' + self.path_info.lstrip(u'/'))
+
+      result = self.map.lookup(key)
+      if result is None:
+
+        # match against narrowed candidates only, with werkzeug's semantics
+        narrowed = copy.copy(self)
+        narrowed.map = NarrowedMap(self.map, self.map.candidates(key[-1]))
+        result = routing.MapAdapter.match(narrowed, method=method)
+        self.map.remember(key, result)
+
+      endpoint, arguments = result
+      return endpoint, dict(arguments)
+
+
+  class NarrowedMap(object):
+
+    ''' View of a :py:class:`RouteMap` exposing only candidate rules. '''
+
+    __slots__ = ('map', '_rules')
+
+    def __init__(self, map, rules):
+
+      '''  '''
+
+      self.map, self._rules = map, rules
+
+    def __getattr__(self, name):
+
+      '''  '''
+
+      return getattr(self.map, name)
+
+
+  class RouteTable(object):
+
+    ''' Immutable table of compiled routes, built once from registered routes
+        and shared across threads. Resolving an endpoint to its handler is a
+        single ``dict`` lookup. '''
+
+    __slots__ = ('rules', 'aliases', 'handlers')
+
+    def __init__(self, routes):
+
+      '''  '''
+
+      # later registrations for the same route win
+      table = collections.OrderedDict()
+      for route, name, target, kwargs in routes:
+        table[route] = (name, target, kwargs)
+
+      for attr, value in (
+        ('rules', tuple((route, name, kwargs) for route, (name, target, kwargs) in table.iteritems())),
+        ('aliases', dict((name, route) for route, (name, target, kwargs) in table.iteritems() if name)),
+        ('handlers', dict((name, target) for route, (name, target, kwargs) in table.iteritems() if name))):
+        object.__setattr__(self, attr, value)
+
+    def __setattr__(self, name, value):
+
+      '''  '''
+
+      raise AttributeError('`RouteTable` is immutable.')
+
+    def __len__(self):
+
+      '''  '''
+
+      return len(self.rules)
+
+
   @decorators.bind('http', namespace=False)
   class HTTPSemantics(logic.Logic):
 
     '''  '''
 
-    __aliases__ = {}  # aliases to routes
     __map__ = None  # routing map cache
-    __router__ = None  # route cache
+    __table__ = None  # compiled route table
+    __routes__ = []  # registered routes, as (route, name, target, kwargs)
 
     # == Base Classes == #
     HTTPException = exceptions.HTTPException
@@ -127,19 +322,25 @@ with runtime.Library('werkzeug', strict=True) as (library, werkzeug):
 
       '''  '''
 
-      # compile route and set in routing cache
-      cls.router.set(route, (name, target, kwargs))
-      if name: cls.__aliases__[name] = route
+      # register route, and drop the compiled table so it's rebuilt on next use
+      replaced = any(existing == route for existing, _, _, _ in cls.__routes__)
+      cls.__routes__.append((route, name, target, kwargs))
+      cls.__table__ = None
+
+      # add to the live route map, if built (which invalidates its route cache) - unless the
+      # route was already registered, in which case the map is rebuilt from the table on next use
+      if cls.__map__:
+        if replaced:
+          cls.__map__ = None
+        else:
+          cls.__map__.add(routing.Rule(route, endpoint=name, **kwargs))
 
     @classmethod
     def resolve_route(cls, name):
 
       '''  '''
 
-      if name in cls.__aliases__:
-        name, handler, route_args = cls.router.get(cls.__aliases__[name])
-        return handler
-      return None
+      return (cls.__table__ or cls.table).handlers.get(name)
 
     @classmethod
     def new_request(cls, environ):
@@ -156,20 +357,20 @@ with runtime.Library('werkzeug', strict=True) as (library, werkzeug):
       return cls.HTTPResponse(*args, **kwargs)
 
     @decorators.classproperty
-    def router(cls):
+    def table(cls):
 
       '''  '''
 
-      if not cls.__router__:
-        cls.__router__ = cache.CacheAPI.spawn('router')
-      return cls.__router__
+      if cls.__table__ is None:
+        cls.__table__ = RouteTable(cls.__routes__)
+      return cls.__table__
 
     @decorators.classproperty
     def routes(cls):
 
       '''  '''
 
-      for url, (name, target, kwargs) in cls.router.items():
+      for url, name, kwargs in cls.table.rules:
         yield routing.Rule(url, endpoint=name, **kwargs)
 
     @decorators.classproperty
@@ -178,7 +379,7 @@ with runtime.Library('werkzeug', strict=True) as (library, werkzeug):
       '''  '''
 
       if not cls.__map__:
-        cls.__map__ = routing.Map([route for route in cls.routes])
+        cls.__map__ = RouteMap([route for route in cls.routes], cache_size=cls.config.get('route_cache', None))
       return cls.__map__
 
     #### ==== Utilities ==== ####
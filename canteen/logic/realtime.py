@@ -35,5 +35,11 @@ class RealtimeSemantics(logic.Logic):
 
   	pass
 
+  def on_disconnect(self, client):
+
+  	'''  '''
+
+  	pass
+
 
 __all__ = ('RealtimeSemantics',)
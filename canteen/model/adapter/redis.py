@@ -357,9 +357,9 @@ class RedisAdapter(IndexedModelAdapter):
       return _client_connections['__default__']
 
     # otherwise, build new default
-    default_profile = _server_profiles[_default_profile]
-    if isinstance(default_profile, basestring):
-      profile = _server_profiles[default_profile]  # if it's a string, it's a pointer to a profile
+    profile = _server_profiles[_default_profile]
+    if isinstance(profile, basestring):
+      profile = _server_profiles[profile]  # if it's a string, it's a pointer to a profile
 
     client = _client_connections['__default__'] = cls.adapter.StrictRedis(**profile)
     return client
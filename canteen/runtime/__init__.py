@@ -18,14 +18,24 @@
 
 # runtimes
 from . import gevent
+from . import asyncio
 from . import wsgiref
 from . import tornado
+from . import uwsgi
 from . import werkzeug
 
+# process management
+from . import prefork
+from . import threaded
+
 
 __all__ = (
   'gevent',
+  'asyncio',
   'wsgiref',
   'tornado',
-  'werkzeug'
+  'uwsgi',
+  'werkzeug',
+  'prefork',
+  'threaded'
 )
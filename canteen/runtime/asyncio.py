@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen asyncio runtime
+  ~~~~~~~~~~~~~~~~~~~~~~~
+
+  serves HTTP/1.1 from an :py:mod:`asyncio` event loop, awaiting
+  coroutine handler methods and running everything else in a pool
+  of threads. on python 2, the loop comes from :py:mod:`trollius`.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import sys
+import socket
+import signal
+import urllib
+import threading
+import StringIO
+import traceback
+
+# core
+from ..core import runtime
+
+
+with runtime.Library('trollius') as (library, asyncio):
+
+  # futures backport, for the executor
+  from concurrent import futures
+
+  # werkzeug exceptions, which double as responses (loaded absolutely - ``werkzeug`` is also a sibling module)
+  with runtime.Library('werkzeug', strict=True) as (_werkzeug, werkzeug):
+    exceptions = _werkzeug.load('exceptions')
+
+  From, Return = asyncio.From, asyncio.Return
+
+
+  class Deferred(object):
+
+    ''' Response still waiting on an awaitable handler result. Returned
+        from dispatch in place of a response iterable, and finished by
+        the event loop once the result resolves. '''
+
+    __slots__ = ('awaitable', 'respond')
+
+    def __init__(self, awaitable, respond):
+
+      '''  '''
+
+      self.awaitable, self.respond = awaitable, respond
+
+
+  class AsyncIO(runtime.Runtime):
+
+    ''' Serves requests from an event loop. Handler methods that return
+        coroutines (or futures) are awaited on the loop, and only hold a
+        thread while routing and building the response. Everything else
+        runs in a bounded thread pool, so blocking handlers never stall the
+        loop. Select it with the ``runtime`` app config key, and tune it
+        under the ``asyncio`` key.
+
+        Only class-based handlers may be async: function handlers read
+        per-request values from thread-local context, which the loop
+        does not share. '''
+
+    __explicit__ = True  # only used when asked for by name
+
+    base_exception = exceptions.HTTPException
+
+    loop = None  # event loop, created per-process in ``work``
+    idle = None  # connection tasks waiting on their next request
+    draining = False  # whether shutdown has begun, so connections aren't kept alive
+    executor = None  # thread pool for synchronous work
+    drain_timeout = None  # drain timeout passed to ``drain``, if any
+
+    default_workers = 16  # threads running synchronous dispatch
+    default_backlog = 2048  # connections the kernel will queue
+    default_keepalive = 5  # seconds an idle connection is kept open
+    default_max_body = 16 * 1024 * 1024  # largest request body accepted, in bytes
+    default_drain = 30  # seconds to wait for in-flight requests on shutdown
+
+    @property
+    def options(self):
+
+      '''  '''
+
+      return self.config.app.get('asyncio', {}) if self.config else {}
+
+    def pending(self, result):
+
+      '''  '''
+
+      return asyncio.iscoroutine(result) or isinstance(result, asyncio.Future)
+
+    def defer(self, result, respond):
+
+      '''  '''
+
+      return Deferred(result, respond)
+
+    def bind(self, interface, port):
+
+      ''' Bind a listening socket. The event loop is created later, in
+          :py:meth:`work`, so forked workers each get their own. '''
+
+      listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+      listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+      listener.bind((interface, port))
+      listener.listen(self.options.get('backlog', self.default_backlog))
+      listener.setblocking(False)
+      return listener
+
+    def work(self, listener):
+
+      '''  '''
+
+      options, connections, self.idle, self.draining = self.options, set(), set(), False
+
+      self.loop = loop = asyncio.new_event_loop()
+      self.executor = futures.ThreadPoolExecutor(options.get('workers', self.default_workers))
+      asyncio.set_event_loop(loop)
+      loop.set_default_executor(self.executor)
+
+      def connected(reader, writer):
+
+        '''  '''
+
+        task = loop.create_task(self.connection(reader, writer))
+        connections.add(task), task.add_done_callback(connections.discard)
+
+      server = loop.run_until_complete(asyncio.start_server(connected, sock=listener, loop=loop))
+
+      # signals can only be handled on the main thread - elsewhere, serve until ``drain()``
+      if isinstance(threading.current_thread(), threading._MainThread):
+        for signum in (signal.SIGTERM, signal.SIGINT):
+          loop.add_signal_handler(signum, loop.stop)
+
+      try:
+        loop.run_forever()
+      finally:
+        # stop accepting, drop idle keep-alive connections, then give requests in flight a chance to finish
+        self.draining = True
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        for task in self.idle: task.cancel()
+        if connections:
+          timeout = self.drain_timeout if self.drain_timeout is not None else options.get('drain', self.default_drain)
+          loop.run_until_complete(asyncio.wait(list(connections), timeout=timeout, loop=loop))
+        self.executor.shutdown(wait=False)  # anything still running outlived the drain
+        loop.close()
+
+    def drain(self, timeout=None):
+
+      ''' Stop accepting connections, then wait for in-flight requests to
+          finish before closing the loop, giving up after ``timeout``
+          seconds. Safe to call from any thread.
+
+          :param timeout: Seconds to wait. Defaults to the ``drain`` option.
+          :returns: ``None``. '''
+
+      if self.loop is not None:
+        self.drain_timeout = timeout
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    @asyncio.coroutine
+    def connection(self, reader, writer):
+
+      ''' Serve requests from one connection until it closes, idles out
+          or asks not to be kept alive. '''
+
+      keepalive = self.options.get('keepalive', self.default_keepalive)
+
+      try:
+        task = asyncio.Task.current_task(loop=self.loop)
+        while not self.draining:
+          self.idle.add(task)
+          try:
+            line = yield From(asyncio.wait_for(reader.readline(), keepalive, loop=self.loop))
+          except asyncio.TimeoutError:
+            break
+          finally:
+            self.idle.discard(task)
+          if not line.strip(): break  # closed (or garbage between requests)
+
+          try:
+            environ = yield From(self.parse(line, reader, writer))
+          except (ValueError, asyncio.IncompleteReadError):
+            writer.write('HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            break
+
+          alive = yield From(self.respond(environ, writer))
+          if not alive: break
+      except (socket.error, IOError):  # pragma: nocover
+        pass  # client went away
+      finally:
+        writer.close()
+
+    @asyncio.coroutine
+    def parse(self, line, reader, writer):
+
+      ''' Read the rest of a request, starting from its request ``line``.
+
+          :raises ValueError: If the request is malformed.
+          :returns: WSGI ``environ`` for the request. '''
+
+      method, target, protocol = line.split()
+      if not protocol.startswith('HTTP/'): raise ValueError('Not an HTTP request.')
+      path, _, query = target.partition('?')
+
+      host, port = (writer.get_extra_info('sockname') or ('', 0))[:2]
+      peer = writer.get_extra_info('peername') or ('', 0)
+
+      environ = {
+        'REQUEST_METHOD': method.upper(),
+        'SCRIPT_NAME': '',
+        'PATH_INFO': urllib.unquote(path),
+        'QUERY_STRING': query,
+        'SERVER_NAME': host,
+        'SERVER_PORT': str(port),
+        'SERVER_PROTOCOL': protocol,
+        'REMOTE_ADDR': peer[0],
+        'REMOTE_PORT': str(peer[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+      }
+
+      # headers, folded into CGI-style keys
+      while True:
+        header = yield From(reader.readline())
+        if not header: raise ValueError('Connection closed mid-request.')
+        if not header.strip(): break
+        name, value = header.split(':', 1)
+        key = name.strip().upper().replace('-', '_')
+        key = key if key in ('CONTENT_TYPE', 'CONTENT_LENGTH') else 'HTTP_' + key
+        environ[key] = ','.join((environ[key], value.strip())) if key in environ else value.strip()
+
+      if environ.get('HTTP_EXPECT', '').lower() == '100-continue':
+        writer.write('HTTP/1.1 100 Continue\r\n\r\n')
+
+      # body, by length or in chunks
+      limit, body = self.options.get('max_body', self.default_max_body), []
+      if 'chunked' in environ.get('HTTP_TRANSFER_ENCODING', '').lower():
+        while True:
+          size = int((yield From(reader.readline())).split(';', 1)[0], 16)
+          if size: body.append((yield From(reader.readexactly(size))))
+          yield From(reader.readline())  # chunk terminator (or trailer end)
+          if not size: break
+          if sum(map(len, body)) > limit: raise ValueError('Request body too large.')
+        environ['CONTENT_LENGTH'] = str(sum(map(len, body)))
+      elif environ.get('CONTENT_LENGTH'):
+        length = int(environ['CONTENT_LENGTH'])
+        if length > limit: raise ValueError('Request body too large.')
+        body.append((yield From(reader.readexactly(length))))
+
+      environ['wsgi.input'] = StringIO.StringIO(''.join(body))
+      raise Return(environ)
+
+    def call(self, environ, start_response):
+
+      ''' Run the app, collecting its response (in a worker thread).
+
+          :returns: :py:class:`Deferred`, or a ``list`` of body chunks. '''
+
+      try:
+        result = self(environ, start_response)
+      except Exception:
+        traceback.print_exc()
+        return exceptions.InternalServerError()(environ, start_response)
+      return result if isinstance(result, Deferred) else self.collect(result)
+
+    def finish(self, deferred, value, environ, start_response):
+
+      ''' Build the response for a resolved handler result (in a worker
+          thread), with the same error handling as a synchronous call.
+
+          :returns: ``list`` of body chunks. '''
+
+      try:
+        return self.collect(deferred.respond(value))
+      except self.base_exception as exc:
+        return self.collect(exc(environ, start_response))
+      except Exception:
+        traceback.print_exc()
+        return self.collect(exceptions.InternalServerError()(environ, start_response))
+
+    @staticmethod
+    def collect(result):
+
+      ''' Drain a WSGI response iterable, closing it afterwards. '''
+
+      try:
+        return [chunk for chunk in result]
+      finally:
+        if hasattr(result, 'close'): result.close()
+
+    @asyncio.coroutine
+    def respond(self, environ, writer):
+
+      ''' Dispatch a request and write its response.
+
+          :returns: Whether the connection may be kept alive. '''
+
+      response, loop = {}, self.loop
+
+      def start_response(status, headers, exc_info=None):
+
+        '''  '''
+
+        response['status'], response['headers'] = status, list(headers)
+        return response.setdefault('written', []).append  # legacy ``write`` callable
+
+      body = yield From(loop.run_in_executor(None, self.call, environ, start_response))
+
+      # async handlers: await the result here, then finish up in the pool
+      if isinstance(body, Deferred):
+        try:
+          value = yield From(body.awaitable)
+        except self.base_exception as exc:
+          body = yield From(loop.run_in_executor(None, self.collect, exc(environ, start_response)))
+        except Exception:
+          traceback.print_exc()
+          body = yield From(loop.run_in_executor(None, self.collect, exceptions.InternalServerError()(environ, start_response)))
+        else:
+          body = yield From(loop.run_in_executor(None, self.finish, body, value, environ, start_response))
+
+      body = response.get('written', []) + body
+      status, headers = response.get('status', '500 Internal Server Error'), response.get('headers', [])
+      names = set(name.lower() for name, value in headers)
+
+      # HTTP/1.1 keeps connections open unless asked not to, HTTP/1.0 only when asked
+      connection = environ.get('HTTP_CONNECTION', '').lower()
+      alive = (connection != 'close') if environ['SERVER_PROTOCOL'] == 'HTTP/1.1' else (connection == 'keep-alive')
+      alive = alive and not self.draining
+
+      if 'content-length' not in names and status[:3] not in ('204', '304'):
+        headers.append(('Content-Length', str(sum(map(len, body)))))
+      headers.append(('Connection', 'keep-alive' if alive else 'close'))
+
+      writer.write(''.join(['HTTP/1.1 %s\r\n' % status] + ['%s: %s\r\n' % header for header in headers] + ['\r\n']))
+      if environ['REQUEST_METHOD'] != 'HEAD': writer.writelines(body)
+      yield From(writer.drain())
+      raise Return(alive)
+
+
+  __all__ = ('AsyncIO', 'Deferred')
@@ -15,12 +15,87 @@
 
 '''
 
+# stdlib
+import signal
+
 # core
 from ..core import runtime
 
 
-with runtime.Library('gevent'):
-  raise NotImplementedError('gevent is stubbed.')
+with runtime.Library('gevent') as (library, gevent):
+
+  # greenlet pool, WSGI server & greenlet-local storage
+  pool, pywsgi, monkey, local = library.load('pool', 'pywsgi', 'monkey', 'local')
+
+
+  class Gevent(runtime.Runtime):
+
+    ''' Serves requests from a bounded pool of greenlets, via
+        :py:mod:`gevent.pywsgi`. Select it with the ``runtime``
+        app config key, and tune it under the ``gevent`` key. '''
+
+    __explicit__ = True  # only used when asked for by name
+
+    pool = None  # greenlet pool, bounding concurrent connections
+    server = None  # bound ``pywsgi.WSGIServer``
+
+    default_pool = 1024  # concurrent connections (greenlets) per process
+    default_backlog = 2048  # connections the kernel will queue while the pool is full
+    default_drain = 30  # seconds to wait for in-flight requests on shutdown
+
+    @property
+    def options(self):
+
+      '''  '''
+
+      return self.config.app.get('gevent', {}) if self.config else {}
+
+    def bind(self, interface, port):
+
+      '''  '''
+
+      options = self.options
+
+      # cooperative sockets (and anything else gevent can patch), unless told otherwise
+      if options.get('monkey', True): monkey.patch_all(**options.get('patch', {}))
+
+      # requests run on greenlets, so request context must be greenlet-local - patched or not,
+      # the ``threading.local`` made in ``__init__`` predates patching and is shared between them
+      self.__context__ = local.local()
+
+      # when the pool is full the server stops accepting, so new connections wait in the backlog
+      self.pool = pool.Pool(options.get('pool', self.default_pool))
+      self.server = pywsgi.WSGIServer((interface, port), self, **{
+        'spawn': self.pool,
+        'backlog': options.get('backlog', self.default_backlog),
+        'log': 'default' if options.get('access_log', __debug__) else None
+      })
+
+      self.server.init_socket()  # bind now, so forked workers can share the listener
+      return self.server
+
+    def work(self, server):
+
+      '''  '''
+
+      gevent.reinit()  # no-op unless we were just forked
+
+      # drain gracefully on the usual shutdown signals
+      for signum in (signal.SIGTERM, signal.SIGINT):
+        (getattr(gevent, 'signal_handler', None) or gevent.signal)(signum, self.drain)
+
+      server.serve_forever()  # returns once stopped
+
+    def drain(self, timeout=None):
+
+      ''' Stop accepting connections, then wait for in-flight requests to
+          finish, killing any still running after ``timeout`` seconds.
+
+          :param timeout: Seconds to wait. Defaults to the ``drain`` option.
+          :returns: ``None``. '''
+
+      if self.server is not None and not self.server.closed:
+        self.server.stop(timeout=timeout if timeout is not None else self.options.get('drain', self.default_drain))
 
 
-  __all__ = tuple()
+  __all__ = ('Gevent',)
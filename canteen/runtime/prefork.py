@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen prefork runtime
+  ~~~~~~~~~~~~~~~~~~~~~~~
+
+  serves one bound listener from several forked worker processes,
+  restarting workers as they exit.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import gc
+import os
+import math
+import sys
+import time
+import errno
+import signal
+import threading
+import traceback
+import multiprocessing
+
+
+class Supervisor(object):
+
+  ''' Forks ``workers`` processes that share a listening socket bound
+      by the parent, and keeps that many running until stopped.
+
+      Signals to the supervisor:
+
+      - ``SIGTERM``/``SIGINT``: stop workers gracefully, then exit
+      - ``SIGHUP``: gracefully replace every worker '''
+
+  def __init__(self, runtime, server, workers=None, timeout=30, backoff=1.0):
+
+    ''' Prepare to supervise workers serving from ``server``.
+
+        :param runtime: :py:class:`canteen.core.runtime.Runtime` to serve.
+        :param server: Bound server, as returned by ``runtime.bind``.
+        :param workers: Number of workers. Defaults to the number of CPUs.
+        :param timeout: Seconds workers get to finish up before being killed.
+        :param backoff: Workers exiting within this many seconds of starting
+        are restarted after a delay of the same length, to avoid crash loops. '''
+
+    self.runtime, self.server = runtime, server
+    self.workers = workers or multiprocessing.cpu_count()
+    self.timeout, self.backoff = timeout, backoff
+    self.children, self.stopping, self.signals = {}, False, False
+    self.deadline = None  # ``SIGALRM`` or a ``threading.Timer``, killing workers that outlive ``timeout``
+
+  def spawn(self):
+
+    ''' Fork a new worker.
+
+        :returns: Worker process ID (in the parent). '''
+
+    pid = os.fork()
+    if pid:
+      self.children[pid] = time.time()
+      if self.stopping: os.kill(pid, signal.SIGTERM)  # told to stop while forking - don't leave it behind
+      return pid
+
+    # in the worker: drop the supervisor's signal handling and serve
+    code = 0
+    try:
+      for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGALRM):
+        signal.signal(signum, signal.SIG_DFL)
+      self.runtime.work(self.server)
+    except Exception:
+      traceback.print_exc()
+      code = 1
+    finally:
+      sys.stdout.flush(), sys.stderr.flush()
+      os._exit(code)
+
+  def signal(self, signum):
+
+    ''' Send ``signum`` to every worker. '''
+
+    for pid in self.children.keys():
+      try:
+        os.kill(pid, signum)
+      except OSError:  # pragma: nocover
+        pass  # already gone
+
+  def stop(self, *args):
+
+    ''' Stop gracefully, killing workers that outlive ``timeout``. '''
+
+    self.stopping = True
+    self.signal(signal.SIGTERM)
+    if self.deadline is not None: return
+
+    if self.signals:  # may be running in a signal handler - don't block (or start threads)
+      signal.signal(signal.SIGALRM, lambda *args: self.signal(signal.SIGKILL))
+      signal.alarm(int(math.ceil(self.timeout)) or 1)
+      self.deadline = signal.SIGALRM
+    else:
+      self.deadline = threading.Timer(self.timeout, self.signal, (signal.SIGKILL,))
+      self.deadline.daemon = True
+      self.deadline.start()
+
+  def restart(self, *args):
+
+    ''' Gracefully replace every worker (they are respawned as they exit). '''
+
+    self.signal(signal.SIGTERM)
+
+  def run(self):
+
+    ''' Fork workers and supervise them until stopped.
+
+        :returns: ``True`` once all workers have exited. '''
+
+    # signals can only be handled on the main thread - elsewhere, call ``stop`` or ``restart``
+    self.signals = isinstance(threading.current_thread(), threading._MainThread)
+    if self.signals:
+      signal.signal(signal.SIGTERM, self.stop)
+      signal.signal(signal.SIGINT, self.stop)
+      signal.signal(signal.SIGHUP, self.restart)
+
+    gc.collect()  # don't copy garbage into every worker
+
+    for i in xrange(self.workers):
+      self.spawn()
+
+    while self.children:
+      try:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+      except OSError as e:
+        if e.errno == errno.EINTR: continue  # a signal arrived - keep waiting
+        if e.errno == errno.ECHILD: break
+        raise
+
+      # poll, rather than block: a signal landing just before a blocking
+      # wait would go unhandled until the next worker happened to exit
+      if not pid:
+        time.sleep(0.1)
+        continue
+
+      started = self.children.pop(pid, None)
+      if started is None or self.stopping: continue
+
+      # replace the worker, backing off if it died right away
+      if time.time() - started < self.backoff: time.sleep(self.backoff)
+      if not self.stopping: self.spawn()
+
+    if self.deadline == signal.SIGALRM:
+      signal.alarm(0)
+    elif self.deadline is not None:
+      self.deadline.cancel()
+    self.server.server_close() if hasattr(self.server, 'server_close') else self.server.close()
+    return True
+
+
+__all__ = ('Supervisor',)
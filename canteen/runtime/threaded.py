@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen threaded runtime
+  ~~~~~~~~~~~~~~~~~~~~~~~~
+
+  serves requests accepted by a :py:mod:`SocketServer`-style server
+  from a bounded pool of worker threads.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import Queue
+import threading
+
+
+class ThreadPool(object):
+
+  ''' Hands connections accepted by ``server`` to ``workers`` threads.
+
+      When every worker is busy, up to ``backlog`` connections are queued.
+      After that the server stops accepting, leaving new connections to
+      wait in the kernel's listen backlog instead. '''
+
+  def __init__(self, server, workers=16, backlog=None):
+
+    ''' Prepare a pool for ``server``.
+
+        :param server: Bound server, as returned by ``runtime.bind``. Must
+        implement ``process_request``, like :py:class:`SocketServer.BaseServer`.
+
+        :param workers: Number of worker threads.
+        :param backlog: Accepted connections to queue while all workers are
+        busy. Defaults to ``workers``. '''
+
+    self.server, self.workers = server, workers
+    self.queue = Queue.Queue(backlog if backlog is not None else workers)
+    self.threads = []
+
+  def start(self):
+
+    ''' Start worker threads, and route the server's requests to them.
+
+        :returns: ``self``, for chainability. '''
+
+    for i in xrange(self.workers):
+      thread = threading.Thread(target=self.work, name='canteen-worker-%s' % i)
+      thread.daemon = True
+      thread.start()
+      self.threads.append(thread)
+
+    self.server.process_request = self.submit
+    return self
+
+  def submit(self, request, client_address):
+
+    ''' Queue an accepted connection, blocking while the queue is full. '''
+
+    self.queue.put((request, client_address))
+
+  def work(self):
+
+    ''' Serve queued connections until handed ``None``. '''
+
+    while True:
+      item = self.queue.get()
+      if item is None: break
+
+      request, client_address = item
+      try:
+        self.server.finish_request(request, client_address)
+      except Exception:
+        self.server.handle_error(request, client_address)
+      finally:
+        self.server.shutdown_request(request)
+
+  def stop(self, timeout=None):
+
+    ''' Let workers finish queued connections, then stop them.
+
+        :param timeout: Seconds to wait for each worker. Defaults to
+        waiting indefinitely. '''
+
+    for thread in self.threads:
+      self.queue.put(None)
+    for thread in self.threads:
+      thread.join(timeout)
+    self.threads = []
+
+
+__all__ = ('ThreadPool',)
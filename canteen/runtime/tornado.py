@@ -15,12 +15,230 @@
 
 '''
 
+# stdlib
+import socket
+import signal
+import time
+import threading
+import traceback
+
 # core
 from ..core import runtime
 
 
-with runtime.Library('tornado'):
-  raise NotImplementedError('tornado is stubbed.')
+with runtime.Library('tornado') as (library, tornado):
+
+  # IOLoop, HTTP server & websockets (loaded absolutely - this module is also named ``tornado``)
+  gen, web, wsgi, ioloop, netutil, httputil, websocket, httpserver = library.load(*(
+    'gen', 'web', 'wsgi', 'ioloop', 'netutil', 'httputil', 'websocket', 'httpserver'))
+
+  # futures backport, for the executor
+  from concurrent import futures
+
+  # werkzeug exceptions, which double as responses
+  with runtime.Library('werkzeug', strict=True) as (_werkzeug, werkzeug):
+    exceptions = _werkzeug.load('exceptions')
+
+
+  class WSGIBridge(wsgi.WSGIContainer):
+
+    ''' Runs the app on the runtime's thread pool, and writes responses
+        from the IOLoop, so plain handlers never block it. '''
+
+    def __init__(self, runtime):
+
+      '''  '''
+
+      super(WSGIBridge, self).__init__(runtime)
+      self.runtime, self.pending = runtime, set()
+
+    def __call__(self, request):
+
+      '''  '''
+
+      future = self.runtime.executor.submit(self.runtime.call, self.environ(request))
+      self.pending.add(future)
+
+      def respond(future):
+
+        '''  '''
+
+        try:
+          status, headers, body = future.result()
+          code, reason = status.split(' ', 1)
+
+          if 'content-length' not in set(name.lower() for name, value in headers) and code not in ('204', '304'):
+            headers.append(('Content-Length', str(len(body))))
+
+          header = httputil.HTTPHeaders()
+          for name, value in headers: header.add(name, value)
+
+          request.connection.write_headers(httputil.ResponseStartLine('HTTP/1.1', int(code), reason), header, chunk=body)
+          request.connection.finish()
+        finally:
+          self.pending.discard(future)
+
+      ioloop.IOLoop.current().add_future(future, respond)
+
+
+  class RealtimeHandler(websocket.WebSocketHandler):
+
+    ''' Serves realtime connections natively on the IOLoop, handing
+        connects, messages and disconnects to
+        :py:class:`canteen.logic.realtime.RealtimeSemantics`. The handler
+        itself is passed along as the ``client`` (see ``write_message``
+        and ``close``). '''
+
+    def initialize(self, runtime):
+
+      '''  '''
+
+      self.runtime = runtime
+
+    @property
+    def logic(self):
+
+      '''  '''
+
+      return self.runtime.bridge.realtime
+
+    def check_origin(self, origin):
+
+      '''  '''
+
+      return self.runtime.options.get('origins') is None or origin in self.runtime.options['origins']
+
+    def open(self, *args, **kwargs):
+
+      '''  '''
+
+      self.logic.on_connect(self)
+
+    def on_message(self, message):
+
+      '''  '''
+
+      self.logic.on_message(self, message)
+
+    def on_close(self):
+
+      '''  '''
+
+      self.logic.on_disconnect(self)
+
+
+  class Tornado(runtime.Runtime):
+
+    ''' Serves requests from a :py:mod:`tornado` IOLoop. Realtime
+        (websocket) connections are handled on the loop itself; everything
+        else runs in a bounded thread pool. Select it with the ``runtime``
+        app config key, and tune it under the ``tornado`` key. '''
+
+    __explicit__ = True  # only used when asked for by name
+
+    base_exception = exceptions.HTTPException
+
+    loop = None  # IOLoop, current for the serving process
+    server = None  # ``HTTPServer``, created per-process in ``work``
+    executor = None  # thread pool for plain (WSGI) requests
+    container = None  # ``WSGIBridge``, tracking plain requests in flight
+
+    default_workers = 16  # threads running plain requests
+    default_backlog = 2048  # connections the kernel will queue
+    default_realtime = '/_realtime'  # path serving realtime connections
+    default_max_body = 16 * 1024 * 1024  # largest request body accepted, in bytes
+    default_drain = 30  # seconds to wait for in-flight requests on shutdown
+
+    @property
+    def options(self):
+
+      '''  '''
+
+      return self.config.app.get('tornado', {}) if self.config else {}
+
+    def bind(self, interface, port):
+
+      ''' Bind a listening socket. The IOLoop and server are created later,
+          in :py:meth:`work`, so forked workers each get their own. '''
+
+      return netutil.bind_sockets(port, interface, family=socket.AF_INET, backlog=(
+        self.options.get('backlog', self.default_backlog)))[0]
+
+    def work(self, listener):
+
+      '''  '''
+
+      options = self.options
+
+      self.loop = loop = ioloop.IOLoop.current()
+      self.executor = futures.ThreadPoolExecutor(options.get('workers', self.default_workers))
+
+      # realtime connections are served natively, everything else through the app
+      self.container = WSGIBridge(self)
+      self.server = httpserver.HTTPServer(web.Application([
+        (options.get('realtime', self.default_realtime), RealtimeHandler, {'runtime': self}),
+        (r'.*', self.container)]), max_body_size=options.get('max_body', self.default_max_body))
+      self.server.add_sockets([listener])
+
+      # signals can only be handled on the main thread - elsewhere, serve until ``drain()``
+      if isinstance(threading.current_thread(), threading._MainThread):
+        for signum in (signal.SIGTERM, signal.SIGINT):
+          signal.signal(signum, lambda *args: loop.add_callback_from_signal(self.drained))
+
+      try:
+        loop.start()
+      finally:
+        self.executor.shutdown(wait=False)  # anything still running outlived the drain
+
+    def drain(self, timeout=None):
+
+      ''' Stop accepting connections, then wait for in-flight requests to
+          finish before stopping the IOLoop, giving up after ``timeout``
+          seconds. Safe to call from any thread.
+
+          :param timeout: Seconds to wait. Defaults to the ``drain`` option.
+          :returns: ``None``. '''
+
+      if self.loop is not None: self.loop.add_callback(self.drained, timeout)
+
+    @gen.coroutine
+    def drained(self, timeout=None):
+
+      ''' Drain from the IOLoop - see :py:meth:`drain`. '''
+
+      self.server.stop()
+      deadline = time.time() + (timeout if timeout is not None else self.options.get('drain', self.default_drain))
+      while self.container.pending and time.time() < deadline:
+        yield gen.sleep(0.1)
+      self.loop.stop()
+
+    def call(self, environ):
+
+      ''' Run the app, collecting its response (in a worker thread).
+
+          :returns: ``tuple`` of ``(status, headers, body)``. '''
+
+      response, written = {}, []
+
+      def start_response(status, headers, exc_info=None):
+
+        '''  '''
+
+        response['status'], response['headers'] = status, list(headers)
+        return written.append  # legacy ``write`` callable
+
+      try:
+        result = self(environ, start_response)
+      except Exception:
+        traceback.print_exc()
+        result = exceptions.InternalServerError()(environ, start_response)
+
+      try:
+        written.extend(result)
+      finally:
+        if hasattr(result, 'close'): result.close()
+
+      return response.get('status', '500 Internal Server Error'), response.get('headers', []), ''.join(written)
 
 
-  __all__ = tuple()
+  __all__ = ('Tornado', 'WSGIBridge', 'RealtimeHandler')
@@ -15,12 +15,237 @@
 
 '''
 
+# stdlib
+import sys
+import functools
+import importlib
+import traceback
+import cPickle as pickle
+
 # core
 from ..core import runtime
 
 
-with runtime.Library('uwsgi'):
-  raise NotImplementedError('uwsgi is stubbed.')
+## Globals
+_attempts = {}  # failed attempts per spooled task, in the spooler process
+
+
+with runtime.Library('uwsgi') as (library, uwsgi):
+
+  # outside uWSGI, define (and so register) nothing
+  if not library.supported: raise library.exception
+
+  # cache API
+  from ..core.api import cache
+
+  # werkzeug exceptions, which double as responses (loaded absolutely - ``werkzeug`` is also a sibling module)
+  with runtime.Library('werkzeug', strict=True) as (_werkzeug, werkzeug):
+    exceptions = _werkzeug.load('exceptions')
+
+
+  class SharedCache(cache.Cache.Engine):
+
+    ''' :py:class:`canteen.core.api.cache.CacheAPI` engine backed by a
+        uWSGI cache, so every worker shares one cache. Values are pickled,
+        and keys are prefixed with the name the cache was spawned under.
+        Expiration is left to uWSGI, from the strategy's ``ttl`` (if any). '''
+
+    cache = None  # uWSGI cache name (``None`` for the default cache)
+
+    @property
+    def prefix(self):
+
+      '''  '''
+
+      return '%s:' % (self.name or '__default__')
+
+    @property
+    def scope(self):
+
+      ''' Trailing cache name argument for uWSGI cache calls, if any. '''
+
+      return (self.cache,) if self.cache else ()
+
+    @property
+    def expires(self):
+
+      '''  '''
+
+      return int(getattr(self.strategy, 'ttl', 0) or 0)
+
+    def key(self, key):
+
+      '''  '''
+
+      return self.prefix + (key.encode('utf-8') if isinstance(key, unicode) else str(key))
+
+    def get(self, key, default=None):
+
+      '''  '''
+
+      value = uwsgi.cache_get(self.key(key), *self.scope)
+      return pickle.loads(value) if value is not None else default
+
+    def get_multi(self, keys, default=None):
+
+      '''  '''
+
+      return [self.get(key, default) for key in keys]
+
+    def keys(self):
+
+      ''' Keys held by this cache, where uWSGI can list them. '''
+
+      if not hasattr(uwsgi, 'cache_keys'): return []  # pragma: nocover
+      prefix = self.prefix
+      return [key[len(prefix):] for key in (uwsgi.cache_keys(*self.scope) or []) if key.startswith(prefix)]
+
+    def items(self):
+
+      '''  '''
+
+      for key in self.keys():
+        yield key, self.get(key)
+
+    def set(self, key, value):
+
+      '''  '''
+
+      uwsgi.cache_update(self.key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self.expires, *self.scope)
+      return value
+
+    def set_multi(self, map):
+
+      '''  '''
+
+      for key, value in map.iteritems():
+        self.set(key, value)
+      return map
+
+    def delete(self, key):
+
+      '''  '''
+
+      uwsgi.cache_del(self.key(key), *self.scope)
+
+    def delete_multi(self, keys):
+
+      '''  '''
+
+      for key in keys:
+        self.delete(key)
+
+    def clear(self):
+
+      ''' Clear this cache's keys, or the whole uWSGI cache where keys
+          can't be listed. '''
+
+      keys = self.keys() if hasattr(uwsgi, 'cache_keys') else None
+      if keys is None:  # pragma: nocover
+        uwsgi.cache_clear(*self.scope)
+        return 0
+
+      self.delete_multi(keys)
+      return len(keys)
+
+
+  def spool(func, *args, **kwargs):
+
+    ''' Hand ``func(*args, **kwargs)`` to the uWSGI spooler. Functions the
+        spooler can't find by name, or calls that can't be pickled, run
+        inline instead.
+
+        :returns: ``None`` if spooled, otherwise the result of ``func``. '''
+
+    module, name = getattr(func, '__module__', None), getattr(func, '__name__', None)
+    if module and getattr(sys.modules.get(module), name, None) is func:
+      try:
+        body = pickle.dumps((args, kwargs), pickle.HIGHEST_PROTOCOL)
+      except (pickle.PicklingError, TypeError):
+        pass
+      else:
+        uwsgi.spool({'canteen.task': '%s:%s' % (module, name), 'body': body})
+        return None
+    return func(*args, **kwargs)
+
+  def spooler(env, retries=3):
+
+    ''' Run a task spooled by :py:func:`spool` (in the spooler process).
+        Tasks that can't be loaded are dropped, since they never will be.
+        Tasks that fail are retried, up to ``retries`` attempts in all. '''
+
+    task = env.get('canteen.task')
+    if not task: return uwsgi.SPOOL_IGNORE  # not ours
+
+    module, name = task.split(':', 1)
+    try:
+      args, kwargs = pickle.loads(env['body'])
+      func = getattr(importlib.import_module(module), name)
+    except Exception:
+      traceback.print_exc()
+      return uwsgi.SPOOL_OK
+
+    # uWSGI re-reads the task from its spool file on retry, so count attempts here (keyed by that file)
+    key = env.get('spooler_task_name', task)
+    try:
+      func(*args, **kwargs)
+    except Exception:
+      traceback.print_exc()
+      _attempts[key] = _attempts.get(key, 0) + 1
+      if _attempts[key] < retries: return uwsgi.SPOOL_RETRY
+
+    _attempts.pop(key, None)
+    return uwsgi.SPOOL_OK
+
+
+  class UWSGI(runtime.Runtime):
+
+    ''' Runs inside uWSGI, which owns sockets, processes and threads. The
+        runtime itself is the WSGI callable - point uWSGI at it with, for
+        instance, ``application = canteen.spawn(app, dev=False)``. Tune it
+        under the ``uwsgi`` app config key:
+
+        - ``cache``: uWSGI cache backing :py:class:`CacheAPI` (``None`` for
+          the default cache, ``False`` to keep caches per-process)
+        - ``spooler``: whether to offload deferred work (like session saves)
+          to the spooler, when one is configured
+        - ``retries``: attempts the spooler gives a failing task '''
+
+    __priority__ = 1  # importable only inside uWSGI, so preferred there
+
+    base_exception = exceptions.HTTPException
+
+    default_retries = 3  # attempts the spooler gives a failing task
+
+    @property
+    def options(self):
+
+      '''  '''
+
+      return self.config.app.get('uwsgi', {}) if self.config else {}
+
+    def initialize(self):
+
+      '''  '''
+
+      super(UWSGI, self).initialize()
+      options = self.options
+
+      # one cache for every worker, rather than one per process
+      if options.get('cache') is not False and (uwsgi.opt.get('cache2') or uwsgi.opt.get('cache')):
+        SharedCache.cache = options.get('cache')
+        cache.CacheAPI.__engine__ = SharedCache
+
+      # deferred work goes to the spooler, if there is one
+      if options.get('spooler', True) and uwsgi.opt.get('spooler'):
+        uwsgi.spooler = functools.partial(spooler, retries=options.get('retries', self.default_retries))
+        runtime.Runtime.__offload__ = staticmethod(spool)
+
+    def bind(self, interface, port):
+
+      '''  '''
+
+      raise RuntimeError('uWSGI binds its own sockets - serve the runtime as its `application` callable instead.')
 
 
-  __all__ = tuple()
+  __all__ = ('UWSGI', 'SharedCache', 'spool', 'spooler')
@@ -25,7 +25,7 @@ from ..core import runtime
 with runtime.Library('werkzeug', strict=True) as (library, werkzeug):
 
   # WSGI devserver
-  serving, exceptions = library.load('serving'), library.load('exceptions')
+  serving, exceptions, wsgi = library.load('serving'), library.load('exceptions'), library.load('wsgi')
 
 
   class Werkzeug(runtime.Runtime):
@@ -84,6 +84,10 @@ with runtime.Library('werkzeug', strict=True) as (library, werkzeug):
       if self.config.assets.get('config', {}).get('extra_assets'):
         paths.update(dict(self.config.assets['config']['extra_assets'].itervalues()))
 
+      # production: a plain, already-bound server for prefork workers or the thread pool to serve from
+      if self.prefork.get('enable', False) or self.threaded.get('enable', False):
+        return serving.make_server(interface, address, wsgi.SharedDataMiddleware(self, paths) if paths else self)
+
       # run via werkzeug's awesome `run_simple`
       return serving.run_simple(interface, address, self, **{
         'use_reloader': True,
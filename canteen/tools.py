@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen tools
+  ~~~~~~~~~~~~~
+
+  command-line tools for building and operating canteen apps. run
+  with ``python -m canteen <tool>``, or via the ``canteen`` script.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import os
+import sys
+import json
+import tempfile
+import importlib
+import subprocess
+
+# canteen util
+from canteen.util import cli
+
+
+class Canteen(cli.Tool):
+
+  ''' Tools for building and operating canteen apps. '''
+
+  class Templates(cli.Tool):
+
+    ''' Compile templates ahead-of-time into an importable package. '''
+
+    arguments = (
+      (('--source', '-s'), {'action': 'append', 'help': 'template source path (may be repeated)'}),
+      (('--target', '-t'), {'help': 'directory for the compiled template package'}),
+      (('--config', '-c'), {'help': 'dotted path to a module exposing the app `config`'}),
+      (('--ext', '-e'), {'action': 'append', 'dest': 'extensions', 'help': 'only compile this extension (may be repeated)'}),
+      (('--force', '-f'), {'action': 'store_true', 'help': 'ignore the build manifest and recompile everything'}),
+      (('--quiet', '-q'), {'action': 'store_true', 'help': 'only report failures'}))
+
+    def execute(arguments):
+
+      '''  '''
+
+      from canteen.util import config as _config
+      from canteen.core.api.template import TemplateAPI, TemplateCompiler
+
+      config = importlib.import_module(arguments.config).config if arguments.config else _config.Config()
+      paths = config.app.get('paths', {}).get('templates') or {}
+
+      # resolve source and target, falling back to the app's configured template paths
+      source = arguments.source or (paths.get('source') if isinstance(paths, dict) else paths) or (
+        os.path.join(os.getcwd(), 'templates', 'source'))
+      target = arguments.target or (
+        os.path.join(os.getcwd(), *paths['compiled'].split('.')) if isinstance(paths, dict) and 'compiled' in paths else None)
+
+      if not target:
+        sys.stderr.write('No target given, and no compiled template path configured.\n')
+        return False
+
+      # build from the same environment (syntax extensions, haml settings) that the app renders with
+      api = TemplateAPI()
+      output = dict(config.get('TemplateAPI', {'debug': True}), force_compiled=False)
+      environment = api.build_environment(None, config, output, {'source': source})
+
+      result = TemplateCompiler(environment, target).compile(force=arguments.force, extensions=arguments.extensions)
+
+      if not arguments.quiet:
+        for template in result['compiled']: print 'compiled: %s' % template
+        for template in result['removed']: print 'removed: %s' % template
+        print '%s compiled, %s unchanged, %s removed, %s failed.' % tuple(
+          len(result[k]) for k in ('compiled', 'skipped', 'removed', 'failed'))
+
+      for template, error in result['failed']:
+        sys.stderr.write('failed: %s (%s)\n' % (template, error))
+      return not result['failed']
+
+  class Imports(cli.Tool):
+
+    ''' Report time spent importing each module, from a fresh process. '''
+
+    arguments = (
+      ('modules', {'nargs': '*', 'default': ['canteen'], 'help': 'modules to import (default: canteen)'}),
+      (('--sort', '-s'), {'choices': ('tree', 'self', 'cumulative'), 'default': 'tree', 'help': 'sort order'}),
+      (('--limit', '-l'), {'type': int, 'default': 30, 'help': 'number of modules to show (0 for all)'}),
+      (('--min', '-m'), {'type': float, 'default': 0.0, 'dest': 'minimum', 'help': 'hide modules faster than this (ms)'}))
+
+    def execute(arguments):
+
+      '''  '''
+
+      from canteen.util import importtime
+
+      # load the profiler by path, so the child process imports nothing before it starts timing
+      handle, output = tempfile.mkstemp(suffix='.json')
+      os.close(handle)
+      bootstrap = 'import imp, sys; imp.load_source("_importtime", %r).main(sys.argv[1:])' % (
+        importtime.__file__[:-1] if importtime.__file__.endswith('.pyc') else importtime.__file__)
+
+      try:
+        code = subprocess.call([sys.executable, '-c', bootstrap, output] + arguments.modules, env=dict(
+          os.environ, PYTHONPATH=os.pathsep.join(filter(None, sys.path))), stdout=open(os.devnull, 'w'))
+        if code != 0:
+          sys.stderr.write('Import failed (exit code %s).\n' % code)
+          return False
+        with open(output, 'r') as handle:
+          records = json.load(handle)
+      finally:
+        os.remove(output)
+
+      total = sum((cumulative for module, _self, cumulative, depth in records if depth == 0))
+      records = [record for record in records if record[2] * 1000 >= arguments.minimum]
+      if arguments.sort != 'tree':
+        records.sort(key=lambda record: record[1 if arguments.sort == 'self' else 2], reverse=True)
+
+      print '%10s  %10s  module' % ('self (ms)', 'cumul (ms)')
+      for module, _self, cumulative, depth in (records[:arguments.limit] if arguments.limit else records):
+        print '%10.2f  %10.2f  %s%s' % (_self * 1000, cumulative * 1000, '  ' * depth if arguments.sort == 'tree' else '', module)
+      print '%d modules loaded in %.2fms total.' % (len(records), total * 1000)
+      return True
+
+
+def main(argv=None):
+
+  ''' Parse ``argv`` and dispatch to the selected tool.
+
+      :param argv: Arguments to parse. Defaults to ``sys.argv[1:]``.
+      :returns: Unix return code, suitable for ``sys.exit()``. '''
+
+  tool = Canteen()
+  return tool(tool.parser.parse_args(argv))
+
+
+if __name__ == '__main__': sys.exit(main())  # pragma: nocover
+
+
+__all__ = ('Canteen', 'main')
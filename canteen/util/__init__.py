@@ -20,7 +20,6 @@
 import os
 import sys
 import time
-import pkgutil
 import datetime
 import importlib
 
@@ -29,6 +28,7 @@ from .cli import *
 from .debug import *
 from .config import *
 from .struct import *
+from .timing import *
 from .decorators import *
 
 
@@ -39,30 +39,127 @@ def say(*args):
   print ' '.join(map(lambda x: str(x), args))
 
 
-def walk(root=None, debug=__debug__):
+def discover(root):
 
-  '''  '''
+  ''' Find every module and package importable from ``root``, as
+      :py:func:`pkgutil.walk_packages` would, but from the filesystem alone
+      (nothing is imported while walking).
+
+      :param root: Directory to search.
+      :returns: ``tuple`` of ``(modules, directories)``. ``modules`` is a
+      ``list`` of ``(name, path, is_package)``, parents before children.
+      ``directories`` maps each directory walked to its mtime. '''
+
+  import imp  # deferred - only preloading needs this
+
+  suffixes = sorted((suffix for suffix, mode, kind in imp.get_suffixes()), key=len, reverse=True)
+  modules, directories, pending = [], {}, [(root, '')]
+
+  while pending:
+    path, prefix = pending.pop(0)
+    directories[path] = os.stat(path).st_mtime
+
+    seen = set()
+    for entry in sorted(os.listdir(path)):
+      target = os.path.join(path, entry)
+      if os.path.isdir(target):
+        if '.' not in entry and os.path.exists(os.path.join(target, '__init__.py')):
+          modules.append((prefix + entry, target, True))
+          pending.append((target, prefix + entry + '.'))
+        continue
+
+      for suffix in suffixes:
+        if entry.endswith(suffix):
+          name = entry[:-len(suffix)]
+          if name != '__init__' and '.' not in name and name not in seen:
+            seen.add(name)
+            modules.append((prefix + name, target, False))
+          break
+
+  modules.sort(key=lambda module: module[0].count('.'))  # parents first
+  return modules, directories
+
+
+def walk(root=None, debug=__debug__, manifest=None, processes=None, strict=False):
 
-  # make sure working directory is in path
-  if os.getcwd() not in sys.path:
-    sys.path.insert(0, os.getcwd())
+  ''' Preload every module found under ``root``.
 
-  def walker((loader, name, is_package)):
+      :param root: Directory to preload. Defaults to the working directory.
+      :param debug: Report each module (and its import time) as it loads.
 
-    '''  '''
+      :param manifest: Path to a JSON manifest of discovered modules. If the
+      tree's directory mtimes still match the manifest, the walk is skipped.
 
+      :param processes: Number of processes to byte-compile stale modules with
+      before importing them. ``None`` skips this step.
+
+      :param strict: Raise on the first module that fails to import, rather
+      than reporting it and carrying on.
+
+      :returns: ``list`` of preloaded module names. '''
+
+  import json, py_compile, multiprocessing  # deferred - only preloading needs these
+
+  root = os.path.abspath(root or '.')
+
+  # make sure the preload root is in path
+  if root not in sys.path:
+    sys.path.insert(0, root)
+
+  if debug: print 'Preloading path "%s"...' % root
+
+  # re-use the last walk if no directory in the tree changed (adding, removing or renaming a file touches its directory)
+  found, directories = None, None
+  if manifest and os.path.exists(manifest):
+    try:
+      with open(manifest, 'r') as handle:
+        cached = json.load(handle)
+      if cached.get('root') == root and all((
+        os.path.isdir(path) and os.stat(path).st_mtime == mtime for path, mtime in cached['directories'].iteritems())):
+        found = [(str(name), path, is_package) for name, path, is_package in cached['modules']]
+        directories = cached['directories']
+    except (IOError, OSError, ValueError, KeyError):
+      found = None
+
+  reused = found is not None
+  if not reused:
+    found, directories = discover(root)
+
+  # imports are serialized by the interpreter's import lock, but compiling stale bytecode is not
+  if processes:
+    sources = [os.path.join(path, '__init__.py') if is_package else path for name, path, is_package in found]
+    stale = [path for path in sources if path.endswith('.py') and (
+      not os.path.exists(path + 'c') or os.stat(path + 'c').st_mtime < os.stat(path).st_mtime)]
+    if stale:
+      pool = multiprocessing.Pool(processes)
+      try:
+        pool.map(py_compile.compile, stale)
+      finally:
+        pool.close(), pool.join()
+
+  loaded, failed = [], []
+  for name, path, is_package in found:
+    start = time.time()
     try:
-      return importlib.import_module(name).__name__ if not is_package else name
+      importlib.import_module(name)
     except ImportError as e:
-      if debug:
-        print 'Failed to preload path "%s"...' % (root or '.')
-        print e
-        raise
-      return
+      if strict: raise
+      failed.append((name, e))
+      if debug: print 'Failed to preload "%s": %s' % (name, e)
+      continue
+
+    loaded.append(name)
+    if debug: say('Preloaded:', name, '(%.2fms)' % ((time.time() - start) * 1000))
+
+  # record directory mtimes *after* preloading, since writing bytecode touches them too
+  if manifest:
+    current = dict(((path, os.stat(path).st_mtime) for path in directories))
+    if not reused or current != directories:
+      with open(manifest, 'w') as handle:
+        json.dump({'root': root, 'directories': current, 'modules': found}, handle)
 
-  if debug: print 'Preloading path "%s"...' % (root or '.')
-  return map((lambda x: say('Preloaded:', x)) if debug else (lambda x: x),
-          map(walker, pkgutil.walk_packages(root or '.')))
+  if debug: print 'Preloaded %s modules (%s failed).' % (len(loaded), len(failed))
+  return loaded
 
 
 __all__ = (
@@ -73,6 +170,7 @@ __all__ = (
   'debug',
   'decorators',
   'struct',
+  'timing',
   'configured',
   'bind',
   'cacheable'
@@ -5,7 +5,13 @@
 '''
 
 # stdlib
+import os
 import sys
+import time
+import pstats
+import tempfile
+import itertools
+import threading
 
 # 3rd party / stdlib
 try:
@@ -24,4 +30,101 @@ def Logger(name):
   return logger
 
 
-__all__ = ('Logger',)
+class SamplingProfiler(object):
+
+  ''' Profiles a 1-in-N sample of requests, merging stats in memory (keyed
+      by route endpoint) and flushing them to disk on an interval or after
+      a set number of samples. '''
+
+  def __init__(self, path, sample=1, interval=60, flush_after=100, engine=None, **profile_kwargs):
+
+    ''' Initialize a new sampling profiler.
+
+        :param path: Directory to flush aggregated ``.profile`` dumps to.
+        :param sample: Profile one out of every ``sample`` requests.
+        :param interval: Flush at most every ``interval`` seconds. Falsy
+        values disable interval-based flushing.
+
+        :param flush_after: Flush after this many samples. Falsy values
+        disable sample-based flushing.
+
+        :param engine: Profiler module to use, defaults to :py:mod:`cProfile`.
+        :param profile_kwargs: Passed to each ``Profile`` object. '''
+
+    if not engine:
+      try:
+        import cProfile as engine
+      except ImportError:  # pragma: nocover
+        import profile as engine
+
+    self.path, self.sample, self.interval, self.flush_after = path, max(int(sample), 1), interval, flush_after
+    self.engine, self.profile_kwargs = engine, profile_kwargs
+    self.stats, self.samples, self.flushed = {}, 0, time.time()
+    self.counter, self.lock, self.writing = itertools.count(), threading.Lock(), threading.Lock()
+
+  def __call__(self, dispatch, environ, start_response):
+
+    ''' Dispatch a request, profiling it if it falls in the sample. '''
+
+    if next(self.counter) % self.sample:
+      return dispatch(environ, start_response)
+
+    profile = self.engine.Profile(**self.profile_kwargs)
+    try:
+      return profile.runcall(dispatch, environ, start_response)
+    finally:
+      self.merge(environ.get('canteen.endpoint') or 'unmatched', profile)
+
+  def merge(self, endpoint, profile):
+
+    ''' Merge a finished ``profile`` into in-memory stats for ``endpoint``,
+        flushing if the sample count or interval has been reached. '''
+
+    with self.lock:
+      if endpoint in self.stats:
+        self.stats[endpoint].add(profile)
+      else:
+        self.stats[endpoint] = pstats.Stats(profile)
+      self.samples += 1
+
+      flush = ((self.flush_after and self.samples >= self.flush_after) or
+               (self.interval and (time.time() - self.flushed) >= self.interval))
+
+    if flush: self.flush()
+
+  def flush(self):
+
+    ''' Write aggregated stats to disk, one cumulative dump per endpoint.
+
+        :returns: ``list`` of dump file paths written. '''
+
+    with self.lock:
+      stats, self.stats, self.samples, self.flushed = self.stats, {}, 0, time.time()
+
+    if not stats: return []
+
+    written = []
+    with self.writing:  # dumps are read back and rewritten, so concurrent flushes would drop each other's samples
+      if not os.path.isdir(self.path): os.makedirs(self.path)
+
+      for endpoint, endpoint_stats in stats.iteritems():
+        dump = os.path.join(self.path, '%s.profile' % str(endpoint).replace(os.sep, '_'))
+        if os.path.exists(dump):
+          endpoint_stats.add(dump)  # accumulate across flushes
+
+        # write aside and rename into place, so a dump is never seen half-written
+        fd, temp = tempfile.mkstemp(dir=self.path, prefix='.tmp')
+        os.close(fd)
+        try:
+          endpoint_stats.dump_stats(temp)
+          os.rename(temp, dump)
+        finally:
+          if os.path.exists(temp): os.remove(temp)
+        written.append(dump)
+    return written
+
+
+__all__ = (
+  'Logger',
+  'SamplingProfiler'
+)
@@ -16,6 +16,19 @@
 
 '''
 
+# stdlib
+import math
+import time
+import random
+import datetime
+import threading
+import collections
+
+
+## Globals
+_flights = {}  # cacheable keys being computed, mapped to their ``_Flight``
+_flights_lock = threading.Lock()
+
 
 ## ``classproperty`` - use like ``@property``, but at the class-level.
 class classproperty(property):
@@ -273,6 +286,9 @@ class bind(object):
         # attach bindings to target class
         target.__aliases__, target.__bindings__ = _aliases, frozenset(_bindings) if _bindings else None
 
+        # bindings changed - drop any resolved injection state
+        if hasattr(target.__class__, 'reset_cache'): target.__class__.reset_cache()
+
         # bind locally, and internally
         return config(target, *self.__config__[0], **self.__config__[1]) if self.__config__ else target
 
@@ -286,9 +302,42 @@ class bind(object):
 
 
 ## `` ``
-def cacheable(key, ttl=None, expire=None, passthrough=__debug__):
+class _Flight(object):
 
-  '''  '''
+  ''' One in-progress computation of a :py:func:`cacheable` key, which
+      concurrent callers wait on instead of computing it again. '''
+
+  __slots__ = ('done', 'value', 'failed')
+
+  def __init__(self):
+
+    '''  '''
+
+    self.done, self.value, self.failed = threading.Event(), None, True
+
+
+## `` ``
+def cacheable(key, ttl=None, expire=None, passthrough=__debug__, negative_ttl=None, beta=1.0, wait=None):
+
+  ''' Cache the result of the decorated function under ``key``.
+
+      Results are stored in an envelope with their expiry, so falsy results
+      are cached too, and every engine honors the TTL. Only one caller (per
+      process) computes a missing or expired key at a time - others get the
+      stale value, if there is one, or wait for the result. Entries may also
+      be refreshed early, with a probability that rises as expiry nears
+      and with how long the function takes to run ("XFetch").
+
+      Hits, misses, refreshes and the like are counted in the wrapped
+      function's ``stats`` :py:class:`collections.Counter`.
+
+      :param ttl: Seconds results live for.
+      :param expire: Absolute expiration, as a timestamp or ``datetime``.
+      :param passthrough: Skip the cache entirely. Defaults to ``__debug__``.
+      :param negative_ttl: Seconds falsy results live for. Defaults to ``ttl``.
+      :param beta: Eagerness of early refreshes - ``0`` disables them.
+      :param wait: Seconds to wait on another caller's computation before
+      computing the value ourselves. Defaults to waiting indefinitely. '''
 
   from canteen.core.api import cache
 
@@ -296,17 +345,17 @@ def cacheable(key, ttl=None, expire=None, passthrough=__debug__):
   if ttl and expire:
     raise RuntimeError('Cannot provide both a TTL and absolute expiration for cacheable item "%s".' % key)
 
-  elif ttl and isinstance(ttl, int):
-    expiration = time.time() + ttl
+  elif ttl and isinstance(ttl, (int, long, float)):
+    expiration = lambda now, value: now + (negative_ttl if (not value and negative_ttl is not None) else ttl)
 
-  elif expire and isinstance(expire, int):
-    expiration = expire  # integer absolute expiration
+  elif expire and isinstance(expire, (int, long, float)):
+    expiration = lambda now, value: expire  # absolute expiration
 
   elif expire and isinstance(expire, datetime.datetime):
-    expiration = time.mktime(expire.timetuple())
+    expiration = lambda now, value, expire=time.mktime(expire.timetuple()): expire
 
   elif (not ttl) and (not expire):
-    expiration = None
+    expiration = lambda now, value: (now + negative_ttl) if (not value and negative_ttl is not None) else None
 
   else:
     raise RuntimeError('Invalid TTL or Expire value given for cacheable item "%s".' % key)
@@ -316,6 +365,35 @@ def cacheable(key, ttl=None, expire=None, passthrough=__debug__):
 
     '''  '''
 
+    stats = collections.Counter()
+
+    def fresh(entry, now):
+
+      ''' Whether a cached ``(value, expires, delta)`` entry may be served
+          without a refresh. '''
+
+      value, expires, delta = entry
+      if expires is None: return True
+      if beta and delta:  # refresh early, more eagerly as expiry nears (``1 - random()`` is never zero)
+        return now - delta * beta * math.log(1.0 - random.random()) < expires
+      return now < expires
+
+    def compute(flight, args, kwargs):
+
+      ''' Run ``func`` and cache its result, on behalf of every caller
+          waiting on ``flight``. '''
+
+      try:
+        started = time.time()
+        value = flight.value = func(*args, **kwargs)
+        finished, flight.failed = time.time(), False
+        cache.CacheAPI.set(key, (value, expiration(finished, value), finished - started))
+        return value
+      finally:
+        with _flights_lock:
+          if _flights.get(key) is flight: del _flights[key]
+        flight.done.set()
+
     def responder(*args, **kwargs):
 
       '''  '''
@@ -323,31 +401,37 @@ def cacheable(key, ttl=None, expire=None, passthrough=__debug__):
       if passthrough:  # optionally passthrough and don't check cache
         return func(*args, **kwargs)
 
-      # check expiration - flush if we have to
-      if expiration and not (time.time() < expiration):
+      now, entry = time.time(), cache.CacheAPI.get(key)
+      if not (isinstance(entry, (tuple, list)) and len(entry) == 3):
+        entry = None  # missing, or not stored by us
 
-        print "Cache item expired: '%s'." % key
+      if entry is not None and fresh(entry, now):
+        stats['hit'] += 1
+        return entry[0]
 
-        cache.CacheAPI.delete(key)
-        val = None
-      else:
-        val = cache.CacheAPI.get(key)
+      with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader: flight = _flights[key] = _Flight()
 
-      # refresh the cache if we have to
-      if not val:
+      if leader:
+        stats['refresh' if entry is not None else 'miss'] += 1
+        return compute(flight, args, kwargs)
 
-        print "Cache miss: '%s'." % key
+      # someone else is computing this key - serve what we have, or wait for theirs
+      if entry is not None:
+        stats['stale'] += 1
+        return entry[0]
 
-        val = func(*args, **kwargs)
-
-        if val:
-          cache.CacheAPI.set(key, val)
-
-      else:
-        print "Cache hit: '%s'." % key
+      stats['wait'] += 1
+      if flight.done.wait(wait) and not flight.failed:
+        return flight.value
 
-      return val
+      stats['miss'] += 1
+      return func(*args, **kwargs)  # leader failed or is taking too long - go it alone
 
+    responder.stats = stats
+    responder.__name__, responder.__doc__ = func.__name__, func.__doc__
     return responder
 
   return injector
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen import timing
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  measures wall-clock time spent importing each module, to keep an
+  eye on process startup cost. deliberately free of canteen imports,
+  so it can be loaded standalone before anything else.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import sys
+import json
+import time
+import __builtin__
+
+
+def profile(modules):
+
+  ''' Import ``modules``, timing every import that loads something new.
+
+      :param modules: Iterable of dotted module names to import.
+
+      :returns: ``list`` of ``(module, self, cumulative, depth)`` tuples,
+      in the order imports started. Times are in seconds. '''
+
+  records, stack, original = [], [], __builtin__.__import__
+  sequence = iter(xrange(sys.maxint))
+
+  def timed_import(name, globals=None, locals=None, fromlist=None, level=-1):
+
+    '''  '''
+
+    before, order = set(sys.modules), next(sequence)
+    stack.append(0.0)  # time spent in nested imports
+    start = time.time()
+
+    try:
+      return original(name, globals, locals, fromlist, level)
+    finally:
+      cumulative, nested = time.time() - start, stack.pop()
+      if stack: stack[-1] += cumulative
+
+      # cached imports are free - only report imports that loaded something
+      loaded = [module for module in set(sys.modules) - before if sys.modules[module] is not None]
+      if loaded:
+        candidates = [module for module in loaded if module == name or module.endswith('.' + name)]
+        records.append((order, min(candidates or loaded, key=len), cumulative - nested, cumulative, len(stack)))
+
+  __builtin__.__import__ = timed_import
+  try:
+    for module in modules:
+      __import__(module)
+  finally:
+    __builtin__.__import__ = original
+  return [record[1:] for record in sorted(records)]
+
+
+def main(argv=None):
+
+  ''' Profile imports named in ``argv`` and write records, as JSON, to the
+      path given as the first argument. Meant to be run in a fresh process.
+
+      :param argv: Output path, followed by module names. Defaults to
+      ``sys.argv[1:]``. '''
+
+  argv = sys.argv[1:] if argv is None else argv
+  records = profile(argv[1:])
+  with open(argv[0], 'w') as handle:
+    json.dump(records, handle)
+
+
+if __name__ == '__main__': main()  # pragma: nocover
+
+
+__all__ = ('profile', 'main')
@@ -17,7 +17,7 @@
 '''
 
 # stdlib
-import abc, logging
+import abc, logging, collections
 
 # canteen util
 from . import decorators
@@ -664,6 +664,153 @@ class BidirectionalEnum(object):
       ])
 
 
+class LocalProxy(object):
+
+  ''' Stands in for the value of ``name`` on a ``threading.local``, so
+      module-level references resolve to the current thread's value on
+      every use. Given a greenlet-local (as the :py:mod:`gevent` runtime
+      uses), they resolve per-greenlet instead. '''
+
+  __slots__ = ('__local', '__name')
+
+  def __init__(self, local, name):
+
+    ''' Construct a new proxy for ``local.<name>``.
+
+        :param local: ``threading.local`` holding the real value.
+        :param name: Attribute name to resolve on ``local``. '''
+
+    object.__setattr__(self, '_LocalProxy__local', local)
+    object.__setattr__(self, '_LocalProxy__name', name)
+
+  def __resolve__(self):
+
+    ''' Retrieve the current value behind this proxy.
+
+        :raises RuntimeError: If no value is bound in this thread.
+        :returns: '''
+
+    try:
+      return getattr(self.__local, self.__name)
+    except AttributeError:
+      raise RuntimeError('No `%s` is bound in this context.' % self.__name)
+
+  # report the proxied class, so ``isinstance`` checks see through the proxy
+  __class__ = property(lambda self: self.__resolve__().__class__)
+
+  __getattr__ = lambda self, name: getattr(self.__resolve__(), name)
+  __setattr__ = lambda self, name, value: setattr(self.__resolve__(), name, value)
+  __delattr__ = lambda self, name: delattr(self.__resolve__(), name)
+  __getitem__ = lambda self, key: self.__resolve__()[key]
+  __setitem__ = lambda self, key, value: self.__resolve__().__setitem__(key, value)
+  __delitem__ = lambda self, key: self.__resolve__().__delitem__(key)
+  __contains__ = lambda self, key: key in self.__resolve__()
+  __call__ = lambda self, *args, **kwargs: self.__resolve__()(*args, **kwargs)
+  __iter__ = lambda self: iter(self.__resolve__())
+  __len__ = lambda self: len(self.__resolve__())
+  __nonzero__ = lambda self: bool(self.__resolve__())
+  __eq__ = lambda self, other: self.__resolve__() == other
+  __ne__ = lambda self, other: self.__resolve__() != other
+  __hash__ = lambda self: hash(self.__resolve__())
+  __str__ = lambda self: str(self.__resolve__())
+  __unicode__ = lambda self: unicode(self.__resolve__())
+  __repr__ = lambda self: '<LocalProxy %s>' % self.__name
+
+
+class ChainMap(collections.MutableMapping):
+
+  ''' Layered view over a sequence of mappings, searched in order. Writes
+      and deletes only touch the first mapping, so shared layers further
+      down the chain are never modified. '''
+
+  __slots__ = ('maps',)
+
+  def __init__(self, *maps):
+
+    ''' Construct a new chain over ``maps``.
+
+        :param maps: Mappings to search, highest-priority first.
+        :returns: '''
+
+    self.maps = list(maps) or [{}]
+
+  def __getitem__(self, key):
+
+    ''' Retrieve ``key`` from the first mapping that has it.
+
+        :param key:
+        :returns: '''
+
+    for mapping in self.maps:
+      if key in mapping:
+        return mapping[key]
+    raise KeyError(key)
+
+  def __contains__(self, key):
+
+    ''' Test whether any mapping in the chain holds ``key``.
+
+        :param key:
+        :returns: '''
+
+    return any(key in mapping for mapping in self.maps)
+
+  def __setitem__(self, key, value):
+
+    ''' Set ``key`` on the first mapping in the chain.
+
+        :param key:
+        :param value: '''
+
+    self.maps[0][key] = value
+
+  def __delitem__(self, key):
+
+    ''' Delete ``key`` from the first mapping in the chain.
+
+        :param key: '''
+
+    del self.maps[0][key]
+
+  def __iter__(self):
+
+    ''' Iterate over unique keys across the chain.
+
+        :returns: '''
+
+    seen = set()
+    for mapping in self.maps:
+      for key in mapping:
+        if key not in seen:
+          seen.add(key)
+          yield key
+
+  def __len__(self):
+
+    ''' Count unique keys across the chain.
+
+        :returns: '''
+
+    return len(set().union(*self.maps))
+
+  def __repr__(self):
+
+    ''' Represent this chain as a string.
+
+        :returns: '''
+
+    return '<ChainMap %r>' % self.maps
+
+  def new_child(self, mapping=None):
+
+    ''' Layer a new mapping on top of this chain.
+
+        :param mapping: Mapping to add. Defaults to a new ``dict``.
+        :returns: New :py:class:`ChainMap`, sharing existing layers. '''
+
+    return self.__class__(*([mapping if mapping is not None else {}] + self.maps))
+
+
 __all__ = (
   'Sentinel',
   '_EMPTY',
@@ -673,5 +820,7 @@ __all__ = (
   'WritableObjectProxy',
   'CallbackProxy',
   'ObjectDictBridge',
-  'BidirectionalEnum'
+  'BidirectionalEnum',
+  'ChainMap',
+  'LocalProxy'
 )
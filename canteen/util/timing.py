@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen timing utils
+  ~~~~~~~~~~~~~~~~~~~~
+
+  lightweight wall-clock instrumentation for request dispatch. spans
+  are recorded per-request and handed off to a pluggable collector.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import abc
+import time
+import socket
+import threading
+import collections
+
+
+## Globals
+clock = time.time  # wall-clock time, not CPU time (as with ``time.clock``)
+_ENVIRON_KEY = 'canteen.timing'
+
+
+class Timing(object):
+
+  ''' Holds wall-clock spans recorded while dispatching a single request. '''
+
+  __slots__ = ('spans', 'started', 'checkpoint', 'collector', 'header')
+
+  def __init__(self, collector=None, header=False):
+
+    ''' Start a new request timing, with the clock running from now.
+
+        :param collector: :py:class:`Collector` to hand spans to when the
+        request is finished, if any.
+
+        :param header: Whether to produce a ``Server-Timing`` header. '''
+
+    self.spans, self.collector, self.header = [], collector, header
+    self.started = self.checkpoint = clock()
+
+  @staticmethod
+  def current(environ):
+
+    ''' Retrieve the :py:class:`Timing` for the request described by a WSGI
+        ``environ``, if timing is enabled.
+
+        :param environ: WSGI environment for the current request.
+        :returns: Active :py:class:`Timing` object, or ``None``. '''
+
+    return environ.get(_ENVIRON_KEY) if environ else None
+
+  def bind(self, environ):
+
+    ''' Attach this timing to a WSGI ``environ``, so code further down the
+        stack can record spans via :py:meth:`Timing.current`.
+
+        :param environ: WSGI environment for the current request.
+        :returns: ``self``, for chainability. '''
+
+    environ[_ENVIRON_KEY] = self
+    return self
+
+  def mark(self, name):
+
+    ''' Record a span named ``name``, covering time since the last mark.
+
+        :param name: Name of the phase that just completed.
+        :returns: Duration of the span, in seconds. '''
+
+    now = clock()
+    duration, self.checkpoint = now - self.checkpoint, now
+    self.spans.append((name, duration))
+    return duration
+
+  def record(self, name, start, end=None):
+
+    ''' Record an explicit span, which may overlap with marked phases.
+
+        :param name: Name of the span.
+        :param start: Wall-clock start time, from :py:func:`clock`.
+        :param end: Wall-clock end time. Defaults to now.
+        :returns: Duration of the span, in seconds. '''
+
+    duration = (end or clock()) - start
+    self.spans.append((name, duration))
+    return duration
+
+  @property
+  def total(self):
+
+    ''' Total wall-clock time elapsed since this request started. '''
+
+    return clock() - self.started
+
+  def render(self, total=None):
+
+    ''' Render recorded spans as a ``Server-Timing`` header value.
+
+        :param total: Total duration to report, in seconds. Defaults to
+        time elapsed so far.
+
+        :returns: ``str`` header value. '''
+
+    return ', '.join(['%s;dur=%.3f' % (name, duration * 1000) for name, duration in self.spans] + [
+                      'total;dur=%.3f' % ((total if total is not None else self.total) * 1000)])
+
+  def finish(self, endpoint=None, headers=None):
+
+    ''' Finish this request timing, attaching a ``Server-Timing`` header to
+        ``headers`` (if enabled) and handing spans to the collector.
+
+        :param endpoint: Name of the matched route endpoint, if any.
+        :param headers: ``list`` of header tuples or a ``Headers`` object.
+        :returns: Total duration of the request, in seconds. '''
+
+    total = self.total
+
+    if self.header and headers is not None:
+      if isinstance(headers, list):
+        headers.append(('Server-Timing', self.render(total)))
+      else:
+        headers.add('Server-Timing', self.render(total))
+
+    if self.collector is not None:
+      self.collector.collect(endpoint, total, tuple(self.spans))
+    return total
+
+
+class Collector(object):
+
+  ''' Abstract sink for finished request timings. '''
+
+  __metaclass__ = abc.ABCMeta
+
+  @abc.abstractmethod
+  def collect(self, endpoint, total, spans):
+
+    ''' Accept timing for a finished request.
+
+        :param endpoint: Matched route endpoint, or ``None``.
+        :param total: Total request duration, in seconds.
+        :param spans: ``tuple`` of ``(name, duration)`` pairs. '''
+
+    raise NotImplementedError('`Collector.collect` is abstract.')
+
+  @staticmethod
+  def configure(config):
+
+    ''' Build a collector from a ``timing`` config block.
+
+        :param config: ``dict`` of timing config. ``collector`` may be
+        ``ring``, ``statsd``, a :py:class:`Collector` subclass or an
+        instance of one.
+
+        :returns: Configured :py:class:`Collector` instance, or ``None``
+        if timing is not enabled. '''
+
+    if not config or not config.get('enable', False): return None
+
+    collector = config.get('collector', 'ring')
+    if isinstance(collector, Collector): return collector
+    if isinstance(collector, basestring):
+      if collector not in _collectors:
+        raise RuntimeError('Unrecognized timing collector: "%s".' % collector)
+      collector = _collectors[collector]
+    return collector(**config.get('options', {}))
+
+
+class RingBuffer(Collector):
+
+  ''' Keeps the last ``size`` request timings in-process. '''
+
+  def __init__(self, size=1024):
+
+    ''' Initialize a new bounded timing buffer.
+
+        :param size: Maximum number of timings to retain. '''
+
+    self.buffer = collections.deque(maxlen=size)
+
+  def collect(self, endpoint, total, spans):
+
+    ''' Append a finished request timing, discarding the oldest entry
+        if the buffer is full. '''
+
+    self.buffer.append((endpoint, total, spans))
+
+  def __iter__(self):
+
+    ''' Iterate over buffered timings, oldest first. '''
+
+    return iter(list(self.buffer))
+
+  def __len__(self):
+
+    ''' Count buffered timings. '''
+
+    return len(self.buffer)
+
+
+class Statsd(Collector):
+
+  ''' Ships request timings to a statsd-style daemon over UDP. '''
+
+  def __init__(self, host='127.0.0.1', port=8125, prefix='canteen'):
+
+    ''' Initialize a new statsd collector.
+
+        :param host: Hostname or address of the statsd daemon.
+        :param port: UDP port of the statsd daemon.
+        :param prefix: Prefix prepended to every metric name. '''
+
+    self.address, self.prefix, self.local = (host, port), prefix, threading.local()
+
+  @property
+  def socket(self):
+
+    ''' Lazily-opened, non-blocking UDP socket (one per thread). '''
+
+    if not hasattr(self.local, 'socket'):
+      self.local.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+      self.local.socket.setblocking(0)
+    return self.local.socket
+
+  def collect(self, endpoint, total, spans):
+
+    ''' Send all spans for a request, as one multi-metric datagram.
+        Errors are swallowed - instrumentation must never break dispatch. '''
+
+    base = '.'.join((self.prefix, str(endpoint or 'unmatched')))
+    packet = '\n'.join(['%s.%s:%.3f|ms' % (base, name, duration * 1000) for name, duration in spans] + [
+                        '%s.total:%.3f|ms' % (base, total * 1000)])
+
+    try:
+      self.socket.sendto(packet, self.address)
+    except socket.error:  # pragma: nocover
+      pass
+
+
+_collectors = {
+  'ring': RingBuffer,
+  'statsd': Statsd
+}
+
+
+__all__ = (
+  'Timing',
+  'Collector',
+  'RingBuffer',
+  'Statsd'
+)
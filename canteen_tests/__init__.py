@@ -36,6 +36,8 @@ if __debug__:
   from . import test_util
   from . import test_model
   from . import test_adapters
+  from . import test_logic
+  from . import test_base
 
 
   class SanityTest(test.FrameworkTest):
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen base tests
+  ~~~~~~~~~~~~~~~~~~
+
+  tests for canteen's base classes.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import os
+
+if 'TEST_REIMPORT' in os.environ:  # pragma: nocover
+  from canteen_tests.test_base import test_handler
+
+
+__all__ = (
+  'test_handler',
+)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen handler tests
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  tests for canteen's base handler and its render context.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import os
+import shutil
+import unittest
+import tempfile
+
+# testing
+from canteen import test
+
+# canteen
+from canteen.logic import http
+from canteen.base import handler
+from canteen.util import config
+from canteen.core.api import template
+
+# werkzeug
+from werkzeug.test import EnvironBuilder
+
+try:
+  from canteen import rpc
+except ImportError:  # pragma: nocover
+  rpc = None
+
+
+class Runtime(object):
+
+  ''' Just enough runtime for a handler to render with. '''
+
+  routes = None
+
+  def __init__(self, settings):
+
+    ''' Hold app config (on the instance - ``Config`` is a descriptor). '''
+
+    self.config = settings
+
+
+class HandlerContextTest(test.FrameworkTest):
+
+  ''' Tests render context on :py:class:`canteen.base.handler.Handler`. '''
+
+  source = '{{ who }}|{{ extra|default("none") }}|{{ http.request.path }}'
+
+  def setUp(self):
+
+    ''' Write a template to render, and build a handler class for it. '''
+
+    self.root, self.saved = tempfile.mkdtemp(), config._appconfig
+    with open(os.path.join(self.root, 'context.html'), 'w') as handle:
+      handle.write(self.source)
+
+    self.settings = config.Config(app={'paths': {'templates': self.root}}, config={'TemplateAPI': {'debug': True}})
+
+    class Context(handler.Handler):
+
+      ''' Renders without the RPC layer, which only the static context needs. '''
+
+      __static_context__ = {'route': {'resolve': None}}
+
+    self.handler = Context
+    template.TemplateAPI.invalidate()
+
+  def tearDown(self):
+
+    ''' Clean up the template and cached environments. '''
+
+    template.TemplateAPI.invalidate()
+    config._appconfig = self.saved
+    shutil.rmtree(self.root)
+
+  def spawn(self, path):
+
+    ''' Build a handler for a request to ``path``. '''
+
+    return self.handler(EnvironBuilder(path).get_environ(), None, Runtime(self.settings))
+
+  def render(self, target, **context):
+
+    ''' Render our template from ``target``, buffered. '''
+
+    return ''.join(target.render('context.html', _direct=True, **context)[3])
+
+  def test_render_isolated(self):
+
+    ''' Test that per-render and per-request values never carry over to the
+        next render, on one handler or the next. '''
+
+    first = self.spawn('/one')
+    assert self.render(first, who='a', extra='x') == 'a|x|/one'
+    assert self.render(first, who='b') == 'b|none|/one'
+
+    second = self.spawn('/two')
+    assert self.render(second, who='c') == 'c|none|/two'
+    assert 'extra' not in second.base_context
+    assert second.base_context['handler'] is second
+
+  def test_context_not_written(self):
+
+    ''' Test that rendering leaves shared context layers untouched. '''
+
+    target = self.spawn('/')
+    self.render(target, who='a', extra='x')
+
+    assert self.handler.__static_context__ == {'route': {'resolve': None}}
+    assert not any('who' in layer for layer in target.base_context.maps)
+
+  def test_base_context_per_request(self):
+
+    ''' Test that template base values are rebuilt for each request, so they
+        follow config rather than freezing on first use. '''
+
+    first, second = self.spawn('/one'), self.spawn('/two')
+
+    assert first.base_context.maps[-1] is first.base_context.maps[-1]
+    assert first.base_context.maps[-1] is not second.base_context.maps[-1]
+    assert first.base_context['__debug__'] == (__debug__ and config.Config().debug)
+    assert self.handler.__dict__.get('__base_context__') is None
+
+  @unittest.skipIf(rpc is None, 'RPC layer unavailable')
+  def test_static_context_per_class(self):
+
+    ''' Test that the static context is built once per handler class. '''
+
+    class Fresh(handler.Handler):
+
+      '''  '''
+
+    class Other(handler.Handler):
+
+      '''  '''
+
+    fresh = Fresh(EnvironBuilder('/').get_environ(), None, Runtime(self.settings))
+    assert fresh.static_context is Fresh(EnvironBuilder('/').get_environ(), None, Runtime(self.settings)).static_context
+    assert Other(EnvironBuilder('/').get_environ(), None, Runtime(self.settings)).static_context is not fresh.static_context
+    assert 'services' in fresh.context
@@ -20,13 +20,17 @@
 import os
 
 if 'TEST_REIMPORT' in os.environ:  # pragma: nocover
+  from canteen_tests.test_core import test_cache
   from canteen_tests.test_core import test_runtime
+  from canteen_tests.test_core import test_template
   from canteen_tests.test_core import test_meta
   from canteen_tests.test_core import test_injection
 
 
 __all__ = (
+  'test_cache',
   'test_runtime',
+  'test_template',
   'test_injection',
   'test_meta'
 )
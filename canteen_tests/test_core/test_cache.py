@@ -0,0 +1,468 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen core cache tests
+  ~~~~~~~~~~~~~~~~~~~~~~~~
+
+  tests canteen's cache API and its engines.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import os
+import time
+import fcntl
+import Queue
+import fnmatch
+import tempfile
+
+# testing
+from canteen import test
+
+# cache API
+from canteen.core.api import cache
+
+
+class BoundedCacheTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.core.api.cache.CacheAPI.Boundedcache`. '''
+
+  def test_lru_eviction(self):
+
+    ''' Test that the least recently used entry is evicted when full. '''
+
+    engine = cache.CacheAPI.spawn('test_lru', engine=cache.CacheAPI.Boundedcache, max_entries=2)
+    engine.set('a', 1), engine.set('b', 2)
+    engine.get('a')
+    engine.set('c', 3)
+
+    assert engine.get('a') == 1
+    assert engine.get('b') is None
+    assert engine.get('c') == 3
+
+  def test_lfu_eviction(self):
+
+    ''' Test that the least frequently used entry is evicted when full. '''
+
+    engine = cache.CacheAPI.Boundedcache(max_entries=2, policy='lfu')
+    engine.set('a', 1), engine.set('b', 2)
+    engine.get('a'), engine.get('a'), engine.get('b')
+    engine.set('c', 3)
+    engine.get('c'), engine.get('c'), engine.get('c')
+    engine.set('d', 4)
+
+    assert engine.get('a') is None
+    assert engine.get('b') is None
+    assert engine.get('c') == 3
+    assert engine.get('d') == 4
+
+  def test_max_bytes(self):
+
+    ''' Test that entries are evicted to stay under ``max_bytes``. '''
+
+    engine = cache.CacheAPI.Boundedcache(max_bytes=3000)
+    engine.set('a', 'x' * 1000), engine.set('b', 'x' * 1000), engine.set('c', 'x' * 1000)
+
+    assert engine.get('a') is None
+    assert engine.size <= 3000
+
+    engine.set('huge', 'x' * 5000)
+    assert engine.get('huge') is None
+
+  def test_ttl(self):
+
+    ''' Test that entries expire lazily, and in periodic sweeps. '''
+
+    engine = cache.CacheAPI.Boundedcache(ttl=60, interval=0)
+    engine.set('a', 1), engine.set('b', 2, ttl=-1)
+
+    assert engine.get('a') == 1
+    assert engine.get('b') is None
+
+    engine.target['a'][2] = time.time() - 1
+    assert engine.tick() == 1
+    assert len(engine.target) == 0
+    assert engine.size == 0
+
+
+class MappedCacheTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.core.api.cache.CacheAPI.Mappedcache`. '''
+
+  def setUp(self):
+
+    ''' Open a small cache in a temporary file. '''
+
+    self.path = tempfile.mktemp(suffix='.mmap')
+    self.engine = cache.CacheAPI.Mappedcache(path=self.path, slots=16, slot_size=128, probes=2)
+
+  def tearDown(self):
+
+    ''' Remove the cache file. '''
+
+    os.remove(self.path)
+
+  def test_set_get_delete(self):
+
+    ''' Test basic operations, and that values are serialized. '''
+
+    self.engine.set('a', {'value': [1, 2]})
+    self.engine.set(u'b', 'text')
+
+    assert self.engine.get('a') == {'value': [1, 2]}
+    assert self.engine.get('b') == 'text'
+    assert self.engine.get('c', 'default') == 'default'
+    assert sorted(key for key, value in self.engine.items()) == ['a', 'b']
+
+    self.engine.delete('a')
+    assert self.engine.get('a') is None
+    assert self.engine.clear() == 1
+
+  def test_shared_between_processes(self):
+
+    ''' Test that values written by one process are read by another. '''
+
+    pid = os.fork()
+    if not pid:  # pragma: nocover
+      cache.CacheAPI.Mappedcache(path=self.path, slots=16, slot_size=128, probes=2).set('child', os.getpid())
+      os._exit(0)
+
+    os.waitpid(pid, 0)
+    assert self.engine.get('child') == pid
+
+  def test_inherited_between_processes(self):
+
+    ''' Test that an engine built before a fork locks workers out of each
+        other, and shares values between them. '''
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if not pid:  # pragma: nocover
+      self.engine.set('child', os.getpid())
+      with self.engine.locked(fcntl.LOCK_EX):
+        os.write(write, 'locked')
+        time.sleep(0.5)
+      os._exit(0)
+
+    try:
+      os.read(read, 6)
+      try:
+        with self.engine.locked(fcntl.LOCK_EX | fcntl.LOCK_NB):
+          raise AssertionError('Lock held by a forked worker was not exclusive.')
+      except IOError:
+        pass
+    finally:
+      os.waitpid(pid, 0)
+      os.close(read), os.close(write)
+
+    assert self.engine.get('child') == pid
+
+  def test_limits(self):
+
+    ''' Test that oversized values are skipped, TTLs are honored, and
+        full probe windows overwrite the oldest entry. '''
+
+    self.engine.set('big', 'x' * 256)
+    assert self.engine.get('big') is None
+
+    self.engine.set('gone', 1, ttl=-1)
+    assert self.engine.get('gone') is None
+
+    for i in xrange(64):
+      self.engine.set('key-%s' % i, i)
+    assert self.engine.get('key-63') == 63
+    assert len(list(self.engine.items())) <= 16
+
+  def test_layout_mismatch(self):
+
+    ''' Test that opening a file laid out differently keeps its layout (and
+        entries) instead of resizing it under processes that have it mapped. '''
+
+    self.engine.set('kept', 1)
+    size = os.path.getsize(self.path)
+
+    other = cache.CacheAPI.Mappedcache(path=self.path, slots=64, slot_size=256, probes=2)
+    assert (other.slots, other.slot_size) == (16, 128)
+    assert os.path.getsize(self.path) == size
+    assert other.get('kept') == 1
+
+    other.set('other', 2)
+    assert self.engine.get('other') == 2
+
+  def test_unrecognized_file(self):
+
+    ''' Test that a file that isn't a cache is grown to size and started over. '''
+
+    with open(self.path, 'w') as handle:
+      handle.write('not a cache')
+
+    engine = cache.CacheAPI.Mappedcache(path=self.path, slots=16, slot_size=128, probes=2)
+    assert os.path.getsize(self.path) == engine.header.size + 16 * 128
+    assert engine.get('kept') is None
+    engine.set('kept', 1)
+    assert engine.get('kept') == 1
+
+
+class FakeRedis(object):
+
+  ''' Just enough of a ``StrictRedis`` client to test the redis engine,
+      counting round trips. '''
+
+  def __init__(self):
+
+    '''  '''
+
+    self.data, self.expiry, self.calls = {}, {}, 0
+
+  def get(self, key):
+
+    '''  '''
+
+    self.calls += 1
+    return self.data.get(key)
+
+  def mget(self, keys):
+
+    '''  '''
+
+    self.calls += 1
+    return [self.data.get(key) for key in keys]
+
+  def set(self, key, value, ex=None):
+
+    '''  '''
+
+    self.calls += 1
+    self.data[key], self.expiry[key] = value, ex
+
+  def delete(self, *keys):
+
+    '''  '''
+
+    self.calls += 1
+    for key in keys: self.data.pop(key, None)
+
+  def scan_iter(self, match):
+
+    '''  '''
+
+    self.calls += 1
+    return iter([key for key in self.data if fnmatch.fnmatch(key, match)])
+
+  def pipeline(self, transaction=True):
+
+    '''  '''
+
+    client, commands = self, []
+
+    class Pipeline(object):
+
+      '''  '''
+
+      def set(self, *args, **kwargs):
+
+        '''  '''
+
+        commands.append((args, kwargs))
+
+      def execute(self):
+
+        '''  '''
+
+        for args, kwargs in commands: FakeRedis.set(client, *args, **kwargs)
+        client.calls -= len(commands) - 1  # one round trip for the lot
+
+    return Pipeline()
+
+
+class RedisCacheTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.core.api.cache.CacheAPI.Rediscache`. '''
+
+  def setUp(self):
+
+    ''' Connect a cache to a fake client. '''
+
+    self.client = FakeRedis()
+    self.engine = cache.CacheAPI.Rediscache(name='test', client=self.client, compress=64)
+
+  def test_set_get_delete(self):
+
+    ''' Test basic operations, and that keys are namespaced. '''
+
+    self.engine.set('a', {'value': [1, 2]})
+    self.engine.set(u'b', 'text', ttl=30)
+
+    assert self.engine.get('a') == {'value': [1, 2]}
+    assert self.engine.get('b') == 'text'
+    assert self.engine.get('c', 'default') == 'default'
+    assert self.client.expiry['canteen:cache:test:b'] == 30
+    assert sorted(key for key, value in self.engine.items()) == ['a', 'b']
+
+    self.engine.delete('a')
+    assert self.engine.get('a') is None
+    assert self.engine.clear() == 1
+    assert not self.client.data
+
+  def test_multi_round_trips(self):
+
+    ''' Test that multi-key operations take one round trip each. '''
+
+    self.engine.set_multi(dict(('key-%s' % i, i) for i in xrange(10)), ttl=5)
+    assert self.client.calls == 1
+
+    assert self.engine.get_multi(['key-1', 'key-2', 'missing']) == [1, 2, None]
+    assert self.client.calls == 2
+
+    self.engine.delete_multi(['key-%s' % i for i in xrange(10)])
+    assert self.client.calls == 3 and not self.client.data
+
+  def test_compression(self):
+
+    ''' Test that only large values are compressed. '''
+
+    self.engine.set('small', 'x')
+    self.engine.set('large', 'x' * 1024)
+
+    assert self.client.data['canteen:cache:test:small'][0] == self.engine.RAW
+    assert self.client.data['canteen:cache:test:large'][0] == self.engine.COMPRESSED
+    assert len(self.client.data['canteen:cache:test:large']) < 1024
+    assert self.engine.get('large') == 'x' * 1024
+
+
+class FakeBus(object):
+
+  ''' Just enough redis pub/sub to test near cache invalidation. '''
+
+  def __init__(self):
+
+    '''  '''
+
+    self.subscribers = []
+
+  def publish(self, channel, data):
+
+    '''  '''
+
+    for subscription in self.subscribers:
+      if channel in subscription.channels:
+        subscription.queue.put({'type': 'message', 'channel': channel, 'data': data})
+
+  def pubsub(self):
+
+    '''  '''
+
+    bus = self
+
+    class Subscription(object):
+
+      '''  '''
+
+      def __init__(self):
+
+        '''  '''
+
+        self.channels, self.queue = set(), Queue.Queue()
+        bus.subscribers.append(self)
+
+      def subscribe(self, channel):
+
+        '''  '''
+
+        self.channels.add(channel)
+
+      def unsubscribe(self):
+
+        '''  '''
+
+        bus.subscribers.remove(self)
+        self.queue.put(None)
+
+      def listen(self):
+
+        '''  '''
+
+        for message in iter(self.queue.get, None):
+          yield message
+
+    return Subscription()
+
+
+class NearCacheTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.core.api.cache.CacheAPI.Nearcache`. '''
+
+  def setUp(self):
+
+    ''' Front one shared engine with two "nodes". '''
+
+    self.bus, self.remote = FakeBus(), cache.CacheAPI.Boundedcache()
+    self.nodes = [cache.CacheAPI.Nearcache(remote=self.remote, invalidation=self.bus) for i in xrange(2)]
+
+  def tearDown(self):
+
+    ''' Stop listening for invalidations. '''
+
+    for node in self.nodes: node.close()
+
+  def test_served_locally(self):
+
+    ''' Test that reads are served from local memory once fetched. '''
+
+    first, second = self.nodes
+    first.set('a', 1)
+    assert second.get('a') == 1
+
+    self.remote.set('a', 2)  # behind the near caches' backs
+    assert second.get('a') == 1
+    assert second.get_multi(['a', 'missing'], 'default') == [1, 'default']
+
+    second.local.clear()
+    assert second.get('a') == 2
+
+  def test_ttl(self):
+
+    ''' Test that local copies expire after the near cache's TTL. '''
+
+    node = cache.CacheAPI.Nearcache(remote=self.remote, ttl=0.01)
+    node.set('a', 1)
+    self.remote.set('a', 2)
+
+    time.sleep(0.02)
+    assert node.get('a') == 2
+
+  def test_invalidation(self):
+
+    ''' Test that writes on one node drop local copies on the others. '''
+
+    first, second = self.nodes
+    first.set('a', 1)
+    assert second.get('a') == 1
+
+    first.set('a', 2)
+    for i in xrange(100):
+      if second.local.get('a') is None: break
+      time.sleep(0.01)
+    assert second.get('a') == 2
+
+  def test_spawn_composition(self):
+
+    ''' Test that ``spawn`` accepts composed engines, built or not. '''
+
+    node = self.nodes[0]
+    assert cache.CacheAPI.spawn('near-built', engine=node) is node
+
+    client = FakeRedis()
+    spawned = cache.CacheAPI.spawn('near-remote', engine=cache.CacheAPI.Nearcache, remote='redis', remote_options={
+      'client': client, 'prefix': 'near:'})
+    spawned.set('a', 1)
+
+    assert isinstance(spawned.remote, cache.CacheAPI.Rediscache)
+    assert 'near:near-remote:a' in client.data
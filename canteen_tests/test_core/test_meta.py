@@ -198,6 +198,33 @@ class ClassRegistryTest(test.FrameworkTest):
     for i in (ListChildOne, ListChildTwo, ListChildThree):
       assert i in _results
 
+  def test_frozen_children(self):
+
+    ''' Try freezing the registry, and make sure
+        child lists are precomputed until something
+        new is registered. '''
+
+    # make a registered class tree
+    class FrozenChildrenRegistry(object):
+      __owner__, __metaclass__ = "FrozenChildrenRegistry", meta.Proxy.Registry
+
+    # make implementors
+    class FrozenChildOne(FrozenChildrenRegistry): pass
+    class FrozenChildTwo(FrozenChildrenRegistry): pass
+
+    meta.freeze()
+
+    assert meta.Proxy.Registry.__children__ is not None
+    assert meta.Proxy.Registry.__children__[FrozenChildrenRegistry] == (FrozenChildOne, FrozenChildTwo)
+    assert FrozenChildrenRegistry.children() == [FrozenChildOne, FrozenChildTwo]
+    assert FrozenChildOne.children() == [FrozenChildTwo]
+
+    # registering something new thaws the registry
+    class FrozenChildThree(FrozenChildrenRegistry): pass
+
+    assert meta.Proxy.Registry.__children__ is None
+    assert FrozenChildThree in FrozenChildrenRegistry.children()
+
 
 class ClassComponentTest(test.FrameworkTest):
 
@@ -340,3 +367,44 @@ class ClassComponentTest(test.FrameworkTest):
     # check singleton's presence in the map
     assert singleton_one in SingletonTest.__class__.singleton_map.values()
     assert singleton_two in SingletonTest.__class__.singleton_map.values()
+
+  def test_resolved_cache(self):
+
+    ''' Try resolving injected attributes through a
+        delegate's resolved-attribute cache, and make
+        sure new components invalidate it. '''
+
+    class TestCompound(object):
+      __metaclass__ = injection.Compound
+
+    class ResolvedTest(TestCompound):
+
+      '''  '''
+
+    i = ResolvedTest()
+
+    # a miss is cached too, but must not survive a new component
+    with self.assertRaises(AttributeError):
+      i.lateinjectable
+
+    @decorators.bind('lateinjectable')
+    class LateInjectable(self.test_construct_component()):
+
+      '''  '''
+
+      @decorators.bind('test', wrap=staticmethod)
+      def test():
+
+        '''  '''
+
+        return True
+
+    assert i.lateinjectable
+    assert i.lateinjectable.test()
+    assert 'lateinjectable' in ResolvedTest.__resolved__
+    assert ResolvedTest.__resolved__[None] == meta.Proxy.Component.__generation__
+
+    # clean up
+    meta.Proxy.Component.reset_cache()
+    assert 'lateinjectable' not in ResolvedTest.__resolved__ or (
+      ResolvedTest.__resolved__[None] != meta.Proxy.Component.__generation__)
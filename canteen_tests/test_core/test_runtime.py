@@ -17,7 +17,13 @@
 '''
 
 # stdlib
+import os
+import sys
+import time
+import types
+import signal
 import operator
+import threading
 
 # testing
 from canteen import test
@@ -98,3 +104,1203 @@ class RuntimeLibraryTest(test.FrameworkTest):
 
     with runtime.Library(operator, strict=True) as (library, _operator):
       assert hasattr(_operator, 'eq')
+
+
+class RuntimeHooksTest(test.FrameworkTest):
+
+  ''' Tests hook registration and the compiled hook pipeline
+      on :py:class:`canteen.core.runtime.Runtime`. '''
+
+  def test_add_hook_invalidates_pipeline(self):
+
+    ''' Test that adding a hook to :py:class:`runtime.Runtime`
+        invalidates the compiled hook pipeline. '''
+
+    runtime.Runtime.compile_hooks()
+    assert runtime.Runtime.__pipeline__ is not None
+
+    runtime.Runtime.add_hook('test_invalidate', (runtime.Runtime, staticmethod(lambda **kwargs: None)))
+    assert runtime.Runtime.__pipeline__ is None
+
+  def test_compile_hooks(self):
+
+    ''' Test that hooks are compiled into a flat ``tuple`` of
+        callables, and that hookpoints with no listeners resolve
+        to an empty ``tuple``. '''
+
+    calls = []
+    runtime.Runtime.add_hook('test_compile', (runtime.Runtime, staticmethod(lambda **kwargs: calls.append(kwargs))))
+
+    hooks = runtime.Runtime.resolve_hooks('test_compile')
+    assert isinstance(hooks, tuple)
+    assert len(hooks) == 1
+    assert runtime.Runtime.resolve_hooks('test_i_have_no_listeners') == ()
+
+    runtime.Runtime.execute_hooks('test_compile', value=True)
+    assert calls == [{'value': True}]
+
+  def test_compound_hookpoints(self):
+
+    ''' Test that compound hookpoints resolve to hooks from
+        each hookpoint, in order. '''
+
+    calls = []
+
+    class HookContext(object):
+
+      ''' Context class for hook tests. '''
+
+      @classmethod
+      def first(cls, **kwargs):
+
+        ''' First hook. '''
+
+        calls.append(('first', cls))
+
+      @staticmethod
+      def second(**kwargs):
+
+        ''' Second hook. '''
+
+        calls.append(('second', None))
+
+    runtime.Runtime.add_hook('test_compound_first', (HookContext, HookContext.__dict__['first']))
+    runtime.Runtime.add_hook('test_compound_second', (HookContext, HookContext.__dict__['second']))
+
+    runtime.Runtime.execute_hooks(('test_compound_first', 'test_compound_second'))
+    assert calls == [('first', HookContext), ('second', None)]
+
+  def test_pending_hooks(self):
+
+    ''' Test that a hook whose singleton isn't ready yet stays in the
+        pipeline, failing until the singleton exists, and is bound then. '''
+
+    calls, singletons = [], runtime.Proxy.Component.singleton_map
+
+    class PendingContext(object):
+
+      ''' Singleton context that isn't constructed yet. '''
+
+      __singleton__ = True
+
+      def hook(self, **kwargs):
+
+        ''' Record the call. '''
+
+        calls.append(self)
+
+    runtime.Runtime.add_hook('test_pending', (PendingContext, PendingContext.__dict__['hook']))
+    try:
+      assert len(runtime.Runtime.resolve_hooks('test_pending')) == 1
+
+      with self.assertRaises(RuntimeError):
+        runtime.Runtime.execute_hooks('test_pending')
+
+      singletons['PendingContext'] = context = PendingContext()
+      runtime.Runtime.execute_hooks('test_pending')
+      assert runtime.Runtime.__pipeline__ is None
+
+      hook, = runtime.Runtime.resolve_hooks('test_pending')
+      assert hook.__self__ is context
+      runtime.Runtime.execute_hooks('test_pending')
+      assert calls == [context, context]
+
+    finally:
+      singletons.pop('PendingContext', None)
+      runtime.Runtime.__hooks__.pop('test_pending')
+      runtime.Runtime.__pipeline__ = None
+
+
+class RuntimeContextTest(test.FrameworkTest):
+
+  ''' Tests per-request context on :py:class:`canteen.core.runtime.Runtime`. '''
+
+  def test_routes_thread_local(self):
+
+    ''' Test that routes bound by one thread are not visible to another. '''
+
+    class ContextRuntime(runtime.Runtime):
+
+      ''' Runtime for context tests. '''
+
+      __explicit__ = True
+      base_exception = Exception
+
+      def bind(self, interface, address):
+
+        ''' Bind nothing. '''
+
+        return None
+
+    instance, seen = ContextRuntime(None), []
+    instance.routes = 'main'
+
+    def other():
+
+      ''' Bind routes from another thread. '''
+
+      seen.append(instance.routes)
+      instance.routes = 'other'
+      seen.append(instance.routes)
+
+    thread = threading.Thread(target=other)
+    thread.start(), thread.join()
+
+    assert seen == [None, 'other']
+    assert instance.routes == 'main'
+
+  def test_defer_unsupported(self):
+
+    ''' Test that runtimes await nothing unless they say they can. '''
+
+    class SyncRuntime(runtime.Runtime):
+
+      ''' Runtime for defer tests. '''
+
+      __explicit__ = True
+      base_exception = Exception
+
+      def bind(self, interface, address):
+
+        ''' Bind nothing. '''
+
+        return None
+
+    instance = SyncRuntime(None)
+    assert instance.pending(object()) is False
+
+    with self.assertRaises(NotImplementedError):
+      instance.defer(None, lambda result: result)
+
+
+class UWSGIRuntimeTest(test.FrameworkTest):
+
+  ''' Tests :py:mod:`canteen.runtime.uwsgi` against a fake ``uwsgi``
+      module, since the real one only exists inside uWSGI. '''
+
+  def setUp(self):
+
+    ''' Install a fake ``uwsgi`` module, and load the runtime against it. '''
+
+    self.store, self.spooled = {}, []
+
+    fake = types.ModuleType('uwsgi')
+    fake.opt = {'cache2': 'name=default,items=128', 'spooler': '/tmp/spool'}
+    fake.SPOOL_OK, fake.SPOOL_RETRY, fake.SPOOL_IGNORE = -2, -1, 0
+    fake.cache_get = lambda key, *scope: self.store.get(key)
+    fake.cache_update = lambda key, value, expires=0, *scope: self.store.__setitem__(key, value)
+    fake.cache_del = lambda key, *scope: self.store.pop(key, None)
+    fake.cache_keys = lambda *scope: list(self.store)
+    fake.spool = self.spooled.append
+
+    from canteen.runtime import uwsgi
+    sys.modules['uwsgi'] = fake
+    self.module = reload(uwsgi)
+
+  def tearDown(self):
+
+    ''' Remove the fake module, and anything the runtime installed. '''
+
+    from canteen.core import meta
+    from canteen.core.api import cache
+
+    del sys.modules['uwsgi']
+    meta.Proxy.Registry.__chain__['Runtime'].remove(self.module.UWSGI)
+    meta.Proxy.Registry.__children__ = None
+    cache.CacheAPI.__engine__ = cache.CacheAPI.Threadcache
+    runtime.Runtime.__offload__ = None
+
+  def test_shared_cache(self):
+
+    ''' Test that the shared cache engine namespaces and pickles values. '''
+
+    engine = self.module.SharedCache(None, name='test')
+    engine.set('key', {'value': 1})
+
+    assert self.store.keys() == ['test:key']
+    assert engine.get('key') == {'value': 1}
+    assert engine.get('missing', 'default') == 'default'
+    assert list(engine.items()) == [('key', {'value': 1})]
+    assert engine.clear() == 1
+    assert engine.get('key') is None
+
+  def test_spool(self):
+
+    ''' Test that module-level functions are spooled, and run by the
+        spooler, while anything else runs inline. '''
+
+    assert self.module.spool(operator.add, 1, 2) is None
+    assert self.spooled[0]['canteen.task'] == 'operator:add'
+    assert self.module.spooler(self.spooled[0]) == -2
+    assert self.module.spooler({}) == 0
+
+    assert self.module.spool(lambda value: value * 2, 2) == 4
+    assert len(self.spooled) == 1
+
+  def test_spool_retries(self):
+
+    ''' Test that failing tasks are retried a bounded number of times, and
+        tasks that can't be loaded are dropped. '''
+
+    self.module.spool(operator.div, 1, 0)
+    task = dict(self.spooled[0], spooler_task_name='/tmp/spool/task')
+
+    assert [self.module.spooler(task, retries=3) for i in xrange(4)] == [-1, -1, -2, -1]
+    assert self.module.spooler(dict(task, **{'canteen.task': 'operator:missing'})) == -2
+    assert self.module.spooler(dict(task, body='garbage')) == -2
+
+  def test_template_cache_local(self):
+
+    ''' Test that compiled templates stay in-process, even when spawned
+        caches are shared between workers. '''
+
+    from canteen.core.api import cache, template
+
+    cache.CacheAPI.__engine__ = self.module.SharedCache
+    assert isinstance(cache.CacheAPI.spawn('shared'), self.module.SharedCache)
+
+    loader = template.ModuleLoader('_missing_compiled_templates')
+    assert isinstance(loader.cache, cache.CacheAPI.Threadcache)
+
+    unpicklable = lambda: None
+    loader.cache.set('page', unpicklable)
+    assert loader.cache.get('page') is unpicklable
+    assert not self.store
+
+
+class UWSGIUnavailableTest(test.FrameworkTest):
+
+  ''' Tests :py:mod:`canteen.runtime.uwsgi` outside of uWSGI. '''
+
+  def test_not_registered(self):
+
+    ''' Test that the uWSGI runtime isn't registered (or preferred) when
+        ``uwsgi`` can't be imported. '''
+
+    from canteen.core import meta
+    from canteen.runtime import uwsgi, werkzeug
+
+    original = sys.modules.get('uwsgi')
+    sys.modules['uwsgi'] = None  # importing it fails
+    try:
+      registered = len(meta.Proxy.Registry.__chain__['Runtime'])
+      reload(uwsgi)
+      meta.Proxy.Registry.__children__ = None
+
+      assert len(meta.Proxy.Registry.__chain__['Runtime']) == registered
+      assert runtime.Runtime.resolve() is werkzeug.Werkzeug
+    finally:
+      if original is None:
+        del sys.modules['uwsgi']
+      else:  # pragma: nocover
+        sys.modules['uwsgi'] = original
+
+
+class PreforkSupervisorTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.runtime.prefork.Supervisor`, with a trivial
+      worker standing in for a runtime. '''
+
+  class Worker(object):
+
+    ''' Reports starts and graceful stops over a pipe, and serves until
+        ``SIGTERM`` (unless told to ignore it). '''
+
+    def __init__(self, pipe, stubborn=False):
+
+      '''  '''
+
+      self.pipe, self.stubborn = pipe, stubborn
+
+    def work(self, server):
+
+      '''  '''
+
+      stopping = []
+      signal.signal(signal.SIGTERM, signal.SIG_IGN if self.stubborn else (lambda *args: stopping.append(True)))
+      os.write(self.pipe, 'start %s\n' % os.getpid())
+      while not stopping: time.sleep(0.01)
+      os.write(self.pipe, 'stop %s\n' % os.getpid())
+
+  class Server(object):
+
+    ''' Stands in for a bound server. '''
+
+    def close(self):
+
+      '''  '''
+
+      pass
+
+  def supervise(self, workers=2, **options):
+
+    ''' Run a supervisor in a child process.
+
+        :returns: ``(pid, lines)`` - the supervisor's process ID, and an
+        iterator of lines reported by its workers. '''
+
+    from canteen.runtime import prefork
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if not pid:  # pragma: nocover
+      os.close(read)
+      try:
+        prefork.Supervisor(self.Worker(write, **options), self.Server(), workers=workers, timeout=0.5, backoff=0).run()
+      finally:
+        os._exit(0)
+
+    os.close(write)
+    self.addCleanup(os.close, read)
+    return pid, iter(os.fdopen(os.dup(read)).readline, '')
+
+  def stop(self, pid):
+
+    ''' Stop the supervisor at ``pid``.
+
+        :returns: Seconds it took to exit. '''
+
+    started = time.time()
+    os.kill(pid, signal.SIGTERM)
+    os.waitpid(pid, 0)
+    return time.time() - started
+
+  def test_fork_restart_stop(self):
+
+    ''' Test that workers are forked, replaced when they die, and stopped
+        gracefully with the supervisor. '''
+
+    pid, lines = self.supervise()
+    workers = set(int(next(lines).split()[1]) for i in xrange(2))
+    assert len(workers) == 2 and pid not in workers
+
+    victim = workers.pop()
+    os.kill(victim, signal.SIGKILL)
+    event, replacement = next(lines).split()
+    assert event == 'start' and int(replacement) not in (victim, pid)
+
+    assert self.stop(pid) < 5
+    stopped = sorted([next(lines) for i in xrange(2)])
+    assert stopped == sorted(['stop %s\n' % worker for worker in (workers.pop(), int(replacement))])
+
+  def test_stop_timeout(self):
+
+    ''' Test that workers ignoring ``SIGTERM`` are killed after the timeout. '''
+
+    pid, lines = self.supervise(workers=1, stubborn=True)
+    next(lines)
+
+    elapsed = self.stop(pid)
+    assert 0.4 < elapsed < 5
+
+  def test_off_main_thread(self):
+
+    ''' Test that a supervisor can run (and be stopped) off the main
+        thread, where it can't install signal handlers. '''
+
+    from canteen.runtime import prefork
+
+    read, write = os.pipe()
+    self.addCleanup(os.close, read), self.addCleanup(os.close, write)
+    lines = iter(os.fdopen(os.dup(read)).readline, '')
+
+    supervisor = prefork.Supervisor(self.Worker(write), self.Server(), workers=1, timeout=0.5, backoff=0)
+    thread = threading.Thread(target=supervisor.run)
+    thread.start()
+
+    event, worker = next(lines).split()
+    supervisor.stop()
+    thread.join(5)
+
+    assert event == 'start' and not thread.is_alive()
+    assert next(lines) == 'stop %s\n' % worker
+
+
+class RuntimeWorkTest(test.FrameworkTest):
+
+  ''' Tests :py:meth:`canteen.core.runtime.Runtime.work`. '''
+
+  def test_off_main_thread(self):
+
+    ''' Test that a runtime can serve from (and be stopped on) a thread
+        other than the main one, where it can't install signal handlers. '''
+
+    from canteen.runtime import wsgiref
+
+    app = wsgiref.StandardWSGI(None)
+    server, errors = app.bind('127.0.0.1', 0), []
+
+    def serve():
+
+      '''  '''
+
+      try:
+        app.work(server)
+      except Exception as e:  # pragma: nocover
+        errors.append(e)
+
+    worker = threading.Thread(target=serve)
+    worker.start()
+    time.sleep(0.1)
+    server.shutdown()
+    worker.join(5)
+    server.server_close()
+
+    assert not worker.is_alive() and not errors
+
+
+class TornadoRuntimeTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.runtime.tornado.Tornado`, serving from a
+      thread other than the main one. '''
+
+  class Realtime(object):
+
+    ''' Stands in for realtime logic, recording events and echoing
+        messages back in uppercase. '''
+
+    def __init__(self):
+
+      '''  '''
+
+      self.events = []
+
+    def on_connect(self, client):
+
+      '''  '''
+
+      self.events.append('connect')
+
+    def on_message(self, client, message):
+
+      '''  '''
+
+      self.events.append(message)
+      client.write_message(message.upper())
+
+    def on_disconnect(self, client):
+
+      '''  '''
+
+      self.events.append('disconnect')
+
+  def setUp(self):
+
+    ''' Start a tornado runtime serving a trivial app. '''
+
+    from canteen.runtime import tornado
+
+    started, release = self.started, self.release = threading.Event(), threading.Event()
+
+    class App(tornado.Tornado):
+
+      ''' Answers with the request path, once released for ``/slow``. '''
+
+      options = {'workers': 4, 'drain': 5}
+
+      def __call__(self, environ, start_response):
+
+        '''  '''
+
+        if environ['PATH_INFO'] == '/slow': started.set(), release.wait(5)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [environ['PATH_INFO']]
+
+    self.app = App(None)
+    self.app.bridge = type('Bridge', (object,), {'realtime': self.Realtime()})()
+
+    listener = self.app.bind('127.0.0.1', 0)
+    self.port = listener.getsockname()[1]
+    self.worker = threading.Thread(target=self.app.work, args=(listener,))
+    self.worker.daemon = True
+    self.worker.start()
+
+    while self.app.server is None: time.sleep(0.01)
+
+  def tearDown(self):
+
+    ''' Stop the runtime, if it's still serving. '''
+
+    self.release.set()
+    if self.worker.is_alive():
+      self.app.drain()
+      self.worker.join(5)
+    self.app.loop.close()
+
+  def get(self, path, results=None):
+
+    ''' Request `path`, optionally adding the response to `results`.
+
+        :returns: ``(status, content-length, body)``. '''
+
+    import httplib
+
+    connection = httplib.HTTPConnection('127.0.0.1', self.port, timeout=5)
+    try:
+      connection.request('GET', path)
+      response = connection.getresponse()
+      result = (response.status, response.getheader('content-length'), response.read())
+    finally:
+      connection.close()
+    if results is not None: results.append(result)
+    return result
+
+  def background(self, path):
+
+    ''' Request `path` (which should be ``/slow``) from another thread,
+        waiting until it's in flight.
+
+        :returns: ``(thread, results)``. '''
+
+    results = []
+    client = threading.Thread(target=self.get, args=(path, results))
+    client.start()
+    self.started.wait(5)
+    return client, results
+
+  def test_wsgi_bridge(self):
+
+    ''' Test that plain requests run on the thread pool, without
+        blocking each other or the IOLoop. '''
+
+    assert self.get('/hello') == (200, '6', '/hello')
+
+    client, results = self.background('/slow')
+    assert self.get('/fast') == (200, '5', '/fast')
+    assert not results
+
+    self.release.set()
+    client.join(5)
+    assert results == [(200, '5', '/slow')]
+
+    # requests are forgotten just after their response is written
+    deadline = time.time() + 5
+    while self.app.container.pending and time.time() < deadline: time.sleep(0.01)
+    assert not self.app.container.pending
+
+  def test_realtime(self):
+
+    ''' Test that realtime connections are handed to realtime logic. '''
+
+    from tornado import gen, ioloop, websocket
+
+    @gen.coroutine
+    def chat():
+
+      '''  '''
+
+      connection = yield websocket.websocket_connect('ws://127.0.0.1:%s/_realtime' % self.port)
+      connection.write_message(u'hello')
+      reply = yield connection.read_message()
+      connection.close()
+      raise gen.Return(reply)
+
+    loop = ioloop.IOLoop()
+    try:
+      assert loop.run_sync(chat, timeout=5) == u'HELLO'
+    finally:
+      loop.close()
+
+    realtime, deadline = self.app.bridge.realtime, time.time() + 5
+    while len(realtime.events) < 3 and time.time() < deadline: time.sleep(0.01)
+    assert realtime.events == ['connect', u'hello', 'disconnect']
+
+  def test_drain(self):
+
+    ''' Test that draining stops accepting, but lets requests
+        in flight finish. '''
+
+    import socket
+
+    client, results = self.background('/slow')
+    self.app.drain()
+
+    time.sleep(0.2)
+    with self.assertRaises(socket.error):
+      socket.create_connection(('127.0.0.1', self.port), timeout=1)
+    assert self.worker.is_alive()
+
+    self.release.set()
+    client.join(5)
+    self.worker.join(5)
+    assert results == [(200, '5', '/slow')]
+    assert not self.worker.is_alive()
+
+  def test_drain_timeout(self):
+
+    ''' Test that draining gives up on requests still running
+        after its timeout. '''
+
+    import socket
+
+    client = socket.create_connection(('127.0.0.1', self.port), timeout=5)
+    self.addCleanup(client.close)
+    client.sendall('GET /slow HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    self.started.wait(5)
+
+    started = time.time()
+    self.app.drain(timeout=0.2)
+    self.worker.join(5)
+
+    assert not self.worker.is_alive()
+    assert time.time() - started < 2
+    assert self.app.container.pending
+
+
+class GeventRuntimeTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.runtime.gevent.Gevent`, serving from a
+      forked worker (so its signal handlers stay out of the way). '''
+
+  def serve(self, **options):
+
+    ''' Bind a gevent runtime, then serve from a child process. Requests
+        for ``/<seconds>`` sleep that long, then answer with the most
+        requests seen at once.
+
+        :returns: ``(pid, port)``. '''
+
+    from canteen.runtime import gevent
+
+    class App(gevent.Gevent):
+
+      ''' Sleeps, then reports the most concurrent requests so far. '''
+
+      active = [0, 0]  # requests in flight, most seen at once
+
+      @property
+      def options(self):
+
+        '''  '''
+
+        return dict(options, monkey=False, access_log=False)
+
+      def __call__(self, environ, start_response):
+
+        '''  '''
+
+        active = self.active
+        active[0] += 1
+        active[1] = max(active)
+        try:
+          gevent.gevent.sleep(float(environ['PATH_INFO'].strip('/')))
+        finally:
+          active[0] -= 1
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [str(active[1])]
+
+    app = App(None)
+    server = app.bind('127.0.0.1', 0)
+    port = server.socket.getsockname()[1]
+
+    pid = os.fork()
+    if not pid:  # pragma: nocover
+      try:
+        app.work(server)
+      finally:
+        os._exit(0)
+
+    server.socket.close()
+    self.addCleanup(self.stop, pid)
+    return pid, port
+
+  def stop(self, pid):
+
+    ''' Stop the worker at ``pid``, if it's still running.
+
+        :returns: Seconds it took to exit. '''
+
+    started = time.time()
+    try:
+      os.kill(pid, signal.SIGTERM)
+      os.waitpid(pid, 0)
+    except OSError:
+      pass
+    return time.time() - started
+
+  def get(self, port, path, results):
+
+    ''' Request `path` from the worker on `port`, adding the
+        response (or error) to `results`. '''
+
+    import httplib
+
+    connection = httplib.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+      connection.request('GET', path)
+      response = connection.getresponse()
+      results.append((response.status, response.read()))
+    except Exception as e:
+      results.append(e)
+    finally:
+      connection.close()
+
+  def background(self, port, *paths):
+
+    ''' Request each of `paths` at once, from their own threads.
+
+        :returns: ``(threads, results)``, with results in the order
+        they arrive. '''
+
+    results = []
+    threads = [threading.Thread(target=self.get, args=(port, path, results)) for path in paths]
+    for thread in threads: thread.start()
+    return threads, results
+
+  def test_context_isolated(self):
+
+    ''' Test that overlapping requests on different greenlets each
+        see their own request context. '''
+
+    from canteen.util import struct
+    from canteen.runtime import gevent
+
+    class App(gevent.Gevent):
+
+      '''  '''
+
+      options = {'monkey': False, 'access_log': False}
+
+    app = App(None)
+    server = app.bind('127.0.0.1', 0)
+    self.addCleanup(server.socket.close)
+
+    context = app.__context__
+    request = struct.LocalProxy(context, 'request')
+
+    def serve(routes, value):
+
+      ''' Bind request state, yield to the other request, then read it back. '''
+
+      app.routes, context.request = routes, value
+      gevent.gevent.sleep(0.01)
+      return app.routes, request.upper()
+
+    first, second = gevent.gevent.spawn(serve, 'a', 'a'), gevent.gevent.spawn(serve, 'b', 'b')
+    gevent.gevent.joinall([first, second])
+    assert (first.value, second.value) == (('a', 'A'), ('b', 'B'))
+
+  def test_pool_limit(self):
+
+    ''' Test that the pool bounds how many requests are served at once. '''
+
+    for size, most in ((1, '1'), (3, '3')):
+      pid, port = self.serve(pool=size)
+
+      started = time.time()
+      threads, results = self.background(port, '/0.3', '/0.3', '/0.3')
+      for thread in threads: thread.join(5)
+      elapsed = time.time() - started
+
+      assert len(results) == 3 and all((status == 200 for status, body in results))
+      assert max((body for status, body in results)) == most
+      assert elapsed >= 0.9 if size == 1 else elapsed < 0.9
+
+  def test_drain(self):
+
+    ''' Test that stopping lets requests in flight finish, then exits. '''
+
+    import socket
+
+    pid, port = self.serve(drain=5)
+    threads, results = self.background(port, '/0.5')
+    time.sleep(0.2)
+
+    assert self.stop(pid) < 2
+    threads[0].join(5)
+    assert results == [(200, '1')]
+
+    with self.assertRaises(socket.error):
+      socket.create_connection(('127.0.0.1', port), timeout=1)
+
+  def test_drain_timeout(self):
+
+    ''' Test that stopping gives up on requests still running
+        after the drain timeout. '''
+
+    pid, port = self.serve(drain=0.2)
+    threads, results = self.background(port, '/5')
+    time.sleep(0.2)
+
+    assert self.stop(pid) < 2
+    threads[0].join(5)
+
+    # killed mid-request: answered with an error, if at all
+    assert len(results) == 1
+    assert isinstance(results[0], Exception) or results[0][0] == 500
+
+
+class ThreadPoolTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.runtime.threaded.ThreadPool`. '''
+
+  class Server(object):
+
+    ''' Stands in for a ``SocketServer`` server, where each "request" is
+        a callable that serves itself. '''
+
+    def __init__(self):
+
+      '''  '''
+
+      self.errors, self.closed = [], []
+
+    def process_request(self, request, client_address):  # pragma: nocover
+
+      '''  '''
+
+      raise AssertionError('`ThreadPool` should replace `process_request`.')
+
+    def finish_request(self, request, client_address):
+
+      '''  '''
+
+      request()
+
+    def handle_error(self, request, client_address):
+
+      '''  '''
+
+      self.errors.append(client_address)
+
+    def shutdown_request(self, request):
+
+      '''  '''
+
+      self.closed.append(request)
+
+  def pool(self, server, **options):
+
+    ''' Start a pool serving `server`, stopped after the test. '''
+
+    from canteen.runtime import threaded
+
+    pool = threaded.ThreadPool(server, **options).start()
+    self.addCleanup(pool.stop, 5)
+    return pool
+
+  def test_process_request(self):
+
+    ''' Test that starting a pool routes the server's requests to it. '''
+
+    server = self.Server()
+    pool = self.pool(server, workers=2)
+
+    assert server.process_request == pool.submit
+    assert len(pool.threads) == 2 and all((thread.daemon for thread in pool.threads))
+
+  def test_backpressure(self):
+
+    ''' Test that submitting blocks once every worker is busy and the
+        queue is full. '''
+
+    server, started, release = self.Server(), threading.Event(), threading.Event()
+    self.pool(server, workers=1, backlog=1)
+
+    blocking = lambda: (started.set(), release.wait(5))
+    server.process_request(blocking, 'first')
+    started.wait(5)
+    server.process_request(lambda: None, 'second')  # queued
+
+    third = threading.Thread(target=server.process_request, args=(lambda: None, 'third'))
+    third.start()
+    third.join(0.2)
+    assert third.is_alive()
+
+    release.set()
+    third.join(5)
+    assert not third.is_alive()
+
+  def test_worker_exception(self):
+
+    ''' Test that a failing request is reported and closed, and its worker
+        carries on serving. '''
+
+    def fail():
+
+      '''  '''
+
+      raise ValueError('failed')
+
+    served, server = [], self.Server()
+    pool = self.pool(server, workers=1)
+
+    server.process_request(fail, 'bad')
+    server.process_request(lambda: served.append(True), 'good')
+    pool.stop(5)
+
+    assert server.errors == ['bad']
+    assert served == [True]
+    assert len(server.closed) == 2
+
+  def test_stop(self):
+
+    ''' Test that stopping serves queued requests, then ends every worker. '''
+
+    served, server = [], self.Server()
+    pool = self.pool(server, workers=2, backlog=8)
+    threads = list(pool.threads)
+
+    for i in xrange(6):
+      server.process_request(lambda i=i: (time.sleep(0.01), served.append(i)), i)
+    pool.stop(5)
+
+    assert sorted(served) == range(6)
+    assert not pool.threads and not any((thread.is_alive() for thread in threads))
+
+  def test_concurrent_isolated(self):
+
+    ''' Test that a real server serves requests concurrently through the
+        pool, each with its own request context. '''
+
+    import urllib2
+    from wsgiref import simple_server
+    from canteen.runtime import wsgiref
+
+    class Quiet(simple_server.WSGIRequestHandler):
+
+      '''  '''
+
+      def log_message(self, *args):
+
+        '''  '''
+
+        pass
+
+    app, arrived, both = wsgiref.StandardWSGI(None), [], threading.Event()
+
+    def application(environ, start_response):
+
+      ''' Bind routes, wait until both requests are in flight, then
+          answer with the routes this request sees. '''
+
+      app.routes = environ['PATH_INFO']
+      arrived.append(True)
+      if len(arrived) == 2: both.set()
+      both.wait(5)
+      start_response('200 OK', [('Content-Type', 'text/plain')])
+      return [app.routes]
+
+    server = simple_server.make_server('127.0.0.1', 0, application, handler_class=Quiet)
+    self.pool(server, workers=2)
+    worker = threading.Thread(target=server.serve_forever)
+    worker.start()
+
+    def shutdown():
+
+      '''  '''
+
+      server.shutdown(), worker.join(5), server.server_close()
+
+    self.addCleanup(shutdown)
+
+    opener, results = urllib2.build_opener(urllib2.ProxyHandler({})), {}
+    get = lambda path: results.__setitem__(path, opener.open(
+      'http://127.0.0.1:%s%s' % (server.server_port, path), timeout=5).read())
+
+    clients = [threading.Thread(target=get, args=(path,)) for path in ('/a', '/b')]
+    for client in clients: client.start()
+    for client in clients: client.join(5)
+
+    assert both.is_set()
+    assert results == {'/a': '/a', '/b': '/b'}
+
+
+class AsyncIORuntimeTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.runtime.asyncio.AsyncIO` and its HTTP/1.1
+      server, serving from a thread other than the main one. '''
+
+  def setUp(self):
+
+    ''' Start an asyncio runtime serving a trivial app. '''
+
+    from canteen.runtime import asyncio
+
+    trollius, From, Return = asyncio.asyncio, asyncio.From, asyncio.Return
+    started, release = self.started, self.release = threading.Event(), threading.Event()
+
+    class App(asyncio.AsyncIO):
+
+      ''' Echoes the request, once released for ``/slow``. ``/async``
+          answers from an awaited coroutine. '''
+
+      options = {'workers': 4, 'keepalive': 5, 'max_body': 64}
+
+      def __call__(self, environ, start_response):
+
+        '''  '''
+
+        if environ['PATH_INFO'] == '/async':
+
+          @trollius.coroutine
+          def later():
+
+            '''  '''
+
+            yield From(trollius.sleep(0.01))
+            raise Return('later')
+
+          return self.defer(later(), lambda value: start_response('200 OK', []) and [value])
+
+        if environ['PATH_INFO'] == '/slow': started.set(), release.wait(5)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [' '.join((environ['REQUEST_METHOD'], environ['PATH_INFO'], environ['QUERY_STRING'],
+                          environ['wsgi.input'].read()))]
+
+    self.app = App(None)
+    listener = self.app.bind('127.0.0.1', 0)
+    self.port = listener.getsockname()[1]
+    self.worker = threading.Thread(target=self.app.work, args=(listener,))
+    self.worker.daemon = True
+    self.worker.start()
+
+    while self.app.loop is None or not self.app.loop.is_running(): time.sleep(0.01)
+
+  def tearDown(self):
+
+    ''' Stop the runtime, if it's still serving. '''
+
+    self.release.set()
+    if self.worker.is_alive():
+      self.app.drain()
+      self.worker.join(5)
+
+  def connect(self):
+
+    ''' Open a connection to the runtime, closed after the test. '''
+
+    import socket
+
+    connection = socket.create_connection(('127.0.0.1', self.port), timeout=5)
+    self.addCleanup(connection.close)
+    return connection
+
+  def exchange(self, connection, request, method='GET'):
+
+    ''' Send a raw `request` on `connection`, then read one response.
+
+        :returns: ``(status, headers, body)``. '''
+
+    import httplib
+
+    connection.sendall(request)
+    response = httplib.HTTPResponse(connection, method=method)
+    response.begin()
+    return response.status, dict(response.getheaders()), response.read()
+
+  def test_request_response(self):
+
+    ''' Test that requests are parsed into a WSGI environ, and responses
+        written with a length. '''
+
+    status, headers, body = self.exchange(self.connect(), (
+      'GET /hello%20world?x=1 HTTP/1.1\r\nHost: localhost\r\n\r\n'))
+
+    assert status == 200
+    assert body == 'GET /hello world x=1 '
+    assert headers['content-length'] == str(len(body))
+    assert headers['connection'] == 'keep-alive'
+
+    status, headers, body = self.exchange(self.connect(), (
+      'POST /echo HTTP/1.1\r\nHost: localhost\r\nContent-Length: 5\r\n\r\nhello'))
+    assert (status, body) == (200, 'POST /echo  hello')
+
+    status, headers, body = self.exchange(self.connect(), 'HEAD / HTTP/1.1\r\nHost: localhost\r\n\r\n', 'HEAD')
+    assert status == 200 and headers['content-length'] == str(len('HEAD /  ')) and body == ''
+
+  def test_bad_request(self):
+
+    ''' Test that malformed or oversized requests are refused. '''
+
+    status, headers, body = self.exchange(self.connect(), 'NONSENSE\r\n\r\n')
+    assert status == 400 and headers['connection'] == 'close'
+
+    status, headers, body = self.exchange(self.connect(), (
+      'POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: 65\r\n\r\n' + 'x' * 65))
+    assert status == 400
+
+  def test_keepalive(self):
+
+    ''' Test that HTTP/1.1 connections serve several requests, unless
+        asked to close, and HTTP/1.0 connections close. '''
+
+    connection = self.connect()
+    for path in ('/one', '/two'):
+      status, headers, body = self.exchange(connection, 'GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n' % path)
+      assert (status, body) == (200, 'GET %s  ' % path)
+
+    status, headers, body = self.exchange(connection, (
+      'GET /three HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'))
+    assert headers['connection'] == 'close'
+    assert connection.recv(1) == ''
+
+    connection = self.connect()
+    status, headers, body = self.exchange(connection, 'GET /old HTTP/1.0\r\n\r\n')
+    assert (status, headers['connection']) == (200, 'close')
+    assert connection.recv(1) == ''
+
+  def test_chunked_body(self):
+
+    ''' Test that chunked request bodies are reassembled, and held to
+        the body size limit. '''
+
+    chunked = 'POST /chunks HTTP/1.1\r\nHost: localhost\r\nTransfer-Encoding: chunked\r\n\r\n%s0\r\n\r\n'
+
+    connection = self.connect()
+    status, headers, body = self.exchange(connection, chunked % '4\r\nWiki\r\n5;ext=1\r\npedia\r\n')
+    assert (status, body) == (200, 'POST /chunks  Wikipedia')
+
+    # the connection is still usable afterwards
+    status, headers, body = self.exchange(connection, 'GET /after HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    assert (status, body) == (200, 'GET /after  ')
+
+    status, headers, body = self.exchange(self.connect(), chunked % ('20\r\n%s\r\n' % ('x' * 32) * 3))
+    assert status == 400
+
+  def test_deferred(self):
+
+    ''' Test that awaitable handler results are awaited on the loop. '''
+
+    status, headers, body = self.exchange(self.connect(), 'GET /async HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    assert (status, body) == (200, 'later')
+
+  def test_drain(self):
+
+    ''' Test that draining lets requests in flight finish, closes idle
+        connections, and stops serving. '''
+
+    idle, results = self.connect(), []
+    self.exchange(idle, 'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+
+    client = threading.Thread(target=lambda: results.append(self.exchange(self.connect(), (
+      'GET /slow HTTP/1.1\r\nHost: localhost\r\n\r\n'))))
+    client.start()
+    self.started.wait(5)
+
+    self.app.drain()
+    time.sleep(0.2)
+    assert self.worker.is_alive()
+    assert idle.recv(1) == ''
+
+    self.release.set()
+    client.join(5)
+    self.worker.join(5)
+    assert not self.worker.is_alive()
+    assert [(status, headers['connection'], body) for status, headers, body in results] == [(200, 'close', 'GET /slow  ')]
+
+  def test_drain_timeout(self):
+
+    ''' Test that draining gives up on requests still running
+        after its timeout. '''
+
+    connection = self.connect()
+    connection.sendall('GET /slow HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    self.started.wait(5)
+
+    started = time.time()
+    self.app.drain(timeout=0.2)
+    self.worker.join(5)
+
+    assert not self.worker.is_alive()
+    assert time.time() - started < 2
@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen core template tests
+  ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+  tests canteen's template API, its compiler and bytecode caches.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import tempfile
+import threading
+import itertools
+
+# testing
+from canteen import test
+
+# template API & tools
+from canteen import tools
+from canteen.util import config
+from canteen.core.api import template
+
+# jinja2
+from jinja2 import bccache, Environment, FileSystemLoader
+
+
+def bucket(key, code='value = 1'):
+
+  ''' Build a jinja2 bytecode bucket holding ``code``, compiled. '''
+
+  bucket = bccache.Bucket(Environment(), key, 'checksum')
+  if code: bucket.code = compile(code, '<%s>' % key, 'exec')
+  return bucket
+
+
+def loaded(cache, key):
+
+  ''' Load ``key`` from a bytecode ``cache``.
+
+      :returns: Bytecode, or ``None`` if the cache has none. '''
+
+  target = bucket(key, None)
+  cache.load_bytecode(target)
+  return target.code
+
+
+class TemplateAPITest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.core.api.template.TemplateAPI` environments
+      and rendering. '''
+
+  source = '<ul>{% for item in items %}<li>{{ item }}</li>{% endfor %}</ul>'
+
+  def setUp(self):
+
+    ''' Write a template to render, and drop cached environments. '''
+
+    self.root, self.saved = tempfile.mkdtemp(), config._appconfig
+    with open(os.path.join(self.root, 'list.html'), 'w') as handle:
+      handle.write(self.source)
+
+    self.api = template.TemplateAPI()
+    self.api.invalidate()
+
+  def tearDown(self):
+
+    ''' Clean up the template and cached environments. '''
+
+    self.api.invalidate()
+    config._appconfig = self.saved
+    shutil.rmtree(self.root)
+
+  def config(self, **options):
+
+    ''' Build app config rendering from our template path, with
+        ``TemplateAPI`` `options`. '''
+
+    return config.Config(app={'paths': {'templates': self.root}}, config={'TemplateAPI': dict(options, debug=True)})
+
+  def render(self, settings, **context):
+
+    ''' Render our template with `settings`. '''
+
+    return self.api.render(None, settings, 'list.html', context)
+
+  def test_environment_cached(self):
+
+    ''' Test that repeat renders share one environment, and so jinja's
+        compiled template cache. '''
+
+    settings = self.config()
+    environment = self.api.environment(None, settings)
+
+    assert ''.join(self.render(settings, items=[1, 2])) == '<ul><li>1</li><li>2</li></ul>'
+    assert ''.join(self.render(self.config(), items=[3])) == '<ul><li>3</li></ul>'
+    assert self.api.environment(None, self.config()) is environment
+    assert environment.get_template('list.html') is environment.get_template('list.html')
+
+    # different settings get their own environment
+    assert self.api.environment(None, self.config(jinja2={'autoescape': False})) is not environment
+
+  def test_invalidate(self):
+
+    ''' Test that invalidating drops cached environments. '''
+
+    environment = self.api.environment(None, self.config())
+    self.api.environment(None, self.config(jinja2={'autoescape': False}))
+
+    assert self.api.invalidate() == 2
+    assert self.api.invalidate() == 0
+    assert self.api.environment(None, self.config()) is not environment
+
+  def test_environment_key(self):
+
+    ''' Test that a config object's environment key is derived once, and
+        dropped when environments are invalidated. '''
+
+    settings = self.config()
+    environment = self.api.environment(None, settings)
+    assert template._environment_keys[settings] in template._environments
+
+    settings.config['TemplateAPI']['jinja2'] = {'autoescape': False}
+    assert self.api.environment(None, settings) is environment
+
+    self.api.invalidate()
+    assert settings not in template._environment_keys
+    assert self.api.environment(None, settings).autoescape is False
+
+  def test_stream(self):
+
+    ''' Test that streaming renders in chunks, matching buffered output. '''
+
+    items = range(10)
+    buffered = ''.join(self.render(self.config(), items=items))
+
+    chunks = list(self.render(self.config(stream={'enable': True, 'buffer': 2}), items=items))
+    assert len(chunks) > 1
+    assert ''.join(chunks) == buffered
+
+    unbuffered = list(self.render(self.config(stream={'enable': True, 'buffer': 1}), items=items))
+    assert len(unbuffered) > len(chunks)
+    assert ''.join(unbuffered) == buffered
+
+
+class TemplateCompilerTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.core.api.template.TemplateCompiler`, and the
+      ``canteen templates`` tool that drives it. '''
+
+  builds = itertools.count()
+
+  def setUp(self):
+
+    ''' Write a few templates to compile, into a fresh package. '''
+
+    self.root = tempfile.mkdtemp()
+    self.source = os.path.join(self.root, 'source')
+    self.package = '_tpl_compiled_%s' % next(self.builds)
+    self.target = os.path.join(self.root, self.package)
+
+    self.write('page.html', 'Hello, {{ name }}!')
+    self.write('layout.html', '<p>{% block body %}{% endblock %}</p>')
+    self.write('sub/child.html', '{% extends "layout.html" %}{% block body %}{{ name|upper }}{% endblock %}')
+    self.environment = Environment(loader=FileSystemLoader(self.source))
+
+  def tearDown(self):
+
+    ''' Clean up templates and compiled modules. '''
+
+    if self.root in sys.path: sys.path.remove(self.root)
+    for name in list(sys.modules):
+      if name.startswith(self.package): del sys.modules[name]
+    shutil.rmtree(self.root)
+
+  def write(self, name, source, mtime=None):
+
+    ''' Write a template `source` under `name`, optionally backdated to `mtime`. '''
+
+    path = os.path.join(self.source, name)
+    if not os.path.isdir(os.path.dirname(path)): os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as handle:
+      handle.write(source)
+    if mtime is not None: os.utime(path, (mtime, mtime))
+    return path
+
+  def compile(self, **kwargs):
+
+    ''' Compile templates to the target package. '''
+
+    result = template.TemplateCompiler(self.environment, self.target).compile(**kwargs)
+    return dict((key, sorted(value)) for key, value in result.iteritems())
+
+  def test_compile_load(self):
+
+    ''' Test that compiled templates load and render like their source. '''
+
+    assert self.compile()['compiled'] == ['layout.html', 'page.html', 'sub/child.html']
+
+    sys.path.insert(0, self.root)
+    loader = template.ModuleLoader(self.package)
+    for name in ('page.html', 'sub/child.html'):
+      compiled = loader.load(self.environment, name)
+      assert compiled.render(name='canteen') == self.environment.get_template(name).render(name='canteen')
+
+  def test_skip_unchanged(self):
+
+    ''' Test that untouched templates, or touched but identical ones,
+        aren't recompiled. '''
+
+    self.compile()
+    result = self.compile()
+    assert result['compiled'] == [] and result['skipped'] == ['layout.html', 'page.html', 'sub/child.html']
+
+    # touched: skipped by hash, and the new mtime is recorded
+    path = self.write('page.html', 'Hello, {{ name }}!', mtime=time.time() + 10)
+    assert self.compile()['skipped'] == ['layout.html', 'page.html', 'sub/child.html']
+    with open(os.path.join(self.target, template.TemplateCompiler.manifest_name), 'r') as handle:
+      assert json.load(handle)['templates']['page.html']['mtime'] == os.path.getmtime(path)
+
+    # changed: recompiled
+    self.write('page.html', 'Goodbye, {{ name }}!', mtime=time.time() + 20)
+    assert self.compile()['compiled'] == ['page.html']
+
+  def test_rebuild(self):
+
+    ''' Test that a changed environment, or forcing, rebuilds everything. '''
+
+    self.compile()
+    assert self.compile(force=True)['compiled'] == ['layout.html', 'page.html', 'sub/child.html']
+
+    self.environment.autoescape = True
+    assert self.compile()['compiled'] == ['layout.html', 'page.html', 'sub/child.html']
+    assert self.compile()['compiled'] == []
+
+  def test_remove_deleted(self):
+
+    ''' Test that modules for deleted templates are removed, even
+        across a rebuild. '''
+
+    self.compile()
+    os.remove(os.path.join(self.source, 'page.html'))
+    assert self.compile()['removed'] == ['page.html']
+    assert not os.path.exists(os.path.join(self.target, 'page.py'))
+    assert not os.path.exists(os.path.join(self.target, 'page.pyc'))
+
+    os.remove(os.path.join(self.source, 'sub', 'child.html'))
+    assert self.compile(force=True)['removed'] == ['sub/child.html']
+    assert not os.path.exists(os.path.join(self.target, 'sub', 'child.py'))
+    assert os.path.exists(os.path.join(self.target, 'layout.py'))
+
+  def test_module_conflict(self):
+
+    ''' Test that templates mapping to the same module fail, rather
+        than overwrite each other. '''
+
+    self.write('page-two.html', 'one')
+    self.write('page_two.html', 'two')
+
+    result = self.compile()
+    assert result['compiled'] == ['layout.html', 'page-two.html', 'page.html', 'sub/child.html']
+    assert [name for name, error in result['failed']] == ['page_two.html']
+    assert 'page_two.py' in str(result['failed'][0][1])
+
+  def test_tool(self):
+
+    ''' Test that ``canteen templates`` compiles, then skips, templates. '''
+
+    arguments = ['templates', '--source', self.source, '--target', self.target, '--quiet']
+    assert tools.main(arguments) == 0
+    assert os.path.exists(os.path.join(self.target, 'sub', 'child.py'))
+
+    self.write('broken.html', '{% if %}')
+    assert tools.main(arguments) == 1
+
+
+class MappedBytecodeCacheTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.core.api.template.MappedBytecodeCache`. '''
+
+  def setUp(self):
+
+    ''' Pick a temporary file to map. '''
+
+    self.path = tempfile.mktemp(suffix='.mmap')
+
+  def tearDown(self):
+
+    ''' Remove the mapped file. '''
+
+    if os.path.exists(self.path): os.remove(self.path)
+
+  def test_round_trip(self):
+
+    ''' Test that dumped bytecode loads back, in this process or another. '''
+
+    cache = template.MappedBytecodeCache(path=self.path, size=64 * 1024)
+    cache.dump_bytecode(bucket('one'))
+
+    assert loaded(cache, 'one') is not None
+    assert loaded(cache, 'two') is None
+    assert loaded(template.MappedBytecodeCache(path=self.path, size=64 * 1024), 'one') is not None
+
+    cache.clear()
+    assert loaded(cache, 'one') is None
+
+  def test_wraparound(self):
+
+    ''' Test that a full log starts over in a new generation, which other
+        instances notice. '''
+
+    size = len(bucket('key-0').bytecode_to_string()) * 3 + 256
+    cache, other = (template.MappedBytecodeCache(path=self.path, size=size) for i in xrange(2))
+
+    cache.dump_bytecode(bucket('key-0'))
+    assert loaded(other, 'key-0') is not None
+
+    for i in xrange(1, 6):
+      cache.dump_bytecode(bucket('key-%s' % i))
+
+    assert cache.generation > 0
+    assert loaded(cache, 'key-5') is not None
+    assert loaded(other, 'key-0') is None
+    assert loaded(other, 'key-5') is not None
+
+  def test_threads(self):
+
+    ''' Test that concurrent dumps from one instance don't clobber each other. '''
+
+    class Slow(template.MappedBytecodeCache):
+
+      ''' Widens the window between reading and writing the log. '''
+
+      def refresh(self):
+
+        '''  '''
+
+        used = super(Slow, self).refresh()
+        time.sleep(0.001)
+        return used
+
+    cache = Slow(path=self.path, size=1024 * 1024)
+    threads = [threading.Thread(target=lambda i=i: [
+      cache.dump_bytecode(bucket('key-%s-%s' % (i, j))) for j in xrange(20)]) for i in xrange(8)]
+
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+
+    fresh = template.MappedBytecodeCache(path=self.path, size=1024 * 1024)
+    assert all(loaded(fresh, 'key-%s-%s' % (i, j)) is not None for i in xrange(8) for j in xrange(20))
+
+  def test_inherited_between_processes(self):
+
+    ''' Test that a cache built before a fork locks workers out of each
+        other, and shares bytecode between them. '''
+
+    cache = template.MappedBytecodeCache(path=self.path, size=64 * 1024)
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if not pid:  # pragma: nocover
+      cache.dump_bytecode(bucket('child'))
+      with cache.locked(fcntl.LOCK_EX):
+        os.write(write, 'locked')
+        time.sleep(0.5)
+      os._exit(0)
+
+    try:
+      os.read(read, 6)
+      try:
+        with cache.locked(fcntl.LOCK_EX | fcntl.LOCK_NB):
+          raise AssertionError('Lock held by a forked worker was not exclusive.')
+      except IOError:
+        pass
+    finally:
+      os.waitpid(pid, 0)
+      os.close(read), os.close(write)
+
+    assert loaded(cache, 'child') is not None
+
+
+class DirectoryBytecodeCacheTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.core.api.template.DirectoryBytecodeCache`. '''
+
+  def setUp(self):
+
+    ''' Make a temporary cache directory. '''
+
+    self.directory = tempfile.mkdtemp()
+    self.cache = template.DirectoryBytecodeCache(directory=os.path.join(self.directory, 'bytecode'))
+
+  def tearDown(self):
+
+    ''' Remove the cache directory. '''
+
+    shutil.rmtree(self.directory)
+
+  def test_round_trip(self):
+
+    ''' Test that dumped bytecode loads back, leaving no temporary files. '''
+
+    self.cache.dump_bytecode(bucket('one'))
+
+    assert loaded(self.cache, 'one') is not None
+    assert os.listdir(self.cache.directory) == ['__canteen_one.cache']
+
+  def test_failed_write(self):
+
+    ''' Test that a failed write leaves neither a partial entry nor a
+        temporary file behind. '''
+
+    broken = bucket('one')
+
+    def write_bytecode(handle):
+      handle.write('partial')
+      raise IOError('disk full')
+
+    broken.write_bytecode = write_bytecode
+    self.cache.dump_bytecode(broken)
+
+    assert os.listdir(self.cache.directory) == []
+    assert loaded(self.cache, 'one') is None
+
+
+class CacheBytecodeCacheTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.core.api.template.CacheBytecodeCache`. '''
+
+  def test_round_trip(self):
+
+    ''' Test that dumped bytecode loads back from the cache engine. '''
+
+    cache = template.CacheBytecodeCache(name='test-bytecode', engine=template.CacheAPI.Boundedcache)
+    cache.dump_bytecode(bucket('one'))
+
+    assert loaded(cache, 'one') is not None
+    assert loaded(cache, 'two') is None
+
+    cache.clear()
+    assert loaded(cache, 'one') is None
+
+  def test_in_process(self):
+
+    ''' Test that bytecode stays in-process unless an engine is given,
+        whatever engine app caches are configured with. '''
+
+    saved = config._appconfig
+    config._appconfig = {'config': {'CacheAPI': {'engine': 'bounded'}}}
+    try:
+      cache = template.CacheBytecodeCache(name='test-bytecode-local')
+    finally:
+      config._appconfig = saved
+    assert isinstance(cache.cache, template.CacheAPI.Threadcache)
+
+  def test_serialized_engine(self):
+
+    ''' Test that bytecode round-trips through an engine that serializes
+        its values. '''
+
+    path = os.path.join(tempfile.mkdtemp(), 'bytecode')
+    self.addCleanup(shutil.rmtree, os.path.dirname(path))
+
+    engine = template.CacheAPI.Mappedcache(name='test-bytecode-mapped', path=path, slot_size=4096)
+    cache = template.CacheBytecodeCache(engine=engine)
+    cache.dump_bytecode(bucket('one'))
+
+    namespace = {}
+    exec loaded(cache, 'one') in namespace
+    assert namespace['value'] == 1
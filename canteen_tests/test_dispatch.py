@@ -14,3 +14,31 @@
             the root of the project.
 
 '''
+
+# stdlib
+import os
+import sys
+import subprocess
+
+# testing
+from canteen import test
+
+
+class DispatchSpawnTest(test.FrameworkTest):
+
+  ''' Tests :py:func:`canteen.dispatch.spawn`. '''
+
+  def test_spawn_fresh(self):
+
+    ''' Test that spawning resolves a runtime from a fresh interpreter,
+        without anything importing :py:mod:`canteen.runtime` first. '''
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, '-c', '; '.join((
+      'import sys',
+      'from canteen import dispatch',
+      'assert "canteen.runtime" not in sys.modules',
+      'print type(dispatch.spawn(object(), True)).__name__'))],
+      cwd=root, env=dict(os.environ, PYTHONPATH=root), stderr=subprocess.STDOUT)
+
+    assert output.strip() == 'Werkzeug'
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen HTTP logic tests
+  ~~~~~~~~~~~~~~~~~~~~~~~~
+
+  tests for canteen's HTTP semantics and routing.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# testing
+from canteen import test
+
+# HTTP logic
+from canteen.logic.http import semantics
+
+
+class RouteTableTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.logic.http.semantics.RouteTable`. '''
+
+  def test_lookup(self):
+
+    ''' Test that a route table resolves names to routes and handlers. '''
+
+    table = semantics.RouteTable([
+      ('/', 'home', 'Home', {}),
+      ('/about', 'about', 'About', {'methods': ['GET']}),
+      ('/anonymous', None, 'Anonymous', {})])
+
+    assert len(table) == 3
+    assert table.rules[1] == ('/about', 'about', {'methods': ['GET']})
+    assert table.aliases == {'home': '/', 'about': '/about'}
+    assert table.handlers == {'home': 'Home', 'about': 'About'}
+
+  def test_later_registration_wins(self):
+
+    ''' Test that re-registering a route replaces it in place. '''
+
+    table = semantics.RouteTable([
+      ('/', 'home', 'Home', {}),
+      ('/about', 'about', 'About', {}),
+      ('/', 'landing', 'Landing', {})])
+
+    assert [route for route, name, kwargs in table.rules] == ['/', '/about']
+    assert table.handlers == {'landing': 'Landing', 'about': 'About'}
+
+  def test_immutable(self):
+
+    ''' Test that a route table can't be modified. '''
+
+    table = semantics.RouteTable([])
+    with self.assertRaises(AttributeError):
+      table.rules = ()
+
+
+class HTTPSemanticsRouteTest(test.FrameworkTest):
+
+  ''' Tests route registration on
+      :py:class:`canteen.logic.http.semantics.HTTPSemantics`. '''
+
+  def setUp(self):
+
+    ''' Swap out globally-registered routes. '''
+
+    http = semantics.HTTPSemantics
+    self.saved = (http.__routes__, http.__map__, http.__table__)
+    http.__routes__, http.__map__, http.__table__ = [], None, None
+
+  def tearDown(self):
+
+    ''' Restore globally-registered routes. '''
+
+    http = semantics.HTTPSemantics
+    http.__routes__, http.__map__, http.__table__ = self.saved
+
+  def match(self, path):
+
+    ''' Match `path` against the live route map. '''
+
+    return semantics.HTTPSemantics.route_map.bind('localhost').match(path)
+
+  def test_register_resolve(self):
+
+    ''' Test that registered routes resolve by name and by path. '''
+
+    http = semantics.HTTPSemantics
+    http.add_route(('/', 'home'), 'Home')
+    http.add_route(('/item/<int:key>', 'item'), 'Item')
+
+    assert http.resolve_route('home') == 'Home'
+    assert http.resolve_route('item') == 'Item'
+    assert http.resolve_route('missing') is None
+    assert self.match('/item/5') == ('item', {'key': 5})
+
+  def test_register_live(self):
+
+    ''' Test that routes added after the map is built are matched. '''
+
+    http = semantics.HTTPSemantics
+    http.add_route(('/', 'home'), 'Home')
+    assert self.match('/') == ('home', {})
+
+    live = http.route_map
+    http.add_route(('/about', 'about'), 'About')
+    assert http.route_map is live
+    assert self.match('/about') == ('about', {})
+
+  def test_reregister(self):
+
+    ''' Test that re-registering a path makes the map and
+        table agree on its new handler. '''
+
+    http = semantics.HTTPSemantics
+    http.add_route(('/', 'home'), 'Home')
+    http.add_route(('/about', 'about'), 'About')
+    assert self.match('/') == ('home', {})
+
+    http.add_route(('/', 'landing'), 'Landing')
+    assert self.match('/') == ('landing', {})
+    assert http.resolve_route(self.match('/')[0]) == 'Landing'
+    assert self.match('/about') == ('about', {})
+    assert len(list(http.route_map.iter_rules())) == len(http.table) == 2
+
+
+class RouteMapTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.logic.http.semantics.RouteMap` and
+      :py:class:`canteen.logic.http.semantics.RouteAdapter`. '''
+
+  rules = (
+    ('/', 'home', {}),
+    ('/about', 'about', {}),
+    ('/item/<int:key>', 'item', {}),
+    ('/item/<int:key>/edit', 'edit', {'methods': ['POST']}),
+    ('/docs/', 'docs', {}),
+    ('/docs/<path:page>', 'page', {}))
+
+  def build(self, cls, **kwargs):
+
+    ''' Build a map of type `cls` holding the test rules. '''
+
+    return cls([semantics.routing.Rule(route, endpoint=name, **options)
+                for route, name, options in self.rules], **kwargs)
+
+  def outcome(self, routes, path, method='GET'):
+
+    ''' Match `path` on `routes`, returning the result or
+        the type of exception raised. '''
+
+    try:
+      return routes.bind('localhost', path_info=path).match(method=method)
+    except semantics.exceptions.HTTPException as e:
+      return type(e), getattr(e, 'new_url', None), sorted(getattr(e, 'valid_methods', None) or ())
+
+  def test_adapter(self):
+
+    ''' Test that binding a route map yields a caching adapter. '''
+
+    routes = self.build(semantics.RouteMap)
+    assert isinstance(routes.bind('localhost'), semantics.RouteAdapter)
+    assert isinstance(routes.bind_to_environ({
+      'SERVER_NAME': 'localhost',
+      'SERVER_PORT': '80',
+      'REQUEST_METHOD': 'GET',
+      'wsgi.url_scheme': 'http'}), semantics.RouteAdapter)
+
+  def test_cache_hit(self):
+
+    ''' Test that repeat matches are served from the route cache. '''
+
+    class Counted(semantics.RouteMap):
+
+      ''' Route map that counts candidate lookups. '''
+
+      misses = 0
+
+      def candidates(self, path):
+
+        ''' Count, then find candidates. '''
+
+        self.misses += 1
+        return super(Counted, self).candidates(path)
+
+    routes = self.build(Counted)
+    for i in xrange(3):
+      assert self.outcome(routes, '/item/5') == ('item', {'key': 5})
+    assert routes.misses == 1
+    assert routes.lookup(('GET', 'localhost', '', '/item/5')) == ('item', {'key': 5})
+
+    # each method, host and path is cached separately
+    assert self.outcome(routes, '/item/6') == ('item', {'key': 6})
+    assert self.outcome(routes, '/item/5', method='HEAD') == ('item', {'key': 5})
+    assert routes.misses == 3
+
+  def test_cache_bounded(self):
+
+    ''' Test that the route cache evicts least-recent entries. '''
+
+    routes = self.build(semantics.RouteMap, cache_size=2)
+    for path in ('/item/1', '/item/2', '/item/1', '/item/3'):
+      self.outcome(routes, path)
+
+    assert [key[-1] for key in routes.__cache__] == ['/item/1', '/item/3']
+
+  def test_candidates(self):
+
+    ''' Test that candidates are narrowed to rules whose static
+        prefix lies along the path, in match order. '''
+
+    routes = self.build(semantics.RouteMap)
+    candidates = lambda path: set(rule.endpoint for rule in routes.candidates(path))
+
+    assert candidates('/') == {'home'}
+    assert candidates('/about') == {'home', 'about'}
+    assert candidates('/item/5/edit') == {'home', 'item', 'edit'}
+    assert candidates('/docs/a/b') == {'home', 'docs', 'page'}
+    assert candidates('/missing/path') == {'home'}
+
+    matched = routes.candidates('/item/5/edit')
+    assert matched == [rule for rule in routes._rules if rule in matched]
+
+  def test_invalidate_on_add(self):
+
+    ''' Test that adding a rule drops the route cache and trie. '''
+
+    routes = self.build(semantics.RouteMap)
+    assert isinstance(self.outcome(routes, '/contact'), tuple)
+    assert self.outcome(routes, '/about') == ('about', {})
+    assert routes.__cache__ and routes.__trie__ is not None
+
+    routes.add(semantics.routing.Rule('/contact', endpoint='contact'))
+    assert not routes.__cache__ and routes.__trie__ is None
+    assert self.outcome(routes, '/contact') == ('contact', {})
+    assert self.outcome(routes, '/about') == ('about', {})
+
+  def test_werkzeug_parity(self):
+
+    ''' Test that matches, 404s, 405s and trailing-slash redirects
+        agree with stock werkzeug. '''
+
+    routes, stock = self.build(semantics.RouteMap), self.build(semantics.routing.Map)
+    for path, method in (
+      ('/', 'GET'),
+      ('/about', 'GET'),
+      ('/about/', 'GET'),
+      ('/item/5', 'GET'),
+      ('/item/five', 'GET'),
+      ('/item/5/edit', 'POST'),
+      ('/item/5/edit', 'GET'),
+      ('/docs', 'GET'),
+      ('/docs/', 'GET'),
+      ('/docs/a/b', 'GET'),
+      ('/missing', 'GET')):
+
+      # twice, so the second is served from cache
+      for i in xrange(2):
+        assert self.outcome(routes, path, method) == self.outcome(stock, path, method), (path, method)
+
+    assert self.outcome(stock, '/missing')[0] is semantics.exceptions.NotFound
+    assert self.outcome(stock, '/item/5/edit')[0] is semantics.exceptions.MethodNotAllowed
+    assert self.outcome(stock, '/docs')[0] is semantics.routing.RequestRedirect
@@ -24,6 +24,9 @@ if 'TEST_REIMPORT' in os.environ:  # pragma: nocover
   from canteen_tests.test_util import test_debug
   from canteen_tests.test_util import test_config
   from canteen_tests.test_util import test_cli
+  from canteen_tests.test_util import test_timing
+  from canteen_tests.test_util import test_importtime
+  from canteen_tests.test_util import test_walk
 
 
 __all__ = (
@@ -31,5 +34,8 @@ __all__ = (
   'test_decorators',
   'test_debug',
   'test_config',
-  'test_cli'
+  'test_cli',
+  'test_timing',
+  'test_importtime',
+  'test_walk'
 )
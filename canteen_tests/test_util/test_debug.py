@@ -14,3 +14,94 @@
             the root of the project.
 
 '''
+
+# stdlib
+import os
+import shutil
+import pstats
+import tempfile
+import threading
+
+# testing
+from canteen import test
+
+# debug utils
+from canteen.util import debug
+
+
+class SamplingProfilerTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.util.debug.SamplingProfiler`. '''
+
+  def setUp(self):
+
+    ''' Make a temporary dump path. '''
+
+    self.path = tempfile.mkdtemp()
+
+  def tearDown(self):
+
+    ''' Clean up the temporary dump path. '''
+
+    shutil.rmtree(self.path, ignore_errors=True)
+
+  @staticmethod
+  def dispatch(environ, start_response):
+
+    ''' Sample dispatch method to profile. '''
+
+    return sum(xrange(100))
+
+  def test_sample_rate(self):
+
+    ''' Test that only 1-in-N requests are profiled. '''
+
+    profiler = debug.SamplingProfiler(self.path, sample=3, interval=None, flush_after=None)
+
+    for i in xrange(6):
+      assert profiler(self.dispatch, {'canteen.endpoint': 'home'}, None) == 4950
+
+    assert profiler.samples == 2
+    assert profiler.stats.keys() == ['home']
+
+  def test_flush_after_samples(self):
+
+    ''' Test that stats are flushed to disk per-endpoint after
+        the configured number of samples, and accumulated across
+        flushes. '''
+
+    profiler = debug.SamplingProfiler(self.path, sample=1, interval=None, flush_after=2)
+
+    profiler(self.dispatch, {'canteen.endpoint': 'home'}, None)
+    assert not os.listdir(self.path)
+
+    profiler(self.dispatch, {}, None)
+    assert sorted(os.listdir(self.path)) == ['home.profile', 'unmatched.profile']
+    assert profiler.samples == 0 and not profiler.stats
+
+    profiler(self.dispatch, {'canteen.endpoint': 'home'}, None)
+    assert profiler.flush() == [os.path.join(self.path, 'home.profile')]
+
+  def test_concurrent_flushes(self):
+
+    ''' Test that flushes racing each other (say, a manual flush and the
+        exit hook) accumulate every sample, leaving no partial dumps. '''
+
+    profiler = debug.SamplingProfiler(self.path, sample=1, interval=None, flush_after=None)
+
+    def worker():
+
+      ''' Profile a request, then flush, a few times over. '''
+
+      for i in xrange(10):
+        profiler(self.dispatch, {'canteen.endpoint': 'home'}, None)
+        profiler.flush()
+
+    threads = [threading.Thread(target=worker) for i in xrange(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+
+    assert os.listdir(self.path) == ['home.profile']
+    stats = pstats.Stats(os.path.join(self.path, 'home.profile'))
+    assert sum(calls for (filename, line, name), (calls, total, tt, ct, callers) in stats.stats.items()
+               if name == 'dispatch') == 80
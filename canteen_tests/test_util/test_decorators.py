@@ -14,3 +14,102 @@
             the root of the project.
 
 '''
+
+# stdlib
+import time
+import threading
+
+# testing
+from canteen import test
+
+# utils
+from canteen.util import decorators
+from canteen.core.api import cache
+
+
+class CacheableTests(test.FrameworkTest):
+
+  ''' Tests :py:func:`canteen.util.decorators.cacheable`. '''
+
+  def test_negative_caching(self):
+
+    ''' Test that falsy results are cached, and hits/misses counted. '''
+
+    calls = []
+
+    @decorators.cacheable('test-negative', passthrough=False)
+    def compute():
+      calls.append(True)
+      return 0
+
+    assert compute() == 0 and compute() == 0
+    assert len(calls) == 1
+    assert compute.stats['miss'] == 1 and compute.stats['hit'] == 1
+
+  def test_ttl(self):
+
+    ''' Test that entries are refreshed once their TTL is up. '''
+
+    calls = []
+
+    @decorators.cacheable('test-ttl', ttl=0.05, beta=0, passthrough=False)
+    def compute():
+      calls.append(True)
+      return len(calls)
+
+    assert compute() == 1 and compute() == 1
+    time.sleep(0.06)
+    assert compute() == 2
+    assert compute.stats['refresh'] == 1
+
+  def test_single_flight(self):
+
+    ''' Test that concurrent misses run the function once. '''
+
+    calls, results = [], []
+
+    @decorators.cacheable('test-single-flight', ttl=60, passthrough=False)
+    def compute():
+      calls.append(True)
+      time.sleep(0.1)
+      return 'value'
+
+    threads = [threading.Thread(target=lambda: results.append(compute())) for i in xrange(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+
+    assert len(calls) == 1
+    assert results == ['value'] * 8
+
+  def test_stale_while_refreshing(self):
+
+    ''' Test that callers get the stale value while another refreshes it. '''
+
+    started, release = threading.Event(), threading.Event()
+
+    @decorators.cacheable('test-stale', ttl=60, passthrough=False)
+    def compute():
+      started.set(), release.wait()
+      return 'new'
+
+    refresher = threading.Thread(target=compute)
+    refresher.start()
+    started.wait()
+
+    cache.CacheAPI.set('test-stale', ('old', time.time() - 1, 0))
+    assert compute() == 'old'
+    assert compute.stats['stale'] == 1
+
+    release.set(), refresher.join()
+
+  def test_early_refresh(self):
+
+    ''' Test that slow-to-compute entries are refreshed before expiry. '''
+
+    @decorators.cacheable('test-early', ttl=60, passthrough=False)
+    def compute():
+      return 'new'
+
+    cache.CacheAPI.set('test-early', ('old', time.time() + 1, 1e6))
+    assert compute() == 'new'
+    assert compute.stats['refresh'] == 1
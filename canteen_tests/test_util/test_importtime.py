@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen import timing tests
+  ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+  tests canteen's import-time profiler.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import os
+import sys
+import shutil
+import tempfile
+
+# testing
+from canteen import test
+
+# utils
+from canteen.util import importtime
+
+
+class ImportTimeTests(test.FrameworkTest):
+
+  ''' Tests :py:func:`canteen.util.importtime.profile`. '''
+
+  def test_profile(self):
+
+    ''' Test that `util.importtime.profile` times new imports, nested under their importer. '''
+
+    root = tempfile.mkdtemp()
+    try:
+      with open(os.path.join(root, '_importtime_outer.py'), 'w') as handle:
+        handle.write('import _importtime_inner\n')
+      with open(os.path.join(root, '_importtime_inner.py'), 'w') as handle:
+        handle.write('value = 1\n')
+
+      sys.path.insert(0, root)
+      records = importtime.profile(['_importtime_outer', '_importtime_outer'])
+    finally:
+      sys.path.remove(root)
+      for module in ('_importtime_outer', '_importtime_inner'):
+        sys.modules.pop(module, None)
+      shutil.rmtree(root)
+
+    assert [(module, depth) for module, _self, cumulative, depth in records] == [
+      ('_importtime_outer', 0), ('_importtime_inner', 1)]
+
+    (_, outer_self, outer_total, _), (_, inner_self, inner_total, _) = records
+    assert outer_total >= inner_total
+    assert abs(outer_total - (outer_self + inner_total)) < 1e-6
+    assert __import__ is importtime.__builtin__.__import__
@@ -15,6 +15,9 @@
 
 '''
 
+# stdlib
+import threading
+
 # testing
 from canteen import test
 
@@ -406,3 +409,91 @@ class WritableObjectProxyTests(test.FrameworkTest):
     # try deleting an invalid attr
     with self.assertRaises(AttributeError):
       del st_struct.i_was_never_here_lol
+
+
+class ChainMapTests(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.util.struct.ChainMap`. '''
+
+  def test_lookup_order(self):
+
+    ''' Test that `util.ChainMap` resolves keys from the first mapping that has them. '''
+
+    chain = struct.ChainMap({'a': 1}, {'a': 2, 'b': 2}, {'c': 3})
+
+    assert chain['a'] == 1
+    assert chain['b'] == 2
+    assert chain['c'] == 3
+    assert 'c' in chain
+    assert 'd' not in chain
+    assert len(chain) == 3
+    assert sorted(chain.keys()) == ['a', 'b', 'c']
+    assert dict(**chain) == {'a': 1, 'b': 2, 'c': 3}
+
+    with self.assertRaises(KeyError):
+      chain['d']
+
+  def test_writes_stay_on_top(self):
+
+    ''' Test that writes to `util.ChainMap` never touch shared layers. '''
+
+    shared = {'a': 1}
+    chain = struct.ChainMap({}, shared)
+    chain['a'] = 2
+    chain['b'] = 3
+
+    assert chain['a'] == 2
+    assert shared == {'a': 1}
+
+    del chain['a']
+    assert chain['a'] == 1
+
+    with self.assertRaises(KeyError):
+      del chain['a']
+
+  def test_new_child(self):
+
+    ''' Test that `util.ChainMap.new_child` layers over existing maps. '''
+
+    chain = struct.ChainMap({'a': 1})
+    child = chain.new_child({'a': 2})
+
+    assert child['a'] == 2
+    assert chain['a'] == 1
+    assert child.maps[1] is chain.maps[0]
+
+
+class LocalProxyTests(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.util.struct.LocalProxy`. '''
+
+  def test_resolves_per_thread(self):
+
+    ''' Test that `util.LocalProxy` resolves the current thread's value. '''
+
+    local = threading.local()
+    proxy = struct.LocalProxy(local, 'request')
+    local.request = {'path': '/'}
+
+    assert proxy['path'] == '/'
+    assert 'path' in proxy
+    assert isinstance(proxy, dict)
+
+    seen = []
+
+    def other():
+
+      ''' Read the proxy from another thread. '''
+
+      try:
+        proxy['path']
+      except RuntimeError:
+        seen.append(None)
+      local.request = {'path': '/other'}
+      seen.append(proxy['path'])
+
+    thread = threading.Thread(target=other)
+    thread.start(), thread.join()
+
+    assert seen == [None, '/other']
+    assert proxy['path'] == '/'
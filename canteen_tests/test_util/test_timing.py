@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen timing tests
+  ~~~~~~~~~~~~~~~~~~~~
+
+  tests for canteen's request timing utilities.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import socket
+
+# testing
+from canteen import test
+
+# timing utils
+from canteen.util import timing
+
+
+class TimingTest(test.FrameworkTest):
+
+  ''' Tests :py:class:`canteen.util.timing.Timing`. '''
+
+  def test_mark_spans(self):
+
+    ''' Test that marking phases records sequential spans. '''
+
+    timer = timing.Timing()
+    timer.mark('bind_environ')
+    timer.mark('match')
+
+    assert [name for name, duration in timer.spans] == ['bind_environ', 'match']
+    assert all((duration >= 0 for name, duration in timer.spans))
+
+  def test_bind_environ(self):
+
+    ''' Test that a timing can be attached to and found
+        from a WSGI environ. '''
+
+    environ = {}
+    timer = timing.Timing().bind(environ)
+    assert timing.Timing.current(environ) is timer
+    assert timing.Timing.current({}) is None
+    assert timing.Timing.current(None) is None
+
+  def test_server_timing_header(self):
+
+    ''' Test that finishing a timing attaches a `Server-Timing`
+        header, only when enabled. '''
+
+    headers = []
+    timer = timing.Timing(header=True)
+    timer.mark('execute')
+    timer.finish('home', headers)
+
+    assert len(headers) == 1
+    name, value = headers[0]
+    assert name == 'Server-Timing'
+    assert value.startswith('execute;dur=')
+    assert 'total;dur=' in value
+
+    headers = []
+    timing.Timing(header=False).finish('home', headers)
+    assert not headers
+
+
+class CollectorTest(test.FrameworkTest):
+
+  ''' Tests timing collectors in :py:mod:`canteen.util.timing`. '''
+
+  def test_configure_disabled(self):
+
+    ''' Test that no collector is built unless timing is enabled. '''
+
+    assert timing.Collector.configure({}) is None
+    assert timing.Collector.configure({'enable': False}) is None
+
+  def test_configure_invalid(self):
+
+    ''' Test that an unknown collector name is rejected. '''
+
+    with self.assertRaises(RuntimeError):
+      timing.Collector.configure({'enable': True, 'collector': 'i_do_not_exist'})
+
+  def test_ring_buffer(self):
+
+    ''' Test that the ring buffer collector is bounded. '''
+
+    collector = timing.Collector.configure({'enable': True, 'collector': 'ring', 'options': {'size': 2}})
+    assert isinstance(collector, timing.RingBuffer)
+
+    for i in xrange(3):
+      timer = timing.Timing(collector)
+      timer.mark('execute')
+      timer.finish('endpoint_%s' % i)
+
+    assert len(collector) == 2
+    assert [endpoint for endpoint, total, spans in collector] == ['endpoint_1', 'endpoint_2']
+
+  def test_statsd(self):
+
+    ''' Test that the statsd collector ships spans over UDP. '''
+
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    sink.settimeout(2)
+
+    try:
+      collector = timing.Statsd(*sink.getsockname(), prefix='test')
+      timer = timing.Timing(collector)
+      timer.mark('match')
+      timer.finish('home')
+
+      metrics = sink.recv(4096).split('\n')
+      assert metrics[0].startswith('test.home.match:')
+      assert metrics[0].endswith('|ms')
+      assert metrics[-1].startswith('test.home.total:')
+    finally:
+      sink.close()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+  canteen preload tests
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  tests canteen's module discovery and preloading.
+
+  :author: Sam Gammon <sam@keen.io>
+  :copyright: (c) Keen IO, 2013
+  :license: This software makes use of the MIT Open Source License.
+            A copy of this license is included as ``LICENSE.md`` in
+            the root of the project.
+
+'''
+
+# stdlib
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+# testing
+from canteen import test
+
+# utils
+from canteen import util
+
+
+class WalkTest(test.FrameworkTest):
+
+  ''' Tests :py:func:`canteen.util.discover` and
+      :py:func:`canteen.util.walk`. '''
+
+  tree = {
+    '_walk_pkg/__init__.py': '',
+    '_walk_pkg/good.py': 'value = 1\n',
+    '_walk_pkg/bad.py': 'import _walk_missing_module\n',
+    '_walk_pkg/sub/__init__.py': '',
+    '_walk_pkg/sub/leaf.py': 'value = 2\n',
+    '_walk_pkg/data/notes.txt': 'not a package\n',
+    '_walk_pkg/fixture.data.py': 'not a module name\n'}
+
+  def setUp(self):
+
+    ''' Write a small package tree to preload. '''
+
+    self.root = tempfile.mkdtemp()
+    self.manifest = os.path.join(tempfile.mkdtemp(), 'manifest.json')
+    for path, source in self.tree.iteritems():
+      self.write(path, source)
+
+    # backdate every directory, so later changes are guaranteed to touch their mtime
+    for path, dirs, files in os.walk(self.root):
+      os.utime(path, (0, 0))
+
+  def tearDown(self):
+
+    ''' Clean up the package tree and anything it loaded. '''
+
+    if self.root in sys.path: sys.path.remove(self.root)
+    for name in list(sys.modules):
+      if name.startswith('_walk_'): del sys.modules[name]
+    shutil.rmtree(self.root)
+    shutil.rmtree(os.path.dirname(self.manifest))
+
+  def write(self, path, source):
+
+    ''' Write `source` to `path` under the tree. '''
+
+    target = os.path.join(self.root, path)
+    if not os.path.isdir(os.path.dirname(target)):
+      os.makedirs(os.path.dirname(target))
+    with open(target, 'w') as handle:
+      handle.write(source)
+
+  def walk(self, **kwargs):
+
+    ''' Preload the tree, counting filesystem discoveries. '''
+
+    discover, discovered = util.discover, []
+
+    def counted(root):
+
+      ''' Count, then discover. '''
+
+      discovered.append(root)
+      return discover(root)
+
+    util.discover = counted
+    try:
+      return sorted(util.walk(self.root, debug=False, manifest=self.manifest, **kwargs)), len(discovered)
+    finally:
+      util.discover = discover
+
+  def test_discover(self):
+
+    ''' Test that discovery finds packages and modules, parents first,
+        without importing anything. '''
+
+    modules, directories = util.discover(self.root)
+
+    assert sorted(modules) == [
+      ('_walk_pkg', os.path.join(self.root, '_walk_pkg'), True),
+      ('_walk_pkg.bad', os.path.join(self.root, '_walk_pkg', 'bad.py'), False),
+      ('_walk_pkg.good', os.path.join(self.root, '_walk_pkg', 'good.py'), False),
+      ('_walk_pkg.sub', os.path.join(self.root, '_walk_pkg', 'sub'), True),
+      ('_walk_pkg.sub.leaf', os.path.join(self.root, '_walk_pkg', 'sub', 'leaf.py'), False)]
+
+    depths = [name.count('.') for name, path, is_package in modules]
+    assert depths == sorted(depths)
+    assert sorted(directories) == sorted((
+      self.root, os.path.join(self.root, '_walk_pkg'), os.path.join(self.root, '_walk_pkg', 'sub')))
+    assert not [name for name in sys.modules if name.startswith('_walk_')]
+
+  def test_failures(self):
+
+    ''' Test that modules failing to import are skipped, and the rest load. '''
+
+    loaded, discovered = self.walk()
+    assert loaded == ['_walk_pkg', '_walk_pkg.good', '_walk_pkg.sub', '_walk_pkg.sub.leaf']
+    assert sys.modules['_walk_pkg.sub.leaf'].value == 2
+
+  def test_strict(self):
+
+    ''' Test that strict preloading raises the first import failure. '''
+
+    with self.assertRaises(ImportError):
+      self.walk(strict=True)
+
+  def test_manifest_reuse(self):
+
+    ''' Test that an unchanged tree re-uses the manifest instead of walking. '''
+
+    first, discovered = self.walk()
+    assert discovered == 1
+
+    with open(self.manifest, 'r') as handle:
+      manifest = json.load(handle)
+    assert manifest['root'] == self.root
+    assert len(manifest['modules']) == 5
+
+    second, discovered = self.walk()
+    assert discovered == 0
+    assert second == first
+
+  def test_manifest_invalidate(self):
+
+    ''' Test that adding a module invalidates the manifest. '''
+
+    first, discovered = self.walk()
+    self.write('_walk_pkg/sub/added.py', 'value = 3\n')
+
+    second, discovered = self.walk()
+    assert discovered == 1
+    assert second == sorted(first + ['_walk_pkg.sub.added'])
+
+    third, discovered = self.walk()
+    assert discovered == 0
+    assert third == second
+
+  def test_manifest_corrupt(self):
+
+    ''' Test that an unreadable manifest is rebuilt. '''
+
+    with open(self.manifest, 'w') as handle:
+      handle.write('{not json')
+
+    loaded, discovered = self.walk()
+    assert discovered == 1
+    assert '_walk_pkg.good' in loaded
+    with open(self.manifest, 'r') as handle:
+      assert json.load(handle)['root'] == self.root
+
+  def test_compile(self):
+
+    ''' Test that stale modules are byte-compiled before import. '''
+
+    loaded, discovered = self.walk(processes=2)
+    assert '_walk_pkg.sub.leaf' in loaded
+    assert os.path.exists(os.path.join(self.root, '_walk_pkg', 'sub', 'leaf.pyc'))
+    assert os.path.exists(os.path.join(self.root, '_walk_pkg', 'bad.pyc'))
+
+  def test_lazy_imports(self):
+
+    ''' Test that importing :py:mod:`canteen.util` leaves preloading's
+        stdlib dependencies unimported until a walk needs them. '''
+
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.check_output([sys.executable, '-c', '; '.join((
+      'import sys',
+      'import canteen.util',
+      'print sorted(set(("json", "py_compile", "multiprocessing")) & set(sys.modules))'))],
+      cwd=root, env=dict(os.environ, PYTHONPATH=root), stderr=subprocess.STDOUT)
+
+    assert output.strip() == '[]'
@@ -49,5 +49,8 @@ setup(name="canteen",
         "git+git://github.com/keenlabs/protobuf.git#egg=protobuf-2.5.1beta",
         "git+git://github.com/keenlabs/hamlish-jinja.git#egg=hamlish_jinja-2.5.1beta"
       ),
+      entry_points={
+        "console_scripts": ("canteen = canteen.tools:main",)
+      },
       tests_require=("nose",)
 )